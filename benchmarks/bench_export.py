@@ -0,0 +1,77 @@
+"""Image export benchmark.
+
+Loads a synthetic map into a canvas and exports it through
+ui.image_export, reporting the output size, the time taken, how often
+progress was reported, and how far resident memory rose above its level
+at the start of the export; with tiled rendering and streamed PNG
+compression that rise should stay at a few strips' worth of pixels,
+well below the raw bitmap, whatever the output size.
+The measured export follows a warm-up one, which builds the label and
+shape caches every node keeps once it has been shown, so the rise is the
+export's own.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_export [nodes] [dpi] [format]
+"""
+import os
+import resource
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication
+from ui.canvas import CanvasWidget
+from ui.image_export import export_scene
+from benchmarks.synthetic import generate_map
+
+
+def rss_mb():
+    """Current resident set size, where /proc has it, else the peak so far."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main(argv):
+    node_count = int(argv[1]) if len(argv) > 1 else 50000
+    dpi = int(argv[2]) if len(argv) > 2 else 24
+    extension = argv[3] if len(argv) > 3 else 'png'
+    app = QApplication.instance() or QApplication(argv)
+    canvas = CanvasWidget()
+    records, connections = generate_map(node_count, text_length=12)
+    canvas.load_data(records, connections)
+
+    reports = []
+    peak = [0.0]
+
+    def report(fraction):
+        reports.append(fraction)
+        peak[0] = max(peak[0], rss_mb())
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, f"export.{extension}")
+        export_scene(canvas.scene, path, dpi)
+        os.remove(path)
+        before = rss_mb()
+        start = time.perf_counter()
+        width, height = export_scene(canvas.scene, path, dpi, progress=report)
+        seconds = time.perf_counter() - start
+        file_size = os.path.getsize(path)
+    rise = peak[0] - before
+
+    print(f"{node_count} nodes at {dpi} dpi -> {extension}: {width} x {height} px, "
+          f"{file_size / 1e6:.1f} MB")
+    print(f"{seconds:.2f} s, {width * height / seconds / 1e6:.1f} Mpx/s, "
+          f"{len(reports)} progress reports, peak RSS rise {rise:.0f} MB "
+          f"(raw bitmap would be {width * height * 3 / 1e6:.0f} MB)")
+    canvas.clear_all()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,84 @@
+"""Import scaling benchmark for CanvasWidget.
+
+Builds synthetic mind maps of doubling size and times both the node and
+connection callbacks that `import_data` drives and the bulk
+`CanvasWidget.load_data` path. With the id-indexed registry the per-node
+cost of either should stay flat as the map grows.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import_scaling [max_nodes]
+"""
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication
+from ui.canvas import CanvasWidget
+
+
+def make_map(node_count, seed=0):
+    """Generate a random tree with `node_count` nodes."""
+    rng = random.Random(seed)
+    nodes = []
+    connections = []
+    for i in range(node_count):
+        node_id = str(i)
+        nodes.append({
+            'id': node_id,
+            'title': f"Idea {i}",
+            'description': '',
+            'keywords': [],
+            'color': '#FFFFFF',
+            'shape': 'oval',
+            'image': None
+        })
+        if i:
+            connections.append({'source': str(rng.randrange(i)), 'target': node_id})
+    return nodes, connections
+
+
+def time_import(canvas, nodes, connections):
+    """Replay an import through the canvas callbacks and return seconds."""
+    canvas.clear_all()
+    start = time.perf_counter()
+    for node_data in nodes:
+        canvas.add_node(node_data)
+    for conn_data in connections:
+        canvas.add_connection(conn_data['source'], conn_data['target'])
+    return time.perf_counter() - start
+
+
+def time_bulk_load(canvas, nodes, connections):
+    """Load the same map through CanvasWidget.load_data and return seconds."""
+    canvas.clear_all()
+    pairs = [(conn_data['source'], conn_data['target']) for conn_data in connections]
+    start = time.perf_counter()
+    canvas.load_data(nodes, pairs)
+    return time.perf_counter() - start
+
+
+def main(argv):
+    max_nodes = int(argv[1]) if len(argv) > 1 else 20000
+    app = QApplication.instance() or QApplication(argv)
+    canvas = CanvasWidget()
+
+    print(f"{'nodes':>8} {'callbacks':>10} {'us/node':>10} {'bulk':>10} {'us/node':>10}")
+    size = 1250
+    while size <= max_nodes:
+        nodes, connections = make_map(size)
+        elapsed = time_import(canvas, nodes, connections)
+        bulk = time_bulk_load(canvas, nodes, connections)
+        print(f"{size:>8} {elapsed:>10.3f} {elapsed / size * 1e6:>10.1f}"
+              f" {bulk:>10.3f} {bulk / size * 1e6:>10.1f}")
+        size *= 2
+
+    canvas.clear_all()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,127 @@
+"""Node paint microbenchmark.
+
+Paints every node of a synthetic map straight through IdeaNode.paint
+into an image, a frame at a time, at full detail and zoomed out far
+enough for flat nodes, and calls IdeaNode.shape() as hit testing does.
+Reports the time per frame and per call, and how many QPen, QBrush,
+QColor and QPainterPath objects ui.idea_node creates per frame once
+warmed up; with shared paint resources and cached shape paths that count
+should be close to zero.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_node_paint [nodes] [frames]
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication, QGraphicsScene, QStyleOptionGraphicsItem, QStyle
+from PySide6.QtGui import QImage, QPainter
+import ui.idea_node
+from ui.idea_node import IdeaNode
+from ui.label_layout import label_layout
+from controllers.model import Node
+from benchmarks.synthetic import generate_map
+
+COUNTED = ('QPen', 'QBrush', 'QColor', 'QPainterPath')
+
+
+def build_nodes(node_count):
+    """IdeaNodes in a scene, every third selected."""
+    scene = QGraphicsScene()
+    records, _ = generate_map(node_count, text_length=0)
+    items = []
+    for i, record in enumerate(records):
+        item = IdeaNode(Node.from_record(record))
+        scene.addItem(item)
+        item.setSelected(i % 3 == 0)
+        items.append(item)
+    return scene, items
+
+
+def paint_frame(painter, items, options):
+    for i, item in enumerate(items):
+        item.paint(painter, options[i % 2])
+
+
+def hit_test(items):
+    for item in items:
+        item.shape()
+
+
+def count_allocations(function, *args):
+    """Run function with the counted Qt classes in ui.idea_node replaced by counting wrappers."""
+    counts = dict.fromkeys(COUNTED, 0)
+    originals = {name: getattr(ui.idea_node, name) for name in COUNTED}
+
+    def counting(name, cls):
+        def create(*a, **kw):
+            counts[name] += 1
+            return cls(*a, **kw)
+        return create
+
+    for name, cls in originals.items():
+        setattr(ui.idea_node, name, counting(name, cls))
+    try:
+        function(*args)
+    finally:
+        for name, cls in originals.items():
+            setattr(ui.idea_node, name, cls)
+    return counts
+
+
+def main(argv):
+    node_count = int(argv[1]) if len(argv) > 1 else 10000
+    frames = int(argv[2]) if len(argv) > 2 else 5
+    app = QApplication.instance() or QApplication(argv)
+    scene, items = build_nodes(node_count)
+
+    image = QImage(512, 512, QImage.Format_ARGB32_Premultiplied)
+    painter = QPainter(image)
+    normal = QStyleOptionGraphicsItem()
+    hover = QStyleOptionGraphicsItem()
+    hover.state |= QStyle.State_MouseOver
+    options = (normal, hover)
+
+    # Warm up caches
+    paint_frame(painter, items, options)
+    hit_test(items)
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        paint_frame(painter, items, options)
+    paint_seconds = (time.perf_counter() - start) / frames
+
+    paint_counts = count_allocations(paint_frame, painter, items, options)
+
+    painter.scale(0.2, 0.2)
+    start = time.perf_counter()
+    for _ in range(frames):
+        paint_frame(painter, items, options)
+    flat_seconds = (time.perf_counter() - start) / frames
+    flat_counts = count_allocations(paint_frame, painter, items, options)
+    painter.end()
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        hit_test(items)
+    shape_seconds = (time.perf_counter() - start) / frames
+    shape_counts = count_allocations(hit_test, items)
+
+    print(f"{'':>8} {'ms/frame':>10} {'us/call':>10}  allocations per frame")
+    for name, seconds, counts in (("paint", paint_seconds, paint_counts),
+                                  ("flat", flat_seconds, flat_counts),
+                                  ("shape", shape_seconds, shape_counts)):
+        allocations = ', '.join(f"{cls} {count}" for cls, count in counts.items())
+        print(f"{name:>8} {seconds * 1000:>10.2f} {seconds / node_count * 1e6:>10.2f}  {allocations}")
+
+    label_layout().discard_scene(scene)
+    scene.clear()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,354 @@
+"""Benchmark suite for the canvas hot paths.
+
+Generates a synthetic map (see benchmarks.synthetic) and times, on the
+offscreen Qt platform:
+
+    import_data       per-record import through add_node/add_connection
+    load_file         bulk streaming import into the canvas
+    export_data       JSON and .hmap export of a loaded canvas
+    add_node          adding every node to an empty canvas
+    add_connection    connecting every edge between loaded nodes
+    delete_node       deleting a sample of nodes with their edges
+    drag              moving a selection of nodes through IdeaNode.itemChange
+    paint             repainting the whole map fitted to the view, cold and warm
+
+With --edge-layer, canvases draw connections through the batched edge
+layer (see ui.edge_layer) instead of one item each.
+
+Each benchmark runs --repeat times on a fresh canvas; results are written
+as JSON. Given a baseline file from an earlier run, medians are compared
+and the run fails if any benchmark slowed down by more than its threshold.
+
+Run from the repository root:
+
+    python -m benchmarks.suite --nodes 5000 --output results.json
+    python -m benchmarks.suite --baseline results.json --threshold 0.2 --threshold-for paint=0.5
+
+Exit status: 0 on success, 1 if a regression was found.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import PySide6
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import QApplication
+from ui.canvas import CanvasWidget
+from controllers.import_export import import_data, export_data, load_file
+from controllers.json_stream import write_map
+from benchmarks.synthetic import generate_map
+
+# Viewport size used for paint timings
+VIEWPORT_SIZE = (1600, 1000)
+
+
+class Context:
+    """The generated map and scratch space shared by the benchmarks."""
+
+    def __init__(self, args, directory):
+        self.args = args
+        self.directory = directory
+        self.nodes, self.connections = generate_map(
+            args.nodes, args.branching, args.edge_density, args.text_length, args.seed)
+        self.map_path = os.path.join(directory, 'map.json')
+        write_map(self.map_path, self.nodes, self.connections, compact=True)
+
+    def canvas(self, loaded=False, shown=False):
+        canvas = CanvasWidget()
+        canvas.set_edge_layer(self.args.edge_layer)
+        if shown:
+            canvas.resize(*VIEWPORT_SIZE)
+            canvas.show()
+            QApplication.processEvents()
+        if loaded:
+            canvas.load_data(self.nodes, self.connections)
+        return canvas
+
+
+def _dispose(canvas):
+    canvas.clear_all()
+    canvas.close()
+    canvas.deleteLater()
+    QApplication.processEvents()
+
+
+def bench_import_data(ctx):
+    canvas = ctx.canvas()
+    start = time.perf_counter()
+    import_data(ctx.map_path, canvas.add_node, canvas.add_connection)
+    elapsed = time.perf_counter() - start
+    _dispose(canvas)
+    return elapsed, len(ctx.nodes)
+
+
+def bench_load_file(ctx):
+    canvas = ctx.canvas()
+    start = time.perf_counter()
+    load_file(ctx.map_path, canvas.load_chunks)
+    elapsed = time.perf_counter() - start
+    _dispose(canvas)
+    return elapsed, len(ctx.nodes)
+
+
+def _bench_export(ctx, extension):
+    canvas = ctx.canvas(loaded=True)
+    path = os.path.join(ctx.directory, 'export' + extension)
+    start = time.perf_counter()
+    export_data(canvas.get_all_nodes(), canvas.get_all_connections(), path)
+    elapsed = time.perf_counter() - start
+    _dispose(canvas)
+    os.remove(path)
+    return elapsed, len(ctx.nodes)
+
+
+def bench_export_data(ctx):
+    return _bench_export(ctx, '.json')
+
+
+def bench_export_data_hmap(ctx):
+    return _bench_export(ctx, '.hmap')
+
+
+def bench_add_node(ctx):
+    canvas = ctx.canvas()
+    start = time.perf_counter()
+    for record in ctx.nodes:
+        canvas.add_node(record)
+    elapsed = time.perf_counter() - start
+    _dispose(canvas)
+    return elapsed, len(ctx.nodes)
+
+
+def bench_add_connection(ctx):
+    canvas = ctx.canvas()
+    canvas.load_data(ctx.nodes, ())
+    start = time.perf_counter()
+    for source_id, target_id in ctx.connections:
+        canvas.add_connection(source_id, target_id)
+    elapsed = time.perf_counter() - start
+    _dispose(canvas)
+    return elapsed, len(ctx.connections)
+
+
+def bench_delete_node(ctx):
+    canvas = ctx.canvas(loaded=True)
+    # Every step-th node, spread over the whole map
+    step = max(1, len(ctx.nodes) // ctx.args.sample)
+    node_ids = [record['id'] for record in ctx.nodes[::step]]
+    start = time.perf_counter()
+    for node_id in node_ids:
+        canvas.delete_node(node_id)
+    elapsed = time.perf_counter() - start
+    _dispose(canvas)
+    return elapsed, len(node_ids)
+
+
+def bench_drag(ctx):
+    """Move a selection in small steps, as a mouse drag does."""
+    canvas = ctx.canvas(loaded=True)
+    step = max(1, len(ctx.nodes) // ctx.args.sample)
+    items = [canvas.nodes[record['id']] for record in ctx.nodes[::step]]
+    for item in items:
+        item.setSelected(True)
+    moves = 30
+    start = time.perf_counter()
+    for _ in range(moves):
+        for item in items:
+            item.moveBy(3, 2)
+        # What CanvasWidget.mouseMoveEvent does after each move
+        canvas._flush_edge_updates()
+    elapsed = time.perf_counter() - start
+    _dispose(canvas)
+    return elapsed, moves * len(items)
+
+
+def _fitted_canvas(ctx):
+    canvas = ctx.canvas(loaded=True, shown=True)
+    canvas.fitInView(canvas.scene.itemsBoundingRect(), Qt.KeepAspectRatio)
+    QApplication.processEvents()
+    return canvas
+
+
+def bench_paint(ctx):
+    """First full repaint of the fitted map, item caches included."""
+    canvas = _fitted_canvas(ctx)
+    start = time.perf_counter()
+    canvas.viewport().repaint()
+    elapsed = time.perf_counter() - start
+    _dispose(canvas)
+    return elapsed, 1
+
+
+def bench_paint_warm(ctx):
+    """Full repaints of the fitted map once item caches are filled."""
+    canvas = _fitted_canvas(ctx)
+    canvas.viewport().repaint()
+    frames = 5
+    start = time.perf_counter()
+    for _ in range(frames):
+        canvas.viewport().repaint()
+    elapsed = time.perf_counter() - start
+    _dispose(canvas)
+    return elapsed / frames, 1
+
+
+BENCHMARKS = {
+    'import_data': bench_import_data,
+    'load_file': bench_load_file,
+    'export_data': bench_export_data,
+    'export_data_hmap': bench_export_data_hmap,
+    'add_node': bench_add_node,
+    'add_connection': bench_add_connection,
+    'delete_node': bench_delete_node,
+    'drag': bench_drag,
+    'paint': bench_paint,
+    'paint_warm': bench_paint_warm,
+}
+
+
+def run(args):
+    """Run the selected benchmarks and return the results document."""
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        ctx = Context(args, directory)
+        for name in args.only or BENCHMARKS:
+            runs = []
+            ops = 0
+            for _ in range(args.repeat):
+                elapsed, ops = BENCHMARKS[name](ctx)
+                runs.append(elapsed)
+            median = statistics.median(runs)
+            results[name] = {
+                'median': median,
+                'min': min(runs),
+                'runs': runs,
+                'ops': ops,
+                'us_per_op': median / ops * 1e6 if ops else None,
+            }
+            print(f"{name:>18} {median * 1000:>10.2f} ms {results[name]['us_per_op'] or 0:>10.2f} us/op",
+                  file=sys.stderr)
+    return {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pyside': PySide6.__version__,
+            'platform': platform.platform(),
+            'params': {
+                'nodes': args.nodes,
+                'branching': args.branching,
+                'edge_density': args.edge_density,
+                'text_length': args.text_length,
+                'seed': args.seed,
+                'sample': args.sample,
+                'repeat': args.repeat,
+                'edge_layer': args.edge_layer,
+            },
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold, overrides):
+    """
+    Compare medians against a baseline results document.
+
+    Args:
+        current (dict): Results document of this run
+        baseline (dict): Results document to compare with
+        threshold (float): Allowed slowdown as a fraction, e.g. 0.2 for 20%
+        overrides (dict): Benchmark name -> threshold
+
+    Returns:
+        list: Names of the benchmarks that regressed
+    """
+    if current['meta']['params'] != baseline['meta'].get('params'):
+        print("warning: baseline was run with different parameters", file=sys.stderr)
+    regressions = []
+    print(f"{'benchmark':>18} {'baseline':>12} {'current':>12} {'change':>8}", file=sys.stderr)
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print(f"{name:>18} {'-':>12} {result['median'] * 1000:>9.2f} ms {'new':>8}", file=sys.stderr)
+            continue
+        change = result['median'] / before['median'] - 1 if before['median'] else 0.0
+        limit = overrides.get(name, threshold)
+        status = ''
+        if change > limit:
+            regressions.append(name)
+            status = f"  REGRESSION (> {limit:+.0%})"
+        print(f"{name:>18} {before['median'] * 1000:>9.2f} ms {result['median'] * 1000:>9.2f} ms"
+              f" {change:>+8.1%}{status}", file=sys.stderr)
+    return regressions
+
+
+def _threshold_override(text):
+    name, _, value = text.partition('=')
+    if name not in BENCHMARKS or not value:
+        raise argparse.ArgumentTypeError(f"expected BENCHMARK=FRACTION, got {text!r}")
+    return name, float(value)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite', description=__doc__.split('\n')[0])
+    parser.add_argument('--nodes', type=int, default=5000)
+    parser.add_argument('--branching', type=int, default=3)
+    parser.add_argument('--edge-density', type=float, default=0.1,
+                        help="extra cross-links per node")
+    parser.add_argument('--text-length', type=int, default=80,
+                        help="approximate description length in characters")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sample', type=int, default=500,
+                        help="nodes deleted or dragged")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--edge-layer', action='store_true',
+                        help="draw connections through the batched edge layer")
+    parser.add_argument('--only', type=lambda text: text.split(','),
+                        help="comma-separated benchmarks to run: " + ', '.join(BENCHMARKS))
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--baseline', help="results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="allowed slowdown against the baseline (default: 0.2 = 20%%)")
+    parser.add_argument('--threshold-for', type=_threshold_override, action='append', default=[],
+                        metavar='BENCHMARK=FRACTION', help="per-benchmark threshold")
+    args = parser.parse_args(argv)
+    unknown = set(args.only or ()) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    if args.repeat < 1 or args.nodes < 1 or args.sample < 1:
+        parser.error("--nodes, --sample and --repeat must be at least 1")
+    return args
+
+
+def main(argv):
+    args = parse_args(argv[1:])
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    app = QApplication.instance() or QApplication(argv)
+
+    document = run(args)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=2)
+    else:
+        print(json.dumps(document, indent=2))
+
+    if baseline is not None:
+        regressions = compare(document, baseline, args.threshold, dict(args.threshold_for))
+        if regressions:
+            print(f"{len(regressions)} regressions: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,82 @@
+"""Synthetic mind maps for benchmarks.
+
+Maps are trees grown breadth-first with a configurable branching factor,
+optionally with extra cross-links, and laid out on a grid in
+breadth-first order so that parents and children stay close together.
+Generation is deterministic for a given seed.
+"""
+import math
+import random
+
+COLORS = ('#FFFFFF', '#FFCDD2', '#C8E6C9', '#BBDEFB', '#FFF9C4', '#D1C4E9')
+SHAPES = ('oval', 'rectangle', 'triangle')
+WORDS = ('idea', 'plan', 'goal', 'task', 'note', 'risk', 'market', 'design', 'user', 'build',
+         'test', 'ship', 'scale', 'cost', 'team', 'data', 'model', 'review', 'launch', 'metric')
+
+# Grid spacing of generated positions
+GRID_X = 180
+GRID_Y = 110
+
+
+def _text(rng, length):
+    """Random words adding up to about length characters."""
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)
+
+
+def generate_map(node_count, branching=3, edge_density=0.0, text_length=80, seed=0):
+    """
+    Generate a positioned mind map.
+
+    Args:
+        node_count (int): Number of nodes
+        branching (int): Children per parent; each parent gets between 1
+            and 2 * branching - 1, branching on average
+        edge_density (float): Extra cross-links per node, between random pairs
+        text_length (int): Approximate length of each description, in characters
+        seed (int): Random seed
+
+    Returns:
+        tuple: (node dictionaries, [(source_id, target_id), ...])
+    """
+    rng = random.Random(seed)
+    columns = max(1, math.ceil(math.sqrt(node_count)))
+    nodes = []
+    connections = []
+    parent = 0
+    remaining = 0
+    for i in range(node_count):
+        node_id = f"n{i}"
+        nodes.append({
+            'id': node_id,
+            'title': f"{_text(rng, 12)} {i}",
+            'description': _text(rng, text_length) if text_length else '',
+            'keywords': rng.sample(WORDS, rng.randrange(4)),
+            'color': rng.choice(COLORS),
+            'shape': rng.choice(SHAPES),
+            'image': None,
+            'position': {'x': (i % columns) * GRID_X, 'y': (i // columns) * GRID_Y}
+        })
+        if i:
+            if not remaining:
+                # Next parent in breadth-first order
+                parent += 1 if i > 1 else 0
+                remaining = rng.randint(1, 2 * branching - 1)
+            connections.append((f"n{parent}", node_id))
+            remaining -= 1
+
+    existing = set(connections)
+    extra = min(int(edge_density * node_count), node_count * (node_count - 1) - len(existing))
+    while extra:
+        source, target = rng.randrange(node_count), rng.randrange(node_count)
+        pair = (f"n{source}", f"n{target}")
+        if source != target and pair not in existing:
+            existing.add(pair)
+            connections.append(pair)
+            extra -= 1
+    return nodes, connections
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Batch processing of mind map files without the GUI.
+
+    python cli.py validate maps/*.json
+    python cli.py stats --json maps/*.hmap
+    python cli.py convert --to hmap --output-dir out maps/*.json
+    python cli.py merge -o all.json maps/*.json
+    python cli.py prune-dangling-edges maps/*.json
+
+Files are processed in parallel worker processes. A throughput summary
+is printed to stderr. Exit status: 0 on success, 1 if validate found
+problems, 2 on bad usage, 3 if any file could not be processed.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from controllers import batch
+from controllers.model import MindMap
+from controllers.import_export import save_map
+
+EXIT_OK = 0
+EXIT_INVALID = 1
+EXIT_USAGE = 2
+EXIT_FAILED = 3
+
+
+def run_jobs(job, files, jobs):
+    """Yield job(file) results in file order, using a process pool when jobs > 1."""
+    if jobs <= 1 or len(files) <= 1:
+        yield from map(job, files)
+        return
+    with ProcessPoolExecutor(max_workers=min(jobs, len(files))) as pool:
+        yield from pool.map(job, files, chunksize=max(1, len(files) // (jobs * 4)))
+
+
+def describe(command, result):
+    """One line of human-readable output for a file result."""
+    if 'error' in result:
+        return f"{result['file']}: ERROR {result['error']}"
+    if command == 'validate':
+        if result['valid']:
+            return f"{result['file']}: OK ({result['nodes']} nodes, {result['edges']} connections)"
+        lines = [f"{result['file']}: {result['problem_count']} problems"]
+        lines.extend(f"    {problem}" for problem in result['problems'])
+        if result['problem_count'] > len(result['problems']):
+            lines.append(f"    ... and {result['problem_count'] - len(result['problems'])} more")
+        return "\n".join(lines)
+    if command == 'stats':
+        return (f"{result['file']}: {result['format']}, {result['bytes']} bytes, "
+                f"{result['nodes']} nodes, {result['edges']} connections, "
+                f"{result['roots']} roots, {result['leaves']} leaves, "
+                f"{result['components']} components, {result['images']} images, "
+                f"{result['dangling_edges']} dangling, {result['duplicate_edges']} duplicate connections")
+    if command == 'convert':
+        return f"{result['file']} -> {result['output']} ({result['bytes']} -> {result['output_bytes']} bytes)"
+    if command == 'prune':
+        return (f"{result['file']} -> {result['output']}: removed {result['dangling_edges']} dangling "
+                f"and {result['duplicate_edges']} duplicate connections, "
+                f"{result['duplicate_ids']} duplicate nodes")
+    return f"{result['file']}: read {result['nodes']} nodes, {result['edges']} connections"
+
+
+def merge(results, output, compact):
+    """
+    Merge read results into one map; the first node with an id wins.
+
+    Node records batch.read found invalid are not part of the results.
+
+    Returns:
+        tuple: (MindMap, number of nodes skipped as duplicates)
+
+    Raises:
+        OSError: If the output cannot be written
+    """
+    mind_map = MindMap()
+    skipped = 0
+    pending = []
+    for result in results:
+        if 'error' in result:
+            continue
+        skipped += result['nodes'] - len(mind_map.add_records(result['records']))
+        mind_map.add_edges(result['connections'], pending)
+    mind_map.add_edges(pending)
+    save_map(mind_map, output, compact=compact)
+    return mind_map, skipped
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='cli.py', description="Batch tools for mind map files.")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument('--json', action='store_true',
+                        help="print one JSON result per file instead of text")
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="only print failures and the summary")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    validate = commands.add_parser('validate', help="check files for malformed data")
+    validate.add_argument('files', nargs='+')
+
+    stats = commands.add_parser('stats', help="count nodes, connections and components")
+    stats.add_argument('files', nargs='+')
+
+    convert = commands.add_parser('convert', help="convert between JSON and .hmap without loss")
+    convert.add_argument('--to', choices=sorted(batch.FORMATS), required=True)
+    convert.add_argument('--output-dir', help="where to write (default: next to each file)")
+    convert.add_argument('files', nargs='+')
+
+    merge_parser = commands.add_parser('merge', help="merge files into one map")
+    merge_parser.add_argument('-o', '--output', required=True)
+    merge_parser.add_argument('--compact', action='store_true', help="unindented JSON output")
+    merge_parser.add_argument('files', nargs='+')
+
+    prune = commands.add_parser('prune', aliases=['prune-dangling-edges'],
+                                help="drop dangling and duplicate connections")
+    prune.add_argument('--output-dir', help="where to write (default: rewrite in place)")
+    prune.add_argument('--compact', action='store_true', help="unindented JSON output")
+    prune.add_argument('files', nargs='+')
+
+    args = parser.parse_args(argv)
+    if args.command == 'prune-dangling-edges':
+        args.command = 'prune'
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    output_dir = getattr(args, 'output_dir', None)
+    if output_dir and not os.path.isdir(output_dir):
+        parser.error(f"output directory {output_dir!r} does not exist")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.command == 'validate':
+        job = batch.validate
+    elif args.command == 'stats':
+        job = batch.stats
+    elif args.command == 'convert':
+        job = partial(batch.convert, output_dir=args.output_dir, to=args.to)
+    elif args.command == 'prune':
+        job = partial(batch.prune, output_dir=args.output_dir, compact=args.compact)
+    else:
+        job = batch.read
+
+    start = time.perf_counter()
+    results = []
+    for result in run_jobs(job, args.files, args.jobs):
+        results.append(result)
+        failed = 'error' in result or result.get('valid') is False
+        if args.command == 'merge' or (args.quiet and not failed):
+            continue
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(describe(args.command, result))
+
+    if args.command == 'merge':
+        for result in results:
+            if 'error' in result:
+                print(describe('merge', result))
+        invalid = sum(result.get('invalid_nodes', 0) for result in results)
+        try:
+            mind_map, skipped = merge(results, args.output, args.compact)
+        except OSError as e:
+            print(f"{args.output}: ERROR {type(e).__name__}: {e}", file=sys.stderr)
+            return EXIT_FAILED
+        print(f"{args.output}: {len(mind_map.nodes)} nodes, {mind_map.edge_count} connections"
+              f" ({skipped} duplicate and {invalid} invalid nodes skipped)")
+
+    elapsed = time.perf_counter() - start
+    failures = sum(1 for result in results if 'error' in result)
+    nodes = sum(result.get('nodes', 0) for result in results)
+    size = sum(result.get('bytes', 0) for result in results)
+    rate = 1 / elapsed if elapsed > 0 else 0.0
+    print(f"{len(results)} files, {nodes} nodes, {size / 1e6:.1f} MB in {elapsed:.2f}s "
+          f"({len(results) * rate:.1f} files/s, {nodes * rate:.0f} nodes/s, "
+          f"{size / 1e6 * rate:.1f} MB/s); {failures} failed", file=sys.stderr)
+
+    if failures:
+        return EXIT_FAILED
+    if any(result.get('valid') is False for result in results):
+        return EXIT_INVALID
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
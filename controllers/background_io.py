@@ -0,0 +1,127 @@
+from abc import ABC, abstractmethod
+import queue
+import threading
+from controllers.import_export import open_records, write_records
+
+END = object()
+
+
+class Cancelled(Exception):
+    """Raised inside a worker when its job has been cancelled."""
+
+
+class _Job(ABC):
+    """
+    Common state for a file job running on a worker thread.
+
+    Subclasses implement _run(), which runs on the worker, reports through
+    _set_progress() and records any failure in error.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.progress = 0.0
+        self.error = None
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        """Ask the worker to stop at its next checkpoint."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def is_running(self):
+        return self._thread.is_alive()
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _set_progress(self, fraction):
+        if self._cancelled.is_set():
+            raise Cancelled()
+        self.progress = fraction
+
+    @abstractmethod
+    def _run(self):
+        """Do the job's work on the worker thread."""
+
+
+class BackgroundReader(_Job):
+    """
+    Parse a mind map file into plain record batches on a worker thread.
+
+    Batches are handed over through a bounded queue, so a slow consumer
+    holds the parser back instead of letting parsed records pile up.
+    The GUI thread polls take() and builds items from each batch.
+    """
+
+    def __init__(self, file_path, chunk_size=200, max_pending=8):
+        super().__init__(file_path)
+        self.chunk_size = chunk_size
+        self.batches = queue.Queue(max_pending)
+
+    def take(self):
+        """Return the next batch, END when finished, or None if none is ready."""
+        try:
+            return self.batches.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _put(self, item):
+        while not self._cancelled.is_set():
+            try:
+                self.batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        try:
+            for batch in open_records(self.file_path, self.chunk_size, progress=self._set_progress):
+                if not self._put(batch):
+                    return
+            self.progress = 1.0
+        except Cancelled:
+            return
+        except Exception as e:
+            self.error = e
+        self._put(END)
+
+
+class BackgroundWriter(_Job):
+    """
+    Write a snapshot of plain node and connection records on a worker thread.
+
+    The snapshot is taken on the GUI thread before the job starts, so the
+    canvas can keep changing while the file is written.
+    """
+
+    def __init__(self, file_path, nodes, connections, compact=False):
+        super().__init__(file_path)
+        self.nodes = nodes
+        self.connections = connections
+        self.compact = compact
+
+    def _records(self):
+        total = len(self.nodes) or 1
+        for i, record in enumerate(self.nodes):
+            if i % 500 == 0:
+                self._set_progress(i / total)
+            yield record
+
+    def _run(self):
+        try:
+            write_records(self.file_path, self._records(), self.connections,
+                          compact=self.compact)
+            self.progress = 1.0
+        except Cancelled:
+            pass
+        except Exception as e:
+            self.error = e
@@ -0,0 +1,242 @@
+"""
+Per-file jobs for batch processing of mind map files.
+
+Every job takes plain arguments and returns a plain, JSON-serializable
+result dictionary, so jobs can run in worker processes. Files that
+cannot be read or written produce a result with an 'error' entry
+instead of raising.
+"""
+import os
+import time
+from numbers import Real
+from controllers.model import MindMap, Node
+from controllers.hmap_format import SHAPES, is_hmap_file
+from controllers.import_export import open_records, write_records, convert_file, HMAP_EXTENSION
+
+# Problems listed per file by validate; the rest are only counted
+MAX_PROBLEMS = 20
+
+# What a malformed or unreadable file can raise while being processed
+_FILE_ERRORS = (OSError, ValueError, KeyError, TypeError, AttributeError)
+
+# Output formats: name -> (extension, compact JSON)
+FORMATS = {
+    'json': ('.json', False),
+    'compact': ('.json', True),
+    'hmap': (HMAP_EXTENSION, False),
+}
+
+
+def _result(file_path, start, **fields):
+    result = {'file': file_path, 'seconds': time.perf_counter() - start}
+    result.update(fields)
+    return result
+
+
+def _failed(file_path, start, error):
+    return _result(file_path, start, error=f"{type(error).__name__}: {error}")
+
+
+def _file_info(file_path):
+    return {
+        'format': 'hmap' if is_hmap_file(file_path) else 'json',
+        'bytes': os.path.getsize(file_path),
+    }
+
+
+def _record_problem(record):
+    """Describe what is wrong with a node record, or return None."""
+    if not isinstance(record, dict):
+        return "node record is not an object"
+    node_id = record.get('id')
+    if not isinstance(node_id, str):
+        return f"node id {node_id!r} is not a string"
+    for key in ('title', 'color', 'shape'):
+        if not isinstance(record.get(key), str):
+            return f"node {node_id!r}: missing or invalid {key!r}"
+    if record['shape'].lower() not in SHAPES:
+        return f"node {node_id!r}: unknown shape {record['shape']!r}"
+    keywords = record.get('keywords', [])
+    if not isinstance(keywords, list) or not all(isinstance(k, str) for k in keywords):
+        return f"node {node_id!r}: keywords must be a list of strings"
+    for key in ('description', 'image'):
+        if record.get(key) is not None and not isinstance(record[key], str):
+            return f"node {node_id!r}: {key!r} must be a string"
+    position = record.get('position', {})
+    if not isinstance(position, dict) or not all(
+            isinstance(position.get(axis, 0), Real) for axis in ('x', 'y')):
+        return f"node {node_id!r}: position must hold numeric x and y"
+    return None
+
+
+def scan_map(file_path, problems=None):
+    """
+    Load a file into a MindMap, counting what had to be dropped.
+
+    Args:
+        file_path (str): JSON or .hmap file
+        problems (list): Optional; node records that fail validation are
+            skipped and described here instead of raising ValueError
+
+    Returns:
+        tuple: (MindMap, counts) where counts has 'duplicate_ids',
+        'invalid_nodes', 'malformed_edges', 'edges_read',
+        'dangling_edges' and 'duplicate_edges'
+    """
+    mind_map = MindMap()
+    counts = {'duplicate_ids': 0, 'invalid_nodes': 0, 'edges_read': 0}
+    pending = []
+    malformed = []
+    for section, records in open_records(file_path, malformed=malformed):
+        if section == 'nodes':
+            for record in records:
+                problem = _record_problem(record)
+                if problem:
+                    if problems is None:
+                        raise ValueError(f"Invalid file format: {problem}")
+                    counts['invalid_nodes'] += 1
+                    problems.append(problem)
+                    continue
+                if mind_map.add_node(Node.from_record(record)) is None:
+                    counts['duplicate_ids'] += 1
+                    if problems is not None:
+                        problems.append(f"duplicate node id {record['id']!r}")
+        else:
+            counts['edges_read'] += len(records)
+            mind_map.add_edges(records, pending)
+    # Entries the reader could not even turn into records
+    bad_connections = []
+    for section, entry in malformed:
+        if section == 'connections':
+            bad_connections.append(entry)
+            continue
+        problem = _record_problem(entry)
+        if problems is None:
+            raise ValueError(f"Invalid file format: {problem}")
+        counts['invalid_nodes'] += 1
+        problems.append(problem)
+    nodes = mind_map.nodes
+    dangling = [pair for pair in pending if pair[0] not in nodes or pair[1] not in nodes]
+    mind_map.add_edges(pending)
+    counts['malformed_edges'] = len(bad_connections)
+    counts['dangling_edges'] = len(dangling)
+    counts['duplicate_edges'] = counts['edges_read'] - len(dangling) - mind_map.edge_count
+    if problems is not None:
+        problems.extend(f"connection entry {entry!r} lacks a source or target" for entry in bad_connections)
+        problems.extend(f"connection {source!r} -> {target!r} has a missing endpoint"
+                        for source, target in dangling)
+    return mind_map, counts
+
+
+def validate(file_path):
+    """Check a file for unreadable data, bad records and broken connections."""
+    start = time.perf_counter()
+    problems = []
+    try:
+        info = _file_info(file_path)
+        mind_map, counts = scan_map(file_path, problems)
+    except _FILE_ERRORS as e:
+        return _failed(file_path, start, e)
+    if counts['duplicate_edges']:
+        problems.append(f"{counts['duplicate_edges']} duplicate connections")
+    return _result(file_path, start, valid=not problems, problem_count=len(problems),
+                   problems=problems[:MAX_PROBLEMS], nodes=len(mind_map.nodes),
+                   edges=mind_map.edge_count, **info)
+
+
+def stats(file_path):
+    """Count nodes, connections, roots, leaves and connected components."""
+    start = time.perf_counter()
+    try:
+        info = _file_info(file_path)
+        mind_map, counts = scan_map(file_path)
+    except _FILE_ERRORS as e:
+        return _failed(file_path, start, e)
+
+    # Components over undirected connections, by union-find
+    parent = {node_id: node_id for node_id in mind_map.nodes}
+
+    def find(node_id):
+        while parent[node_id] != node_id:
+            parent[node_id] = parent[parent[node_id]]
+            node_id = parent[node_id]
+        return node_id
+
+    for source_id, target_id in mind_map.iter_edges():
+        a, b = find(source_id), find(target_id)
+        if a != b:
+            parent[a] = b
+    components = sum(1 for node_id in parent if parent[node_id] == node_id)
+
+    return _result(
+        file_path, start, nodes=len(mind_map.nodes), edges=mind_map.edge_count,
+        roots=sum(1 for sources in mind_map.incoming.values() if not sources),
+        leaves=sum(1 for targets in mind_map.outgoing.values() if not targets),
+        components=components, images=sum(1 for node in mind_map.nodes.values() if node.image),
+        **counts, **info
+    )
+
+
+def target_path(file_path, output_dir=None, extension=None):
+    """Where a job writes its result for file_path."""
+    directory = output_dir or os.path.dirname(file_path)
+    name = os.path.basename(file_path)
+    if extension:
+        name = os.path.splitext(name)[0] + extension
+    return os.path.join(directory, name)
+
+
+def convert(file_path, output_dir=None, to='json'):
+    """Convert a file to another format without loss, streaming its records."""
+    start = time.perf_counter()
+    extension, compact = FORMATS[to]
+    target = target_path(file_path, output_dir, extension)
+    try:
+        info = _file_info(file_path)
+        nodes, edges = convert_file(file_path, target, compact=compact)
+    except _FILE_ERRORS as e:
+        return _failed(file_path, start, e)
+    return _result(file_path, start, output=target, output_bytes=os.path.getsize(target),
+                   nodes=nodes, edges=edges, **info)
+
+
+def prune(file_path, output_dir=None, compact=False):
+    """Rewrite a file without dangling or duplicate connections and duplicate node ids."""
+    start = time.perf_counter()
+    target = target_path(file_path, output_dir)
+    try:
+        info = _file_info(file_path)
+        mind_map, counts = scan_map(file_path)
+        write_records(target, mind_map.records(), mind_map.iter_edges(), compact=compact)
+    except _FILE_ERRORS as e:
+        return _failed(file_path, start, e)
+    return _result(file_path, start, output=target, nodes=len(mind_map.nodes),
+                   edges=mind_map.edge_count, **counts, **info)
+
+
+def read(file_path):
+    """
+    Read a whole file as plain records, for merging in another process.
+
+    Node records validate would reject are left out and counted as
+    'invalid_nodes', so a merge never writes them.
+    """
+    start = time.perf_counter()
+    invalid = 0
+    malformed = []
+    try:
+        info = _file_info(file_path)
+        nodes = []
+        connections = []
+        for section, records in open_records(file_path, malformed=malformed):
+            if section == 'nodes':
+                valid = [record for record in records if _record_problem(record) is None]
+                invalid += len(records) - len(valid)
+                nodes.extend(valid)
+            else:
+                connections.extend(records)
+    except _FILE_ERRORS as e:
+        return _failed(file_path, start, e)
+    invalid += sum(1 for section, _ in malformed if section == 'nodes')
+    return _result(file_path, start, records=nodes, connections=connections,
+                   nodes=len(nodes), edges=len(connections), invalid_nodes=invalid, **info)
@@ -0,0 +1,311 @@
+"""
+Force-directed layout (Fruchterman-Reingold) vectorized with NumPy.
+
+Repulsion uses a Barnes-Hut style approximation over an adaptive
+quadtree, processed one level at a time over whole arrays. At each level
+every occupied cell interacts with the centers of mass of the cells in
+its interaction list: the children of its parent's neighbours that are
+not its own neighbours. The result is expanded to first order around the
+cell's center of mass and applied to each node in the cell. Nodes drop
+out of deeper levels as soon as their 3x3 neighbourhood holds no other
+node, so every pair of nodes is accounted for exactly once and the work
+per level shrinks with the number of nodes still in crowded areas.
+Attraction is evaluated exactly, per edge.
+"""
+import threading
+import numpy as np
+
+def _interaction_offsets():
+    """Cell offsets of the interaction list, per (x parity, y parity) of a cell.
+
+    A cell's interaction list is the children of its parent's 3x3
+    neighbourhood (a 6x6 block whose position depends on which child the
+    cell is) minus the cell's own 3x3 neighbourhood: 27 cells.
+    """
+    table = np.empty((4, 27, 2), dtype=np.int64)
+    for px in (0, 1):
+        for py in (0, 1):
+            table[px * 2 + py] = [(dx, dy)
+                                  for dx in range(-2 - px, 4 - px)
+                                  for dy in range(-2 - py, 4 - py)
+                                  if abs(dx) > 1 or abs(dy) > 1]
+    return table
+
+
+_INTERACTIONS = _interaction_offsets()
+_NEIGHBOURS = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)], dtype=np.int64)
+# Deepest quadtree level; only reached by (near-)coincident nodes
+_MAX_DEPTH = 24
+# Largest grid that gets a dense cell lookup table
+_DENSE_CELLS = 1 << 22
+# Neighbourhoods this small are resolved pair by pair
+_LEAF_SIZE = 16
+
+
+def _bincount2(index, vectors, weights, size):
+    """Sum vectors * weights into `size` rows by index."""
+    return np.stack((np.bincount(index, vectors[:, 0] * weights, size),
+                     np.bincount(index, vectors[:, 1] * weights, size)), axis=1)
+
+
+class _CellIndex:
+    """Maps cell ids at one level to positions in the sorted occupied-cell array.
+
+    Uses a dense table while the grid is small enough to allocate cheaply,
+    and binary search beyond that.
+    """
+
+    def __init__(self, cells, g):
+        self.cells = cells
+        self.g = g
+        self.table = None
+        if g * g <= _DENSE_CELLS:
+            self.table = np.full(g * g, -1, dtype=np.int32)
+            self.table[cells] = np.arange(len(cells), dtype=np.int32)
+
+    def lookup(self, x, y, offsets):
+        """
+        Look up the cells at (x, y) + offsets.
+
+        Returns:
+            tuple: (row, cell) arrays of the occupied cells found, where row
+            indexes into x/y and cell into the occupied-cell array
+        """
+        g = self.g
+        qx = x[:, None] + offsets[..., 0]
+        qy = y[:, None] + offsets[..., 1]
+        row, col = np.nonzero((qx >= 0) & (qx < g) & (qy >= 0) & (qy < g))
+        queries = qx[row, col] * g + qy[row, col]
+        if self.table is not None:
+            loc = self.table[queries]
+            found = loc >= 0
+        else:
+            loc = np.minimum(np.searchsorted(self.cells, queries), len(self.cells) - 1)
+            found = self.cells[loc] == queries
+        return row[found], loc[found]
+
+
+def _near_field(z, nodes, node_cells, g, index, inverse, counts, k2, min_dist2, rng):
+    """Exact repulsion on `nodes` from every other node in their 3x3 neighbourhood."""
+    # Members of each occupied cell, contiguous in `order`
+    order = np.argsort(inverse, kind='stable')
+    starts = np.cumsum(counts) - counts
+
+    row, cell = index.lookup(node_cells // g, node_cells % g, _NEIGHBOURS[None, :, :])
+    sizes = counts[cell]
+    pair_row = np.repeat(row, sizes)
+    within = np.arange(len(pair_row)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    other = order[np.repeat(starts[cell], sizes) + within]
+    this = nodes[pair_row]
+    keep = other != this
+    pair_row, this, other = pair_row[keep], this[keep], other[keep]
+
+    delta = z[this] - z[other]
+    dist2 = delta.real ** 2 + delta.imag ** 2
+    coincident = dist2 < 1e-12
+    if coincident.any():
+        count = int(coincident.sum())
+        delta[coincident] = (rng.normal(scale=1.0, size=count) + 1j * rng.normal(scale=1.0, size=count))
+        dist2[coincident] = delta[coincident].real ** 2 + delta[coincident].imag ** 2
+    field = k2 * delta / np.maximum(dist2, min_dist2)
+    size = len(nodes)
+    return np.bincount(pair_row, field.real, size) + 1j * np.bincount(pair_row, field.imag, size)
+
+
+def repulsion(pos, k, rng=None):
+    """
+    Approximate Fruchterman-Reingold repulsion (k^2 / d) on every node.
+
+    Args:
+        pos (ndarray): (N, 2) node positions
+        k (float): Ideal edge length
+        rng (Generator): Source of jitter for coincident nodes
+
+    Returns:
+        ndarray: (N, 2) forces
+    """
+    n = len(pos)
+    force = np.zeros(n, dtype=np.complex128)
+    if n < 2:
+        return np.zeros_like(pos)
+    rng = rng or np.random.default_rng()
+    k2 = k * k
+    # Keep the nearest interactions from blowing up
+    min_dist2 = (k * 0.05) ** 2
+
+    z = pos[:, 0] + 1j * pos[:, 1]
+    lo = pos.min(axis=0)
+    span = float((pos.max(axis=0) - lo).max()) or 1.0
+    unit = (pos - lo) / span
+    active = np.arange(n)
+
+    for level in range(2, _MAX_DEPTH + 1):
+        g = 1 << level
+        cell = np.minimum((unit * g).astype(np.int64), g - 1)
+        cells, inverse, counts = np.unique(cell[:, 0] * g + cell[:, 1],
+                                           return_inverse=True, return_counts=True)
+        inverse = inverse.ravel()
+        index = _CellIndex(cells, g)
+        centers = (np.bincount(inverse, z.real) + 1j * np.bincount(inverse, z.imag)) / counts
+
+        # Occupied cells that still hold active nodes
+        targets = np.unique(inverse[active])
+        tx, ty = cells[targets] // g, cells[targets] % g
+        slot = np.searchsorted(targets, inverse[active])
+
+        row, source = index.lookup(tx, ty, _INTERACTIONS[(tx & 1) * 2 + (ty & 1)])
+        if len(row):
+            # The field k^2 m d / |d|^2 is k^2 m / conj(d) as a complex number;
+            # expand it to first order around each target's center of mass
+            delta = centers[targets[row]] - centers[source]
+            dist2 = np.maximum(delta.real ** 2 + delta.imag ** 2, min_dist2)
+            field = k2 * counts[source] * delta / dist2
+            slope = -field * field / (k2 * counts[source])
+            size = len(targets)
+            f0 = np.bincount(row, field.real, size) + 1j * np.bincount(row, field.imag, size)
+            f1 = np.bincount(row, slope.real, size) + 1j * np.bincount(row, slope.imag, size)
+            offset = np.conj(z[active] - centers[inverse[active]])
+            force[active] += f0[slot] + f1[slot] * offset
+
+        # Nodes whose 3x3 neighbourhood is small enough are finished off
+        # exactly against its members; the rest go one level deeper
+        row, neighbour = index.lookup(tx, ty, _NEIGHBOURS[None, :, :])
+        crowd = np.bincount(row, counts[neighbour], len(targets))[slot]
+        leaves = active[(crowd > 1) & (crowd <= _LEAF_SIZE)]
+        if len(leaves):
+            force[leaves] += _near_field(z, leaves, cells[inverse[leaves]], g, index,
+                                         inverse, counts, k2, min_dist2, rng)
+        active = active[crowd > _LEAF_SIZE]
+        if not len(active):
+            break
+    else:
+        # Whatever is left sits on top of other nodes: push apart with jitter
+        jitter = rng.normal(scale=k * 0.01, size=len(active)) + 1j * rng.normal(scale=k * 0.01, size=len(active))
+        force[active] += k2 / np.conj(jitter)
+
+    return np.stack((force.real, force.imag), axis=1)
+
+
+def attraction(pos, edges, k):
+    """Fruchterman-Reingold attraction (d^2 / k) along every edge."""
+    n = len(pos)
+    if not len(edges):
+        return np.zeros_like(pos)
+    source, target = edges[:, 0], edges[:, 1]
+    delta = pos[target] - pos[source]
+    weights = np.hypot(delta[:, 0], delta[:, 1]) / k
+    return _bincount2(source, delta, weights, n) - _bincount2(target, delta, weights, n)
+
+
+class ForceLayout:
+    """Iterative force-directed layout over NumPy arrays."""
+
+    def __init__(self, positions, edges, ideal_length=220.0, iterations=80,
+                 gravity=0.05, seed=0):
+        """
+        Args:
+            positions (array-like): (N, 2) starting node centers
+            edges (array-like): (E, 2) node index pairs
+            ideal_length (float): Preferred distance between linked nodes
+            iterations (int): Number of cooling steps
+            gravity (float): Pull toward the centroid, keeps components together
+            seed (int): Seed for the jitter applied to coincident nodes
+        """
+        self.rng = np.random.default_rng(seed)
+        self.pos = np.array(positions, dtype=np.float64).reshape(-1, 2)
+        self.edges = np.array(edges, dtype=np.int64).reshape(-1, 2)
+        # Self-loops only add noise
+        self.edges = self.edges[self.edges[:, 0] != self.edges[:, 1]]
+        self.k = ideal_length
+        self.iterations = iterations
+        self.gravity = gravity
+        self.iteration = 0
+
+        # Start hot enough to untangle the current arrangement, not to scatter it
+        span = float(np.ptp(self.pos, axis=0).max()) if len(self.pos) else 0.0
+        self.temperature = max(ideal_length, span * 0.1)
+        self.cooling = 0.01 ** (1.0 / max(iterations, 1))
+
+    @property
+    def done(self):
+        return self.iteration >= self.iterations
+
+    def step(self):
+        """Run one iteration and return the largest displacement applied."""
+        if self.done or len(self.pos) < 2:
+            self.iteration = self.iterations
+            return 0.0
+        pos = self.pos
+        force = repulsion(pos, self.k, rng=self.rng) + attraction(pos, self.edges, self.k)
+        force -= self.gravity * self.k / 100.0 * (pos - pos.mean(axis=0))
+
+        # Limit each move to the current temperature
+        length = np.hypot(force[:, 0], force[:, 1])
+        scale = np.minimum(length, self.temperature) / np.maximum(length, 1e-9)
+        pos += force * scale[:, None]
+
+        self.temperature *= self.cooling
+        self.iteration += 1
+        return float((length * scale).max())
+
+
+class ForceLayoutJob:
+    """
+    Run a ForceLayout on a worker thread.
+
+    Every publish_every iterations a copy of the positions is published
+    as `snapshot` with an increasing `version`, for the GUI thread to
+    pick up and animate towards.
+    """
+
+    def __init__(self, layout, publish_every=5):
+        self.layout = layout
+        self.publish_every = publish_every
+        self.snapshot = layout.pos.copy()
+        self.version = 0
+        self.error = None
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def progress(self):
+        return self.layout.iteration / max(self.layout.iterations, 1)
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def is_running(self):
+        return self._thread.is_alive()
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+
+    def latest(self):
+        """Return (version, positions) of the most recent snapshot."""
+        with self._lock:
+            return self.version, self.snapshot
+
+    def _publish(self):
+        snapshot = self.layout.pos.copy()
+        with self._lock:
+            self.snapshot = snapshot
+            self.version += 1
+
+    def _run(self):
+        try:
+            while not self.layout.done and not self._cancelled.is_set():
+                self.layout.step()
+                if self.layout.iteration % self.publish_every == 0:
+                    self._publish()
+            if not self._cancelled.is_set():
+                self._publish()
+        except Exception as e:
+            self.error = e
@@ -0,0 +1,255 @@
+"""
+Compact binary mind map format (.hmap).
+
+Layout, all little-endian:
+
+    header        MAGIC, version, flags, record counts and section offsets
+    node table    fixed-width NODE records, one per node, in file order
+    keyword refs  uint32 string indices, each node owns a contiguous run
+    edge array    uint32 (source, target) node-table index pairs
+    string index  uint64 offsets into the string data, string_count + 1
+    string data   UTF-8 bytes of every distinct string
+
+Every text field (ids, titles, descriptions, keywords, colors, image
+paths) is an index into the deduplicated string table; NONE marks a
+missing value. Loading memory-maps the file and decodes records straight
+from the tables.
+
+Version 2 added per-node flags in bytes that version 1 left as padding
+and never promised to zero, so they are only read from version 2 files.
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+MAGIC = b'HMAP'
+VERSION = 2
+NONE = 0xFFFFFFFF
+SHAPES = ('oval', 'rectangle', 'triangle')
+_BIG_ENDIAN = sys.byteorder == 'big'
+
+# magic, version, flags, node/edge/string/keyword-ref counts, section offsets
+HEADER = struct.Struct('<4sHHIIIIQQQQQ')
+# id, x, y, color, shape, flags, title, description, image, keyword start, keyword count
+NODE = struct.Struct('<IddIBB2xIIIII')
+# Node flags, from version 2 on
+FLAG_COLLAPSED = 0x01
+FLAGS_VERSION = 2
+EDGE = struct.Struct('<II')
+OFFSET = struct.Struct('<Q')
+
+
+def is_hmap_file(file_path):
+    """Return True if the file starts with the .hmap magic bytes."""
+    with open(file_path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class _StringTable:
+    """Deduplicating string pool built while writing."""
+
+    def __init__(self):
+        self.index = {}
+        self.data = []
+
+    def add(self, value, optional=False):
+        if value is None and optional:
+            return NONE
+        if not isinstance(value, str):
+            raise ValueError(f"Cannot store {value!r} in .hmap: expected a string")
+        idx = self.index.get(value)
+        if idx is None:
+            idx = self.index[value] = len(self.data)
+            self.data.append(value.encode('utf-8'))
+        return idx
+
+
+def write_hmap(file_path, nodes, connections):
+    """
+    Write a mind map in the binary .hmap format.
+
+    Args:
+        file_path (str): Destination path
+        nodes (iterable): Node dictionaries
+        connections (iterable): (source_id, target_id) tuples; pairs with
+            unknown endpoints are dropped
+    """
+    temp_path = file_path + '.tmp'
+    try:
+        strings = _StringTable()
+        keyword_refs = array('I')
+        node_index = {}
+
+        with open(temp_path, 'wb') as f:
+            f.write(b'\0' * HEADER.size)
+            node_offset = f.tell()
+
+            # Node table, streamed straight to disk
+            node_count = 0
+            for node_data in nodes:
+                shape = node_data.get('shape', 'oval')
+                if shape not in SHAPES:
+                    raise ValueError(f"Cannot store shape {shape!r} in .hmap")
+                keywords = node_data.get('keywords') or []
+                position = node_data.get('position') or {}
+                node_index[node_data['id']] = node_count
+                f.write(NODE.pack(
+                    strings.add(node_data['id']),
+                    float(position.get('x', 0)),
+                    float(position.get('y', 0)),
+                    strings.add(node_data['color']),
+                    SHAPES.index(shape),
+                    FLAG_COLLAPSED if node_data.get('collapsed') else 0,
+                    strings.add(node_data['title']),
+                    strings.add(node_data.get('description', ''), optional=True),
+                    strings.add(node_data.get('image'), optional=True),
+                    len(keyword_refs),
+                    len(keywords)
+                ))
+                keyword_refs.extend(strings.add(keyword) for keyword in keywords)
+                node_count += 1
+
+            keyword_offset = f.tell()
+            if _BIG_ENDIAN:
+                keyword_refs.byteswap()
+            keyword_refs.tofile(f)
+
+            # Edge array of node-table indices
+            edge_offset = f.tell()
+            edges = array('I')
+            for source_id, target_id in connections:
+                source = node_index.get(source_id)
+                target = node_index.get(target_id)
+                if source is not None and target is not None:
+                    edges.append(source)
+                    edges.append(target)
+            edge_count = len(edges) // 2
+            if _BIG_ENDIAN:
+                edges.byteswap()
+            edges.tofile(f)
+
+            # String index and data
+            string_offset = f.tell()
+            offsets = array('Q', [0])
+            total = 0
+            for data in strings.data:
+                total += len(data)
+                offsets.append(total)
+            if _BIG_ENDIAN:
+                offsets.byteswap()
+            offsets.tofile(f)
+            data_offset = f.tell()
+            f.writelines(strings.data)
+
+            f.seek(0)
+            f.write(HEADER.pack(
+                MAGIC, VERSION, 0,
+                node_count, edge_count, len(strings.data), len(keyword_refs),
+                node_offset, keyword_offset, edge_offset, string_offset, data_offset
+            ))
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def iter_hmap_records(file_path, chunk_size=1000, progress=None):
+    """
+    Read a .hmap file through a memory map.
+
+    Yields ('nodes', [node dictionaries]) batches followed by
+    ('connections', [(source_id, target_id), ...]) batches, matching
+    json_stream.iter_records.
+
+    Args:
+        file_path (str): Path to the .hmap file
+        chunk_size (int): Maximum records per batch
+        progress (callable): Optional; called before each batch is yielded
+            with the fraction of records decoded so far
+    """
+    with open(file_path, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ValueError("Invalid file format: empty file")
+    try:
+        if mm.size() < HEADER.size:
+            raise ValueError("Invalid file format: truncated header")
+        (magic, version, _flags,
+         node_count, edge_count, string_count, keyword_count,
+         node_offset, keyword_offset, edge_offset,
+         string_offset, data_offset) = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise ValueError("Invalid file format: not a .hmap file")
+        if version > VERSION:
+            raise ValueError(f"Unsupported .hmap version {version}")
+        if data_offset > mm.size():
+            raise ValueError("Invalid file format: truncated file")
+        # Version 1 node records hold padding where the flags are now
+        flag_mask = 0xFF if version >= FLAGS_VERSION else 0
+        total = (node_count + edge_count) or 1
+        report = progress or (lambda fraction: None)
+
+        cache = {}
+
+        def string(idx):
+            if idx == NONE:
+                return None
+            value = cache.get(idx)
+            if value is None:
+                if idx >= string_count:
+                    raise ValueError("Invalid file format: bad string index")
+                start, = OFFSET.unpack_from(mm, string_offset + idx * OFFSET.size)
+                end, = OFFSET.unpack_from(mm, string_offset + (idx + 1) * OFFSET.size)
+                value = str(mm[data_offset + start:data_offset + end], 'utf-8')
+                # Colors and keywords repeat across nodes; long text rarely does
+                if end - start <= 64:
+                    cache[idx] = value
+            return value
+
+        ids = []
+        batch = []
+        for i in range(node_count):
+            (id_idx, x, y, color_idx, shape, flags, title_idx, desc_idx, image_idx,
+             keyword_start, keyword_len) = NODE.unpack_from(mm, node_offset + i * NODE.size)
+            keywords = [
+                string(idx) for idx in struct.unpack_from(
+                    f'<{keyword_len}I', mm, keyword_offset + keyword_start * 4)
+            ] if keyword_len else []
+            node_id = string(id_idx)
+            ids.append(node_id)
+            record = {
+                'id': node_id,
+                'title': string(title_idx),
+                'description': string(desc_idx),
+                'keywords': keywords,
+                'color': string(color_idx),
+                'shape': SHAPES[shape] if shape < len(SHAPES) else SHAPES[0],
+                'image': string(image_idx),
+                'position': {'x': x, 'y': y}
+            }
+            if flags & flag_mask & FLAG_COLLAPSED:
+                record['collapsed'] = True
+            batch.append(record)
+            if len(batch) >= chunk_size:
+                report((i + 1) / total)
+                yield 'nodes', batch
+                batch = []
+        if batch:
+            report(node_count / total)
+            yield 'nodes', batch
+
+        for start in range(0, edge_count, chunk_size):
+            count = min(chunk_size, edge_count - start)
+            flat = struct.unpack_from(f'<{count * 2}I', mm, edge_offset + start * EDGE.size)
+            report((node_count + start + count) / total)
+            yield 'connections', [(ids[flat[j]], ids[flat[j + 1]])
+                                  for j in range(0, len(flat), 2)]
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid file format: corrupt .hmap ({e})")
+    finally:
+        mm.close()
+
@@ -1,92 +1,178 @@
-import json
-from PySide6.QtWidgets import QMessageBox
+from controllers.json_stream import node_to_record, write_map, iter_records
+from controllers.hmap_format import write_hmap, iter_hmap_records, is_hmap_file
+from controllers.model import MindMap
 
-def export_data(idea_nodes, connections, file_path):
+HMAP_EXTENSION = '.hmap'
+
+def open_records(file_path, chunk_size=1000, progress=None, malformed=None):
+    """
+    Stream (section, records) batches from a JSON or .hmap file.
+    
+    The format is detected from the file's leading bytes. progress, if
+    given, is called with the fraction of the file processed so far.
+    Malformed JSON entries are handled as by iter_records; .hmap
+    records cannot be malformed.
+    """
+    if is_hmap_file(file_path):
+        return iter_hmap_records(file_path, chunk_size, progress=progress)
+    return iter_records(file_path, chunk_size, progress=progress, malformed=malformed)
+
+def write_records(file_path, nodes, connections, compact=False):
+    """
+    Write node and connection records in the format implied by file_path.
+    
+    Args:
+        file_path (str): Destination; a .hmap extension selects the binary format
+        nodes (iterable): Node dictionaries
+        connections (iterable): (source_id, target_id) tuples
+        compact (bool): Unindented JSON output (ignored for .hmap)
+    """
+    if file_path.lower().endswith(HMAP_EXTENSION):
+        write_hmap(file_path, nodes, connections)
+    else:
+        write_map(file_path, nodes, connections, compact=compact)
+
+def convert_file(source_path, target_path, compact=False):
+    """
+    Convert a mind map between JSON and .hmap without loss.
+    
+    Both writers take every node before the first connection, so node
+    records are streamed and so are connections that follow the nodes
+    section, as they do in files this application writes. Only a
+    connections section stored before the nodes is buffered.
+    
+    Returns:
+        tuple: (nodes, connections) read from the source
+    """
+    chunks = open_records(source_path)
+    buffered = []
+    counts = [0, 0]
+    
+    def nodes():
+        seen_nodes = False
+        for section, records in chunks:
+            if section == 'nodes':
+                seen_nodes = True
+                counts[0] += len(records)
+                yield from records
+            elif seen_nodes:
+                # The nodes section is over; the rest is streamed
+                buffered.extend(records)
+                return
+            else:
+                buffered.extend(records)
+    
+    def connections():
+        counts[1] += len(buffered)
+        yield from buffered
+        for section, records in chunks:
+            if section == 'nodes':
+                raise ValueError("Invalid file format: nodes after connections")
+            counts[1] += len(records)
+            yield from records
+    
+    write_records(target_path, nodes(), connections(), compact=compact)
+    return tuple(counts)
+
+def load_map(file_path, chunk_size=1000, progress=None):
+    """
+    Read a JSON or .hmap file into a headless MindMap.
+    
+    Args:
+        file_path (str): Path to the file
+        chunk_size (int): Records decoded per batch
+        progress (callable): Optional; called with the fraction read so far
+    
+    Returns:
+        MindMap: The loaded map
+    """
+    return MindMap().load_chunks(open_records(file_path, chunk_size, progress=progress))
+
+def save_map(mind_map, file_path, compact=False):
     """
-    Export the mind map data to a JSON file.
+    Write a MindMap in the format implied by file_path.
     
     Args:
-        idea_nodes (list): List of IdeaNode objects
-        connections (list): List of (source_id, target_id) tuples
-        file_path (str): Path to save the JSON file
-    """
-    try:
-        data = {
-            "nodes": [],
-            "connections": []
-        }
-        
-        # Export nodes
-        for node in idea_nodes:
-            node_data = {
-                "id": node.id,
-                "title": node.title,
-                "description": node.description,
-                "keywords": node.keywords,
-                "color": node.color,
-                "shape": node.shape_type,
-                "image": node.image_path,
-                "position": {
-                    "x": node.scenePos().x(),
-                    "y": node.scenePos().y()
-                }
-            }
-            data["nodes"].append(node_data)
-        
-        # Export connections
-        for source_id, target_id in connections:
-            data["connections"].append({
-                "source": source_id,
-                "target": target_id
-            })
-        
-        # Write to file
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-            
-        QMessageBox.information(None, "Export Successful", 
-                              f"Mind map exported to:\n{file_path}")
-                              
-    except Exception as e:
-        QMessageBox.critical(None, "Export Error", str(e))
-        raise
+        mind_map (MindMap): Map to save
+        file_path (str): Destination; a .hmap extension selects the binary format
+        compact (bool): Unindented JSON output (ignored for .hmap)
+    """
+    write_records(file_path, mind_map.records(), mind_map.iter_edges(), compact=compact)
+
+def export_data(idea_nodes, connections, file_path, compact=False):
+    """
+    Export the mind map data to a JSON or .hmap file.
+    
+    Nodes and connections are streamed to disk as they are walked, so
+    peak memory does not grow with the size of the map.
+    
+    Args:
+        idea_nodes (iterable): Model Nodes or IdeaNode objects
+        connections (iterable): (source_id, target_id) tuples
+        file_path (str): Path to save to; a .hmap extension selects the
+            binary format
+        compact (bool): Write unindented JSON, one record per line
+    
+    Raises:
+        OSError: If the file cannot be written
+        ValueError: If a record cannot be stored in the chosen format
+    """
+    write_records(file_path, (node_to_record(node) for node in idea_nodes),
+                  connections, compact=compact)
+
+def read_data(file_path):
+    """
+    Read and validate a whole mind map file.
+    
+    Args:
+        file_path (str): Path to the JSON or .hmap file
+    
+    Returns:
+        tuple: (node dictionaries, (source_id, target_id) tuples)
+    """
+    sections = {"nodes": [], "connections": []}
+    for section, records in open_records(file_path):
+        sections[section].extend(records)
+    return sections["nodes"], sections["connections"]
 
 def import_data(file_path, add_node_callback, add_connection_callback):
     """
-    Import mind map data from a JSON file.
+    Import mind map data from a JSON or .hmap file.
     
     Args:
-        file_path (str): Path to the JSON file
+        file_path (str): Path to the file
         add_node_callback (callable): Function to add nodes
         add_connection_callback (callable): Function to add connections
+    
+    Raises:
+        OSError: If the file cannot be read
+        ValueError: If the file is not a valid mind map
+    """
+    nodes, connections = read_data(file_path)
+    
+    # Import nodes
+    for node_data in nodes:
+        add_node_callback(node_data)
+    
+    # Import connections
+    for source_id, target_id in connections:
+        add_connection_callback(source_id, target_id)
+
+def load_file(file_path, load_callback):
+    """
+    Bulk-import a mind map file, streaming records in chunks.
+    
+    Args:
+        file_path (str): Path to the JSON or .hmap file
+        load_callback (callable): Takes an iterable of (section, records)
+            batches and returns a dict of phase timings, e.g.
+            CanvasWidget.load_chunks
+    
+    Returns:
+        dict: Seconds spent per phase
+    
+    Raises:
+        OSError: If the file cannot be read
+        ValueError: If the file is not a valid mind map
     """
-    try:
-        # Read and parse JSON
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Validate basic structure
-        if not isinstance(data, dict):
-            raise ValueError("Invalid file format: root must be an object")
-        if "nodes" not in data or "connections" not in data:
-            raise ValueError("Invalid file format: missing required sections")
-        
-        # Import nodes
-        for node_data in data.get("nodes", []):
-            add_node_callback(node_data)
-        
-        # Import connections
-        for conn_data in data.get("connections", []):
-            if not isinstance(conn_data, dict):
-                continue
-            if "source" not in conn_data or "target" not in conn_data:
-                continue
-            
-            add_connection_callback(conn_data["source"], conn_data["target"])
-        
-        QMessageBox.information(None, "Import Successful", 
-                              f"Mind map imported from:\n{file_path}")
-                              
-    except Exception as e:
-        QMessageBox.critical(None, "Import Error", str(e))
-        raise
+    return load_callback(open_records(file_path))
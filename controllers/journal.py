@@ -0,0 +1,188 @@
+"""
+Append-only autosave journal.
+
+A session directory holds numbered generations:
+
+    snapshot-<n>.json   the full map as it was when generation n started
+    journal-<n>.log     operations made during generation n, one JSON
+                        object per line
+
+Operations are buffered in memory and appended to the current journal in
+batches, each batch fsynced, so the cost of autosaving follows the edit
+rate rather than the map size. Compaction starts a new generation: new
+operations go to the next journal while the caller writes that
+generation's snapshot in the background, and only once the snapshot is
+in place are older generations deleted. Snapshots are written under a
+temporary name and renamed once complete. After a crash at any point the
+newest complete snapshot plus every journal from its generation on
+rebuilds the map. A generation whose starting state the older ones do
+not describe, such as one started right after a bulk load that was
+never journaled, opens with a barrier operation; until its own snapshot
+is complete, recovery stops before it. A torn last line, from a crash
+mid-write, is ignored.
+"""
+import json
+import os
+import re
+
+_FILE_NAME = re.compile(r'^(snapshot|journal)-(\d+)\.(json|log)$')
+TEMPORARY_SUFFIX = '.tmp'
+BARRIER = {'op': 'barrier'}
+
+
+class Journal:
+    """Buffered, generation-numbered operation log in one directory."""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        generations = self._generations()
+        self.generation = max(generations) if generations else 0
+        self._pending = []
+        self._file = None
+        path = self.journal_path(self.generation)
+        self.size = os.path.getsize(path) if os.path.exists(path) else 0
+
+    def _generations(self):
+        """Return {generation: set of 'snapshot'/'journal'} for the directory."""
+        found = {}
+        for name in os.listdir(self.directory):
+            match = _FILE_NAME.match(name)
+            if match:
+                found.setdefault(int(match.group(2)), set()).add(match.group(1))
+        return found
+
+    def snapshot_path(self, generation):
+        return os.path.join(self.directory, f"snapshot-{generation}.json")
+
+    def temporary_snapshot_path(self, generation):
+        """Where a snapshot is written before complete_snapshot() moves it into place."""
+        return self.snapshot_path(generation) + TEMPORARY_SUFFIX
+
+    def complete_snapshot(self, generation):
+        os.replace(self.temporary_snapshot_path(generation), self.snapshot_path(generation))
+
+    def journal_path(self, generation):
+        return os.path.join(self.directory, f"journal-{generation}.log")
+
+    @property
+    def pending(self):
+        """Number of operations not yet written."""
+        return len(self._pending)
+
+    def append(self, op):
+        """Buffer one operation dictionary."""
+        self._pending.append(json.dumps(op, ensure_ascii=False, separators=(',', ':')))
+
+    def flush(self):
+        """Append buffered operations to the journal and sync them to disk.
+
+        Returns:
+            int: Number of operations written
+        """
+        count = len(self._pending)
+        if not count:
+            return 0
+        if self._file is None:
+            self._file = open(self.journal_path(self.generation), 'a', encoding='utf-8')
+        data = '\n'.join(self._pending) + '\n'
+        self._pending = []
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.size += len(data)
+        return count
+
+    def start_generation(self, barrier=False):
+        """Flush and switch to a new generation.
+
+        Args:
+            barrier (bool): The new generation cannot be rebuilt from the
+                older ones; recovery skips it until its snapshot is complete
+
+        Returns:
+            int: The new generation; its snapshot is the caller's to write
+        """
+        self.flush()
+        self._close_file()
+        self.generation += 1
+        self.size = 0
+        if barrier:
+            self.append(BARRIER)
+            self.flush()
+        return self.generation
+
+    def finish_compaction(self, generation):
+        """Delete everything older than a generation whose snapshot is complete."""
+        for old, kinds in self._generations().items():
+            if old < generation:
+                for kind in kinds:
+                    path = self.snapshot_path(old) if kind == 'snapshot' else self.journal_path(old)
+                    os.remove(path)
+        # Snapshots a crash left half written
+        for name in os.listdir(self.directory):
+            match = _FILE_NAME.match(name[:-len(TEMPORARY_SUFFIX)])
+            if name.endswith(TEMPORARY_SUFFIX) and match and int(match.group(2)) < generation:
+                os.remove(os.path.join(self.directory, name))
+
+    def has_session(self):
+        """Whether the directory holds anything to recover."""
+        for generation, kinds in self._generations().items():
+            if 'snapshot' in kinds or os.path.getsize(self.journal_path(generation)):
+                return True
+        return False
+
+    def recovery_plan(self):
+        """
+        Work out how to rebuild the last session.
+
+        Returns:
+            tuple: (snapshot path or None, [journal paths in replay order])
+        """
+        generations = self._generations()
+        snapshots = [g for g, kinds in generations.items() if 'snapshot' in kinds]
+        start = max(snapshots) if snapshots else min(generations, default=0)
+        journals = []
+        for g in sorted(generations):
+            if g < start or 'journal' not in generations[g]:
+                continue
+            path = self.journal_path(g)
+            if (g > start or not snapshots) and self._starts_with_barrier(path):
+                break
+            journals.append(path)
+        return (self.snapshot_path(start) if snapshots else None), journals
+
+    @classmethod
+    def _starts_with_barrier(cls, path):
+        for op in cls.read_ops(path):
+            return op == BARRIER
+        return False
+
+    @staticmethod
+    def read_ops(path):
+        """Yield the operations in a journal file, stopping at a torn tail."""
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    return
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    return
+
+    def discard(self):
+        """Delete the whole session and start again from generation 0."""
+        self._pending = []
+        self._close_file()
+        self.finish_compaction(float('inf'))
+        self.generation = 0
+        self.size = 0
+
+    def close(self):
+        self.flush()
+        self._close_file()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
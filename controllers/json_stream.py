@@ -0,0 +1,241 @@
+import json
+import os
+import re
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Keys a node record cannot be loaded without
+_NODE_KEYS = ('id', 'title', 'color', 'shape')
+
+
+def node_to_record(node):
+    """Convert a model Node, or an IdeaNode showing one, into a plain dictionary."""
+    return node.to_record()
+
+
+def write_map(file_path, nodes, connections, compact=False, batch_size=1000):
+    """
+    Write a mind map incrementally, one record at a time.
+
+    Records are serialized as they are pulled from the iterables, so the
+    full document is never held in memory. The file is written next to
+    the destination and moved into place once complete.
+
+    Args:
+        file_path (str): Destination path
+        nodes (iterable): Node dictionaries
+        connections (iterable): (source_id, target_id) tuples
+        compact (bool): Emit one unindented record per line instead of
+            the layout json.dump(indent=4) produces
+        batch_size (int): Records serialized per write call
+    """
+    if compact:
+        dumps = lambda record: json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+        layout = ('{"nodes":[', '],"connections":[', ']}\n', '\n', ',\n', '\n')
+    else:
+        def dumps(record):
+            text = json.dumps(record, indent=4, ensure_ascii=False)
+            return '        ' + text.replace('\n', '\n        ')
+        layout = ('{\n    "nodes": [', '],\n    "connections": [', ']\n}', '\n', ',\n', '\n    ')
+    # An empty section is written as [], as json.dump does
+    opening, middle, closing, before, separator, after = layout
+
+    def write_section(f, records):
+        batch = []
+        first = True
+        for record in records:
+            batch.append(dumps(record))
+            if len(batch) >= batch_size:
+                f.write((before if first else separator) + separator.join(batch))
+                first = False
+                batch = []
+        if batch:
+            f.write((before if first else separator) + separator.join(batch))
+            first = False
+        if not first:
+            f.write(after)
+
+    temp_path = file_path + '.tmp'
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(opening)
+            write_section(f, nodes)
+            f.write(middle)
+            write_section(f, ({"source": source_id, "target": target_id}
+                              for source_id, target_id in connections))
+            f.write(closing)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class _StreamParser:
+    """Pull-based parser over a text file for the mind map document layout."""
+
+    def __init__(self, f, read_size):
+        self.f = f
+        self.read_size = read_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self, min_size=0):
+        """Append more text to the buffer, dropping what was consumed."""
+        if self.eof:
+            return False
+        chunk = self.f.read(max(self.read_size, min_size))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Skip whitespace and return the next character, or '' at EOF."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char, message):
+        if self.peek() != char:
+            raise ValueError(f"Invalid file format: {message}")
+        self.pos += 1
+
+    def value(self):
+        """Decode one complete JSON value at the cursor."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number touching the end of the buffer may continue
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow geometrically so large values are not re-parsed too often
+            if not self.fill(len(self.buf) - self.pos):
+                self.eof = True
+
+
+def _node_problem(node_data):
+    """Describe why a node entry cannot be loaded at all, or return None."""
+    if not isinstance(node_data, dict):
+        return "node record is not an object"
+    for key in _NODE_KEYS:
+        if key not in node_data:
+            return f"node record without {key!r}"
+    return None
+
+
+def _connection_pair(conn_data):
+    if not isinstance(conn_data, dict):
+        return None
+    if "source" not in conn_data or "target" not in conn_data:
+        return None
+    return conn_data["source"], conn_data["target"]
+
+
+def iter_records(file_path, chunk_size=1000, read_size=1 << 16, progress=None, malformed=None):
+    """
+    Incrementally read a mind map JSON file.
+
+    Yields ('nodes', [node dictionaries]) and
+    ('connections', [(source_id, target_id), ...]) batches of at most
+    chunk_size records, in file order. Malformed connection entries are
+    skipped, as in import_data. A node entry that is not an object with
+    an id, title, color and shape raises ValueError, unless malformed is
+    given, in which case it is skipped like a bad connection.
+
+    A missing section is only noticed at the end of the file, after the
+    batches before it have been yielded; callers that build from the
+    batches as they arrive must undo them on ValueError, as
+    MindMap.load_chunks and CanvasWidget.load_chunks do.
+
+    Args:
+        file_path (str): Path to the JSON file
+        chunk_size (int): Maximum records per batch
+        read_size (int): Characters read from disk at a time
+        progress (callable): Optional; called before each batch is yielded
+            with the fraction of the file read so far
+        malformed (list): Optional; receives a (section, entry) pair for
+            every skipped entry
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        size = os.fstat(f.fileno()).st_size or 1
+
+        def report():
+            if progress:
+                progress(min(f.buffer.tell() / size, 1.0))
+
+        parser = _StreamParser(f, read_size)
+        if parser.peek() != '{':
+            raise ValueError("Invalid file format: root must be an object")
+        parser.pos += 1
+
+        sections = set()
+        if parser.peek() == '}':
+            parser.pos += 1
+        else:
+            while True:
+                key = parser.value()
+                if not isinstance(key, str):
+                    raise ValueError("Invalid file format: expected a key")
+                parser.expect(':', "expected ':' after key")
+
+                if key in ("nodes", "connections"):
+                    sections.add(key)
+                    parser.expect('[', f"'{key}' must be a list")
+                    batch = []
+                    if parser.peek() == ']':
+                        parser.pos += 1
+                    else:
+                        while True:
+                            record = parser.value()
+                            if key == "connections":
+                                pair = _connection_pair(record)
+                                if pair is None and malformed is not None:
+                                    malformed.append((key, record))
+                                record = pair
+                            else:
+                                problem = _node_problem(record)
+                                if problem:
+                                    if malformed is None:
+                                        raise ValueError(f"Invalid file format: {problem}")
+                                    malformed.append((key, record))
+                                    record = None
+                            if record is not None:
+                                batch.append(record)
+                                if len(batch) >= chunk_size:
+                                    report()
+                                    yield key, batch
+                                    batch = []
+                            char = parser.peek()
+                            parser.pos += 1
+                            if char == ']':
+                                break
+                            if char != ',':
+                                raise ValueError(f"Invalid file format: malformed '{key}' list")
+                    if batch:
+                        report()
+                        yield key, batch
+                else:
+                    # Unknown sections are decoded and discarded
+                    parser.value()
+
+                char = parser.peek()
+                parser.pos += 1
+                if char == '}':
+                    break
+                if char != ',':
+                    raise ValueError("Invalid file format: malformed root object")
+
+        if sections != {"nodes", "connections"}:
+            raise ValueError("Invalid file format: missing required sections")
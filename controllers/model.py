@@ -0,0 +1,366 @@
+"""
+Headless mind map model.
+
+MindMap holds the nodes and connections of a map as plain Python
+objects, with no dependency on Qt, so maps can be loaded, transformed
+and saved without a QApplication. A view subscribes with add_listener()
+and is told about every change through whichever of these methods it
+defines:
+
+    node_added(node)                    node_removed(node)
+    node_changed(node)                  node_moved(node)
+    edge_added(source_id, target_id)    edge_removed(source_id, target_id)
+    cleared()
+
+A removed node takes its connections with it; only node_removed is
+reported for them. Collapsing a node is a node change; hidden_nodes()
+works out what the collapsed subtrees hide.
+"""
+
+
+class Node:
+    """One idea: its text, look, image, top-left position and whether its subtree is collapsed."""
+
+    __slots__ = ('id', 'title', 'description', 'keywords', 'color', 'shape', 'image', 'x', 'y',
+                 'collapsed')
+
+    def __init__(self, node_id, title, description='', keywords=None, color='#FFFFFF',
+                 shape='oval', image=None, x=0.0, y=0.0, collapsed=False):
+        self.id = node_id
+        self.title = title
+        self.description = description
+        self.keywords = keywords if keywords is not None else []
+        self.color = color
+        self.shape = shape.lower()
+        self.image = image
+        self.x = x
+        self.y = y
+        self.collapsed = collapsed
+
+    @classmethod
+    def from_record(cls, record):
+        """Build a node from a plain dictionary as stored in map files."""
+        position = record.get('position') or {}
+        return cls(
+            record['id'],
+            record['title'],
+            record.get('description', ''),
+            record.get('keywords', []),
+            record['color'],
+            record['shape'],
+            record.get('image'),
+            position.get('x', 0),
+            position.get('y', 0),
+            bool(record.get('collapsed', False))
+        )
+
+    def to_record(self):
+        """Convert to a plain, JSON-serializable dictionary."""
+        record = {
+            "id": self.id,
+            "title": self.title,
+            "description": self.description,
+            "keywords": self.keywords,
+            "color": self.color,
+            "shape": self.shape,
+            "image": self.image,
+            "position": {
+                "x": self.x,
+                "y": self.y
+            }
+        }
+        # Only written when set, so most records keep the plain layout
+        if self.collapsed:
+            record["collapsed"] = True
+        return record
+
+    def update(self, data):
+        """Take the text, look and image, and the collapsed flag if present, from a node dictionary."""
+        self.title = data['title']
+        self.description = data.get('description', '')
+        self.keywords = data.get('keywords', [])
+        self.color = data['color']
+        self.shape = data['shape'].lower()
+        self.image = data.get('image')
+        self.collapsed = bool(data.get('collapsed', self.collapsed))
+
+
+class MindMap:
+    """Nodes by id plus directed connections, with change notifications."""
+
+    def __init__(self):
+        self.nodes = {}
+        # Node id -> set of ids it connects to / is connected from
+        self.outgoing = {}
+        self.incoming = {}
+        self.edge_count = 0
+        self._listeners = []
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, event, *args):
+        for listener in self._listeners:
+            handler = getattr(listener, event, None)
+            if handler is not None:
+                handler(*args)
+
+    # Nodes
+
+    def add_node(self, node):
+        """
+        Add a node.
+
+        Returns:
+            Node: The node, or None if its id is already taken
+        """
+        if node.id in self.nodes:
+            return None
+        self.nodes[node.id] = node
+        self.outgoing[node.id] = set()
+        self.incoming[node.id] = set()
+        self._notify('node_added', node)
+        return node
+
+    def add_records(self, records):
+        """
+        Add nodes from plain dictionaries, skipping ids already present.
+
+        Returns:
+            list: The Nodes added
+        """
+        added = []
+        for record in records:
+            if record['id'] not in self.nodes:
+                added.append(self.add_node(Node.from_record(record)))
+        return added
+
+    def remove_node(self, node_id):
+        """
+        Remove a node and every connection that touches it.
+
+        Returns:
+            Node: The removed node, or None if there was none
+        """
+        node = self.nodes.pop(node_id, None)
+        if node is None:
+            return None
+        for target_id in self.outgoing.pop(node_id):
+            if target_id != node_id:
+                self.incoming[target_id].discard(node_id)
+            self.edge_count -= 1
+        for source_id in self.incoming.pop(node_id):
+            if source_id != node_id:
+                self.outgoing[source_id].discard(node_id)
+                self.edge_count -= 1
+        self._notify('node_removed', node)
+        return node
+
+    def update_node(self, node_id, data):
+        """
+        Change a node's text, look and image; unknown ids are ignored.
+
+        Args:
+            node_id (str): Node to change
+            data (dict): Node dictionary with the new values
+
+        Returns:
+            Node: The changed node, or None
+        """
+        node = self.nodes.get(node_id)
+        if node is None:
+            return None
+        node.update(data)
+        self._notify('node_changed', node)
+        return node
+
+    def set_collapsed(self, node_id, collapsed):
+        """Collapse or expand a node's subtree; reported as a node change."""
+        node = self.nodes.get(node_id)
+        if node is None or node.collapsed == collapsed:
+            return
+        node.collapsed = collapsed
+        self._notify('node_changed', node)
+
+    def move_node(self, node_id, x, y):
+        """Move a node's top-left corner; unknown ids and no-op moves are ignored."""
+        node = self.nodes.get(node_id)
+        if node is None or (node.x == x and node.y == y):
+            return
+        node.x = x
+        node.y = y
+        self._notify('node_moved', node)
+
+    # Connections
+
+    def add_edge(self, source_id, target_id):
+        """
+        Connect two nodes.
+
+        Returns:
+            bool: False if an endpoint is missing or the connection exists
+        """
+        targets = self.outgoing.get(source_id)
+        if targets is None or target_id not in self.nodes or target_id in targets:
+            return False
+        targets.add(target_id)
+        self.incoming[target_id].add(source_id)
+        self.edge_count += 1
+        self._notify('edge_added', source_id, target_id)
+        return True
+
+    def add_edges(self, pairs, pending=None):
+        """
+        Add (source_id, target_id) connections.
+
+        Pairs with an endpoint not loaded yet are appended to pending if
+        given, and dropped otherwise.
+
+        Returns:
+            int: Number of connections added
+        """
+        nodes = self.nodes
+        count = 0
+        for source_id, target_id in pairs:
+            if source_id in nodes and target_id in nodes:
+                count += self.add_edge(source_id, target_id)
+            elif pending is not None:
+                pending.append((source_id, target_id))
+        return count
+
+    def remove_edge(self, source_id, target_id):
+        """Remove a connection; returns False if there was none."""
+        targets = self.outgoing.get(source_id)
+        if not targets or target_id not in targets:
+            return False
+        targets.discard(target_id)
+        self.incoming[target_id].discard(source_id)
+        self.edge_count -= 1
+        self._notify('edge_removed', source_id, target_id)
+        return True
+
+    def has_edge(self, source_id, target_id):
+        return target_id in self.outgoing.get(source_id, ())
+
+    def edges_of(self, node_id):
+        """Return the (source_id, target_id) connections touching a node."""
+        edges = [(node_id, target_id) for target_id in self.outgoing.get(node_id, ())]
+        edges.extend((source_id, node_id) for source_id in self.incoming.get(node_id, ())
+                     if source_id != node_id)
+        return edges
+
+    def iter_edges(self):
+        """Yield (source_id, target_id) for every connection."""
+        for source_id, targets in self.outgoing.items():
+            for target_id in targets:
+                yield source_id, target_id
+
+    def hidden_nodes(self):
+        """
+        Work out which nodes the collapsed subtrees hide.
+
+        A node is hidden when it can be reached from a collapsed node and
+        every connection into it comes from a collapsed or hidden node;
+        a node that also hangs off an expanded, visible node stays visible.
+        Each hidden node is credited to one visible collapsed node, and
+        hidden nodes that no visible one leads to, such as the members of
+        a cycle of collapsed nodes, are left visible.
+
+        Returns:
+            dict: Visible collapsed node id -> list of the node ids it hides
+        """
+        outgoing, incoming = self.outgoing, self.incoming
+        collapsed = {node_id for node_id, node in self.nodes.items() if node.collapsed}
+        if not collapsed:
+            return {}
+        # Everything below a collapsed node, down to the next collapsed
+        # ones; a link back up does not hide the collapsed node itself
+        hidden = set()
+        for root_id in collapsed:
+            seen = {root_id}
+            stack = list(outgoing[root_id])
+            while stack:
+                node_id = stack.pop()
+                if node_id not in seen:
+                    seen.add(node_id)
+                    hidden.add(node_id)
+                    if node_id not in collapsed:
+                        stack.extend(outgoing[node_id])
+        # Uncover nodes with a visible, expanded parent, and then whatever
+        # hung only off them
+        stack = list(hidden)
+        while stack:
+            node_id = stack.pop()
+            if node_id in hidden and any(source_id not in hidden and source_id not in collapsed
+                                         for source_id in incoming[node_id]):
+                hidden.discard(node_id)
+                if node_id not in collapsed:
+                    stack.extend(target_id for target_id in outgoing[node_id] if target_id in hidden)
+        owners = {}
+        owned = set()
+        for node_id in collapsed:
+            if node_id in hidden:
+                continue
+            members = owners[node_id] = []
+            stack = list(outgoing[node_id])
+            while stack:
+                member_id = stack.pop()
+                if member_id in hidden and member_id not in owned:
+                    owned.add(member_id)
+                    members.append(member_id)
+                    stack.extend(outgoing[member_id])
+        return owners
+
+    # Whole map
+
+    def clear(self):
+        self.nodes.clear()
+        self.outgoing.clear()
+        self.incoming.clear()
+        self.edge_count = 0
+        self._notify('cleared')
+
+    def records(self):
+        """Yield every node as a plain dictionary, in insertion order."""
+        for node in self.nodes.values():
+            yield node.to_record()
+
+    def load_chunks(self, chunks):
+        """
+        Add the nodes and connections from a stream of record batches.
+
+        Connections may come before the nodes they refer to; pairs that
+        still have a missing endpoint at the end are dropped. If the
+        stream raises, as a reader does on finding a file malformed part
+        way through, the nodes added so far are taken out again, with
+        their connections, before the error propagates.
+
+        Args:
+            chunks (iterable): ('nodes', [node dicts]) and
+                ('connections', [(source_id, target_id)]) batches
+
+        Returns:
+            MindMap: self
+        """
+        was_empty = not self.nodes
+        added = []
+        pending = []
+        try:
+            for section, records in chunks:
+                if section == 'nodes':
+                    added.extend(node.id for node in self.add_records(records))
+                else:
+                    self.add_edges(records, pending)
+            self.add_edges(pending)
+        except BaseException:
+            if was_empty:
+                self.clear()
+            else:
+                for node_id in added:
+                    self.remove_node(node_id)
+            raise
+        return self
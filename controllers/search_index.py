@@ -0,0 +1,205 @@
+"""
+Incremental inverted index over node titles, keywords and descriptions.
+
+Every field is split into lowercase word tokens, each mapped to the set
+of node ids that contain it. A sorted vocabulary of all tokens turns a
+prefix into a contiguous range, so every query term matches as a prefix
+and results can be produced as the user types. Nodes are added, updated
+and removed one at a time; the vocabulary is only re-sorted lazily when
+a query needs it.
+"""
+import bisect
+import re
+
+FIELDS = ('title', 'keywords', 'description')
+_TOKEN = re.compile(r'\w+')
+# Above this many new tokens a full re-sort beats inserting one by one
+_RESORT_THRESHOLD = 2000
+# A query term whose postings hold more than 1/_BROAD_FRACTION of the
+# nodes, and at least _BROAD_MINIMUM ids, is checked per candidate
+# instead of intersected
+_BROAD_FRACTION = 8
+_BROAD_MINIMUM = 1000
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens."""
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+class SearchIndex:
+    """Token and prefix index from node text to node ids."""
+
+    def __init__(self):
+        self.clear()
+
+    def __len__(self):
+        return len(self.forward)
+
+    def clear(self):
+        """Forget every node."""
+        self.postings = {field: {} for field in FIELDS}
+        # Node id -> {field: frozenset of tokens}, for updates and filtering
+        self.forward = {}
+        # Number of (field, token) postings lists per token
+        self._token_refs = {}
+        self._vocabulary = []
+        self._new_tokens = []
+        self._stale_tokens = 0
+
+    def add(self, node_id, title='', description='', keywords=()):
+        """Index a node, replacing whatever was indexed under its id before."""
+        if node_id in self.forward:
+            self.remove(node_id)
+        fields = {
+            'title': frozenset(tokenize(title)),
+            'keywords': frozenset(token for keyword in keywords or () for token in tokenize(keyword)),
+            'description': frozenset(tokenize(description)),
+        }
+        self.forward[node_id] = fields
+        for field, tokens in fields.items():
+            postings = self.postings[field]
+            for token in tokens:
+                ids = postings.get(token)
+                if ids is None:
+                    ids = postings[token] = set()
+                    refs = self._token_refs.get(token, 0)
+                    self._token_refs[token] = refs + 1
+                    if not refs:
+                        self._new_tokens.append(token)
+                ids.add(node_id)
+
+    def remove(self, node_id):
+        """Drop a node from the index; unknown ids are ignored."""
+        fields = self.forward.pop(node_id, None)
+        if not fields:
+            return
+        for field, tokens in fields.items():
+            postings = self.postings[field]
+            for token in tokens:
+                ids = postings[token]
+                ids.discard(node_id)
+                if not ids:
+                    del postings[token]
+                    refs = self._token_refs[token] - 1
+                    if refs:
+                        self._token_refs[token] = refs
+                    else:
+                        # Left in the vocabulary until the next re-sort
+                        del self._token_refs[token]
+                        self._stale_tokens += 1
+
+    def _sorted_vocabulary(self):
+        """Bring the sorted vocabulary up to date and return it."""
+        vocabulary = self._vocabulary
+        new = self._new_tokens
+        if self._stale_tokens > len(vocabulary) // 2 or len(new) > _RESORT_THRESHOLD:
+            vocabulary = self._vocabulary = sorted(self._token_refs)
+            self._stale_tokens = 0
+        else:
+            for token in new:
+                i = bisect.bisect_left(vocabulary, token)
+                if i == len(vocabulary) or vocabulary[i] != token:
+                    vocabulary.insert(i, token)
+        self._new_tokens = []
+        return vocabulary
+
+    def completions(self, prefix):
+        """Return the indexed tokens that start with prefix, in sorted order."""
+        vocabulary = self._sorted_vocabulary()
+        start = bisect.bisect_left(vocabulary, prefix)
+        end = bisect.bisect_left(vocabulary, prefix + '\U0010ffff', start)
+        refs = self._token_refs
+        return [token for token in vocabulary[start:end] if token in refs]
+
+    def _posting_sets(self, tokens, limit):
+        """
+        The non-empty postings sets of tokens, over every field.
+
+        Returns:
+            list: The sets, or None as soon as they hold more than limit ids
+        """
+        sets = []
+        total = 0
+        for token in tokens:
+            for postings in self.postings.values():
+                ids = postings.get(token)
+                if ids:
+                    sets.append(ids)
+                    total += len(ids)
+                    if total > limit:
+                        return None
+        return sets
+
+    def _matches(self, node_id, tokens):
+        """Whether the node has any of tokens, in any field."""
+        return any(not field_tokens.isdisjoint(tokens) for field_tokens in self.forward[node_id].values())
+
+    def search(self, query, limit=50):
+        """
+        Find nodes matching every word of the query as a token prefix.
+
+        Title matches rank above keyword matches, which rank above
+        description matches; within a field, exact tokens come first.
+
+        Args:
+            query (str): Free text typed by the user
+            limit (int): Maximum number of ids returned
+
+        Returns:
+            list: Matching node ids, best first
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        # Selective terms are intersected through their postings sets,
+        # smallest first; a broad term would cost more to intersect than
+        # checking it on the few candidates read before limit is reached
+        broad = max(len(self.forward) // _BROAD_FRACTION, _BROAD_MINIMUM)
+        selective = []
+        wide = []
+        for term in terms:
+            tokens = self.completions(term)
+            sets = self._posting_sets(tokens, broad)
+            if sets is None:
+                wide.append(tokens)
+            elif not sets:
+                return []
+            else:
+                selective.append((sum(len(ids) for ids in sets), tokens, sets))
+        selective.sort(key=lambda item: item[0])
+        wide.sort(key=len)
+
+        allowed = None
+        if selective:
+            _, driver_tokens, sets = selective[0]
+            if len(terms) > 1:
+                allowed = set().union(*sets)
+                for _, _, sets in selective[1:]:
+                    # Each intersection costs no more than the smaller side
+                    allowed = set().union(*(allowed & ids for ids in sets))
+                    if not allowed:
+                        return []
+        else:
+            # Every term is broad: drive from the one with fewest completions
+            driver_tokens = wide.pop(0)
+        driver_tokens = sorted(driver_tokens, key=len)
+        checks = [frozenset(tokens) for tokens in wide]
+
+        results = []
+        seen = set()
+        for field in FIELDS:
+            postings = self.postings[field]
+            for token in driver_tokens:
+                ids = postings.get(token, ())
+                if allowed is not None and ids:
+                    ids = ids & allowed
+                for node_id in ids:
+                    if node_id in seen:
+                        continue
+                    seen.add(node_id)
+                    if all(self._matches(node_id, tokens) for tokens in checks):
+                        results.append(node_id)
+                        if len(results) >= limit:
+                            return results
+        return results
@@ -0,0 +1,302 @@
+"""
+Hierarchical tree layouts in linear time.
+
+tidy_tree is the Reingold-Tilford algorithm in the linear-time form
+given by Buchheim, Junger and Leipert, generalized to nodes of different
+widths: siblings and neighbouring subtrees are kept at least
+sibling_gap apart, parents are centered over their children and every
+depth gets its own row. radial_tree bends the same horizontal order
+around the root, giving each ring a radius large enough that neighbours
+on it do not overlap.
+
+Both functions take a forest as (roots, children) built with
+spanning_forest() and return node centers. They are written without
+recursion, so long chains do not hit the interpreter's recursion limit.
+"""
+import math
+
+
+def spanning_forest(node_ids, successors):
+    """
+    Extract a spanning forest from a directed graph.
+
+    Nodes without predecessors among node_ids become roots, in order; cycles
+    that are not reachable from any of them are broken at their first
+    node in node_ids order. Every node appears exactly once, under the
+    first parent that reaches it breadth-first.
+
+    Args:
+        node_ids (iterable): Node ids, in the order roots are taken
+        successors (callable): Returns the ordered child ids of a node id
+
+    Returns:
+        tuple: (roots, children) where children maps every node id to
+        its list of tree children
+    """
+    node_ids = list(node_ids)
+    has_parent = set()
+    for node_id in node_ids:
+        has_parent.update(successors(node_id))
+
+    children = {}
+    roots = []
+    for candidates in ([n for n in node_ids if n not in has_parent], node_ids):
+        for root in candidates:
+            if root in children:
+                continue
+            roots.append(root)
+            children[root] = []
+            queue = [root]
+            for node_id in queue:
+                kids = children[node_id]
+                for child in successors(node_id):
+                    if child not in children:
+                        children[child] = []
+                        kids.append(child)
+                        queue.append(child)
+    return roots, children
+
+
+class _Tree:
+    """Flat per-node arrays for the Buchheim walk; index n is a virtual root."""
+
+    def __init__(self, roots, children, sizes):
+        ids = []
+        index = {}
+        order = list(roots)
+        for node_id in order:
+            index[node_id] = len(ids)
+            ids.append(node_id)
+            order.extend(children.get(node_id, ()))
+        n = len(ids)
+        self.ids = ids
+        self.n = n
+        self.kids = [[index[c] for c in children.get(node_id, ())] for node_id in ids]
+        self.kids.append([index[r] for r in roots])
+        self.parent = [n] * (n + 1)
+        self.number = [0] * (n + 1)
+        for v, kids in enumerate(self.kids):
+            for i, w in enumerate(kids):
+                self.parent[w] = v
+                self.number[w] = i
+        self.width = [sizes[node_id][0] for node_id in ids] + [0.0]
+        self.height = [sizes[node_id][1] for node_id in ids] + [0.0]
+        # ids is in breadth-first order, so depth only needs one pass
+        self.depth = [0] * (n + 1)
+        self.depth[n] = -1
+        for v in range(n):
+            self.depth[v] = self.depth[self.parent[v]] + 1
+
+
+def _walk(tree, sibling_gap):
+    """Return the x coordinate of every node of a _Tree."""
+    n = tree.n
+    kids = tree.kids
+    parent = tree.parent
+    number = tree.number
+    width = tree.width
+    prelim = [0.0] * (n + 1)
+    mod = [0.0] * (n + 1)
+    shift = [0.0] * (n + 1)
+    change = [0.0] * (n + 1)
+    thread = [-1] * (n + 1)
+    ancestor = list(range(n + 1))
+
+    def distance(a, b):
+        return (width[a] + width[b]) / 2 + sibling_gap
+
+    def next_left(v):
+        return kids[v][0] if kids[v] else thread[v]
+
+    def next_right(v):
+        return kids[v][-1] if kids[v] else thread[v]
+
+    def left_sibling(v):
+        i = number[v]
+        return kids[parent[v]][i - 1] if i else -1
+
+    def move_subtree(wl, wr, amount):
+        subtrees = number[wr] - number[wl]
+        change[wr] -= amount / subtrees
+        shift[wr] += amount
+        change[wl] += amount / subtrees
+        prelim[wr] += amount
+        mod[wr] += amount
+
+    def apportion(v, default_ancestor):
+        w = left_sibling(v)
+        if w < 0:
+            return default_ancestor
+        vir = vor = v
+        vil = w
+        vol = kids[parent[v]][0]
+        sir = sor = mod[v]
+        sil = mod[vil]
+        sol = mod[vol]
+        while next_right(vil) >= 0 and next_left(vir) >= 0:
+            vil = next_right(vil)
+            vir = next_left(vir)
+            vol = next_left(vol)
+            vor = next_right(vor)
+            ancestor[vor] = v
+            amount = (prelim[vil] + sil) - (prelim[vir] + sir) + distance(vil, vir)
+            if amount > 0:
+                a = ancestor[vil]
+                if parent[a] != parent[v]:
+                    a = default_ancestor
+                move_subtree(a, v, amount)
+                sir += amount
+                sor += amount
+            sil += mod[vil]
+            sir += mod[vir]
+            sol += mod[vol]
+            sor += mod[vor]
+        if next_right(vil) >= 0 and next_right(vor) < 0:
+            thread[vor] = next_right(vil)
+            mod[vor] += sil - sor
+        if next_left(vir) >= 0 and next_left(vol) < 0:
+            thread[vol] = next_left(vir)
+            mod[vol] += sir - sol
+            default_ancestor = v
+        return default_ancestor
+
+    # First walk, post-order: place each node once all of its children are
+    default_ancestor = {}
+    stack = [(n, False)]
+    while stack:
+        v, expanded = stack.pop()
+        if not expanded:
+            stack.append((v, True))
+            stack.extend((w, False) for w in reversed(kids[v]))
+            if kids[v]:
+                default_ancestor[v] = kids[v][0]
+            continue
+        w = left_sibling(v) if v != n else -1
+        if kids[v]:
+            total_shift = total_change = 0.0
+            for c in reversed(kids[v]):
+                prelim[c] += total_shift
+                mod[c] += total_shift
+                total_change += change[c]
+                total_shift += shift[c] + total_change
+            midpoint = (prelim[kids[v][0]] + prelim[kids[v][-1]]) / 2
+            if w >= 0:
+                prelim[v] = prelim[w] + distance(w, v)
+                mod[v] = prelim[v] - midpoint
+            else:
+                prelim[v] = midpoint
+            del default_ancestor[v]
+        elif w >= 0:
+            prelim[v] = prelim[w] + distance(w, v)
+        if v != n:
+            p = parent[v]
+            default_ancestor[p] = apportion(v, default_ancestor[p])
+
+    # Second walk, pre-order: sum the modifiers down each path
+    x = [0.0] * (n + 1)
+    stack = [(n, 0.0)]
+    while stack:
+        v, m = stack.pop()
+        x[v] = prelim[v] + m
+        stack.extend((w, m + mod[v]) for w in kids[v])
+    return x
+
+
+def _rows(tree, level_gap):
+    """Return the y coordinate of every depth, from its tallest node."""
+    heights = []
+    for v in range(tree.n):
+        d = tree.depth[v]
+        if d == len(heights):
+            heights.append(0.0)
+        heights[d] = max(heights[d], tree.height[v])
+    rows = []
+    y = 0.0
+    for d, h in enumerate(heights):
+        if d:
+            y += (heights[d - 1] + h) / 2 + level_gap
+        rows.append(y)
+    return rows
+
+
+def tidy_tree(roots, children, sizes, level_gap=80.0, sibling_gap=40.0):
+    """
+    Lay out a forest top-down with Reingold-Tilford.
+
+    Args:
+        roots (list): Root ids, left to right
+        children (dict): Node id -> ordered child ids
+        sizes (dict): Node id -> (width, height)
+        level_gap (float): Vertical space between rows
+        sibling_gap (float): Horizontal space between neighbouring nodes
+
+    Returns:
+        dict: Node id -> (x, y) center, with the first root at (0, 0)
+    """
+    if not roots:
+        return {}
+    tree = _Tree(roots, children, sizes)
+    x = _walk(tree, sibling_gap)
+    rows = _rows(tree, level_gap)
+    origin = x[0]
+    return {node_id: (x[v] - origin, rows[tree.depth[v]])
+            for v, node_id in enumerate(tree.ids)}
+
+
+def radial_tree(roots, children, sizes, level_gap=80.0, sibling_gap=40.0):
+    """
+    Lay out a forest on concentric rings around its root.
+
+    A single root sits at the center; several roots share the first
+    ring. Angles follow the tidy-tree order, and each ring is pushed out
+    until neighbouring nodes on it are sibling_gap apart.
+
+    Args:
+        roots (list): Root ids, in angular order
+        children (dict): Node id -> ordered child ids
+        sizes (dict): Node id -> (width, height)
+        level_gap (float): Minimum radial space between rings
+        sibling_gap (float): Space between neighbouring nodes on a ring
+
+    Returns:
+        dict: Node id -> (x, y) center, with the center at (0, 0)
+    """
+    if not roots:
+        return {}
+    tree = _Tree(roots, children, sizes)
+    x = _walk(tree, sibling_gap)
+    n = tree.n
+    left = min(x[:n])
+    widest = max(tree.width[:n])
+    span = max(x[:n]) - left + widest + sibling_gap
+    angle = [2 * math.pi * (x[v] - left) / span for v in range(n)]
+
+    # Breadth-first order lists every ring left to right
+    rings = [[]] if len(roots) > 1 else []
+    for v in range(n):
+        d = tree.depth[v] + (len(roots) > 1)
+        if d == len(rings):
+            rings.append([])
+        rings[d].append(v)
+
+    def extent(v):
+        return max(tree.width[v], tree.height[v])
+
+    radii = []
+    for d, ring in enumerate(rings):
+        radius = 0.0
+        if d:
+            inner = max(map(extent, rings[d - 1])) if rings[d - 1] else 0.0
+            radius = radii[-1] + (inner + max(map(extent, ring))) / 2 + level_gap
+            if len(ring) > 1:
+                for a, b in zip(ring, ring[1:] + ring[:1]):
+                    gap = (angle[b] - angle[a]) % (2 * math.pi) or 2 * math.pi
+                    needed = ((tree.width[a] + tree.width[b]) / 2 + sibling_gap) / gap
+                    radius = max(radius, needed)
+        radii.append(radius)
+
+    positions = {}
+    for v, node_id in enumerate(tree.ids):
+        r = radii[tree.depth[v] + (len(roots) > 1)]
+        positions[node_id] = (r * math.cos(angle[v]), r * math.sin(angle[v]))
+    return positions
@@ -0,0 +1,112 @@
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+import time
+from controllers.force_layout import ForceLayout, ForceLayoutJob
+
+# GUI-thread time budget per tick for moving nodes to the latest snapshot
+APPLY_SLICE_SECONDS = 0.012
+# Nodes moved between deadline checks
+APPLY_BATCH = 200
+
+
+class AutoLayoutRunner(QObject):
+    """
+    Lay out the canvas with a force-directed layout computed off the GUI thread.
+
+    The layout runs on a worker over a snapshot of node centers and edges.
+    Each published snapshot is applied to the items in time-sliced batches,
+    round-robin, so the map animates towards the result while the UI stays
+    responsive. Nodes deleted in the meantime are skipped.
+    """
+
+    finished = Signal(bool)
+
+    def __init__(self, canvas, iterations=80, parent=None):
+        super().__init__(parent)
+        self.canvas = canvas
+        self.ids = list(canvas.nodes)
+        self.items = [canvas.nodes[node_id] for node_id in self.ids]
+        index = {node_id: i for i, node_id in enumerate(self.ids)}
+        positions = []
+        # Top-left positions before the layout, for undo
+        self.start_positions = {}
+        for node_id, node in zip(self.ids, self.items):
+            center = node.center()
+            positions.append((center.x(), center.y()))
+            self.start_positions[node_id] = (node.pos().x(), node.pos().y())
+        # Collapsed subtrees stay out of the layout and follow their root
+        edges = [(index[source_id], index[target_id])
+                 for source_id, target_id in canvas.iter_connections()
+                 if source_id in index and target_id in index]
+
+        self.job = ForceLayoutJob(ForceLayout(positions, edges, iterations=iterations))
+        self._version = 0
+        self._snapshot = None
+        self._cursor = 0
+        self._remaining = 0
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(16)
+        self._timer.timeout.connect(self._tick)
+
+    @property
+    def progress(self):
+        return self.job.progress
+
+    @property
+    def error(self):
+        return self.job.error
+
+    def moves(self):
+        """Return node id -> (old, new) top-left positions of the nodes moved so far."""
+        moves = {}
+        nodes = self.canvas.nodes
+        for node_id, old in self.start_positions.items():
+            node = nodes.get(node_id)
+            if node is not None:
+                new = (node.pos().x(), node.pos().y())
+                if new != old:
+                    moves[node_id] = (old, new)
+        return moves
+
+    def start(self):
+        self.job.start()
+        self._timer.start()
+
+    def stop(self):
+        """Cancel the layout, leaving nodes where they are now."""
+        if not self._timer.isActive():
+            return
+        self.job.cancel()
+        self._timer.stop()
+        self.finished.emit(False)
+
+    @Slot()
+    def _tick(self):
+        running = self.job.is_running()
+        version, snapshot = self.job.latest()
+        if version != self._version:
+            # Every node gets one move towards the newest snapshot
+            self._version = version
+            self._snapshot = snapshot
+            self._remaining = len(self.items)
+
+        deadline = time.perf_counter() + APPLY_SLICE_SECONDS
+        while self._remaining and time.perf_counter() < deadline:
+            self._apply_batch()
+
+        if not running and not self._remaining and self.job.latest()[0] == self._version:
+            self._timer.stop()
+            self.finished.emit(self.job.error is None and not self.job.cancelled)
+
+    def _apply_batch(self):
+        nodes = self.canvas.nodes
+        count = len(self.items)
+        for _ in range(min(APPLY_BATCH, self._remaining)):
+            i = self._cursor
+            self._cursor = (i + 1) % count
+            self._remaining -= 1
+            node = self.items[i]
+            if nodes.get(self.ids[i]) is not node:
+                continue
+            x, y = self._snapshot[i]
+            node.setPos(x - node.width / 2, y - node.height / 2)
@@ -0,0 +1,224 @@
+from PySide6.QtCore import QObject, QTimer, QStandardPaths, Slot
+import os
+from controllers.journal import Journal
+from controllers.json_stream import node_to_record
+from controllers.background_io import BackgroundWriter
+from controllers.import_export import open_records
+
+# Milliseconds between journal flushes
+FLUSH_INTERVAL_MS = 2000
+# Compact once the journal outgrows the last snapshot, but not below this
+MIN_COMPACT_BYTES = 1 << 20
+
+
+def default_directory():
+    """Per-user directory for the autosave session."""
+    base = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+    return os.path.join(base or os.path.expanduser('~/.hephaestus'), 'autosave')
+
+
+class Autosave(QObject):
+    """
+    Journal every canvas mutation and recover it after a crash.
+
+    The canvas reports changes through the node_*/connection_*/cleared
+    hooks. Operations are buffered and flushed to the journal on a timer;
+    repeated moves of a node between flushes are written once, with the
+    latest position. When the journal grows past the size of the last
+    snapshot, a new snapshot is written on a worker thread and the old
+    generation is dropped. The session is only kept for recovery after a
+    crash: a clean shutdown ends with finish(), which deletes it.
+    """
+
+    def __init__(self, canvas, directory=None, flush_interval=FLUSH_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.canvas = canvas
+        self.journal = Journal(directory or default_directory())
+        self._moves = {}
+        self._writer = None
+        self._writer_generation = None
+        # (generation, node records, connections) of a snapshot waiting
+        # for the one being written
+        self._queued_compaction = None
+        self._snapshot_size = 0
+        self.running = False
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(flush_interval)
+        self._timer.timeout.connect(self.flush)
+
+    def start(self):
+        """Begin journaling the canvas."""
+        self.canvas.autosave = self
+        self.running = True
+        self._timer.start()
+
+    def stop(self):
+        """Flush everything and stop journaling."""
+        self._timer.stop()
+        self.running = False
+        if self.canvas.autosave is self:
+            self.canvas.autosave = None
+        self.flush()
+        # A finished compaction may start the one queued behind it
+        while self._writer:
+            self._writer.wait()
+            self._check_compaction()
+        self.journal.close()
+
+    def finish(self):
+        """Stop at a clean shutdown; there is nothing to recover afterwards."""
+        self.stop()
+        self.discard()
+
+    # Canvas hooks
+
+    def node_added(self, node):
+        self.journal.append({'op': 'add', 'node': node_to_record(node)})
+
+    def node_changed(self, node):
+        # Records leave collapsed out when False, which replay would read as
+        # "unchanged", so an expand is journaled explicitly
+        self.journal.append({'op': 'edit', 'node': dict(node_to_record(node), collapsed=node.collapsed)})
+
+    def node_moved(self, node):
+        self._moves[node.id] = node
+
+    def node_deleted(self, node_id):
+        self._moves.pop(node_id, None)
+        self.journal.append({'op': 'delete', 'id': node_id})
+
+    def connection_added(self, source_id, target_id):
+        self.journal.append({'op': 'connect', 'source': source_id, 'target': target_id})
+
+    def connection_removed(self, source_id, target_id):
+        self.journal.append({'op': 'disconnect', 'source': source_id, 'target': target_id})
+
+    def cleared(self):
+        self._moves.clear()
+        self.journal.append({'op': 'clear'})
+
+    def loaded(self):
+        """A whole map was bulk-loaded; fold it into a snapshot right away."""
+        # The load itself is not journaled, so the older generations
+        # cannot rebuild anything after it
+        self.compact(loaded=True)
+
+    # Persistence
+
+    def _append_moves(self):
+        """Turn the moves collected since the last flush into operations."""
+        nodes = self.canvas.model.nodes
+        for node_id, node in self._moves.items():
+            if nodes.get(node_id) is node:
+                self.journal.append({'op': 'move', 'id': node_id, 'x': node.x, 'y': node.y})
+        self._moves.clear()
+
+    @Slot()
+    def flush(self):
+        """Write buffered operations, then compact if the journal has grown enough."""
+        self._append_moves()
+        self.journal.flush()
+        self._check_compaction()
+        if self._writer is None and self.journal.size > max(MIN_COMPACT_BYTES, self._snapshot_size):
+            self.compact()
+
+    def compact(self, loaded=False):
+        """
+        Snapshot the canvas in the background and start a new journal generation.
+
+        The snapshot's records are taken now; if an earlier snapshot is still
+        being written, this one is written once it has landed.
+
+        Args:
+            loaded (bool): The canvas was just bulk-loaded, so until this
+                snapshot is complete the session cannot be rebuilt past it
+        """
+        # The old generation must stay complete in case the snapshot fails
+        self._append_moves()
+        model = self.canvas.model
+        nodes = list(model.records())
+        connections = list(model.iter_edges())
+        generation = self.journal.start_generation(barrier=loaded)
+        # A snapshot still waiting is superseded; its generation's journal
+        # stays until this one lands
+        self._queued_compaction = (generation, nodes, connections)
+        self._start_queued_compaction()
+
+    def _start_queued_compaction(self):
+        if self._writer is not None or self._queued_compaction is None:
+            return
+        generation, nodes, connections = self._queued_compaction
+        self._queued_compaction = None
+        self._writer_generation = generation
+        self._writer = BackgroundWriter(self.journal.temporary_snapshot_path(generation), nodes,
+                                        connections, compact=True)
+        self._writer.start()
+
+    def _check_compaction(self):
+        writer = self._writer
+        if writer is None or writer.is_running():
+            return
+        self._writer = None
+        if writer.error is None:
+            self._snapshot_size = os.path.getsize(writer.file_path)
+            self.journal.complete_snapshot(self._writer_generation)
+            self.journal.finish_compaction(self._writer_generation)
+        self._start_queued_compaction()
+
+    # Recovery
+
+    def has_session(self):
+        return self.journal.has_session()
+
+    def discard(self):
+        """Forget the previous session."""
+        self._moves.clear()
+        self._queued_compaction = None
+        if self._writer:
+            self._writer.wait()
+            self._writer = None
+        self.journal.discard()
+
+    def restore(self):
+        """
+        Rebuild the previous session on the canvas.
+
+        Returns:
+            int: Number of journal operations replayed
+        """
+        canvas = self.canvas
+        hooks, canvas.autosave = canvas.autosave, None
+        try:
+            snapshot, journals = self.journal.recovery_plan()
+            canvas.clear_all()
+            if snapshot:
+                canvas.load_chunks(open_records(snapshot))
+                self._snapshot_size = os.path.getsize(snapshot)
+            count = 0
+            for path in journals:
+                for op in Journal.read_ops(path):
+                    self._replay(op)
+                    count += 1
+        finally:
+            canvas.autosave = hooks
+        return count
+
+    def _replay(self, op):
+        canvas = self.canvas
+        kind = op.get('op')
+        if kind == 'add':
+            canvas.restore_nodes([op['node']], [])
+        elif kind == 'edit':
+            canvas.model.update_node(op['node']['id'], op['node'])
+        elif kind == 'move':
+            canvas.model.move_node(op['id'], op['x'], op['y'])
+        elif kind == 'delete':
+            canvas.delete_node(op['id'])
+        elif kind == 'connect':
+            canvas.add_connection(op['source'], op['target'])
+        elif kind == 'disconnect':
+            # Through the model: connections inside a collapsed subtree have no item
+            canvas.model.remove_edge(op['source'], op['target'])
+        elif kind == 'clear':
+            canvas.clear_all()
@@ -1,11 +1,54 @@
 from PySide6.QtWidgets import QGraphicsView, QGraphicsScene
-from PySide6.QtGui import QPainter, QBrush, QColor
-from PySide6.QtCore import Qt, QPointF
+from PySide6.QtGui import QPainter, QBrush, QColor, QPixmapCache
+from PySide6.QtCore import Qt, QPointF, QRect, QRectF, QTimer, Signal
+from collections import deque
 import math
+import time
 from ui.idea_node import IdeaNode
 from ui.connection_item import ConnectionItem
+from ui.edge_layer import EdgeLayer
+from ui.label_layout import label_layout
+from ui import level_of_detail
+from controllers.tree_layout import spanning_forest, tidy_tree, radial_tree
+from controllers.search_index import SearchIndex
+from controllers.model import MindMap, Node
+from ui.commands import ConnectCommand, MoveNodesCommand
+from ui.instrumentation import instrumentation
+
+VIEWPORT_UPDATE_MODES = {
+    'minimal': QGraphicsView.MinimalViewportUpdate,
+    'smart': QGraphicsView.SmartViewportUpdate,
+    'bounding': QGraphicsView.BoundingRectViewportUpdate,
+    'full': QGraphicsView.FullViewportUpdate,
+}
+
+# Room for device-coordinate item caches, in KB
+PIXMAP_CACHE_KB = 64 * 1024
+
+# The scene rect never shrinks below this, keeps SCENE_MARGIN free around
+# the items and grows in whole SCENE_GROWTH_STEP increments
+MIN_SCENE_RECT = QRectF(-2000, -2000, 4000, 4000)
+SCENE_MARGIN = 1000
+SCENE_GROWTH_STEP = 2000
+
+# Target number of indexed items per BSP tree leaf
+ITEMS_PER_BSP_LEAF = 16
+
+# Collapsing or expanding more nodes, or switching more edges to or from
+# the edge layer, than this at once suspends indexing
+BULK_COLLAPSE_NODES = 500
+
+TREE_LAYOUTS = {
+    'tidy': tidy_tree,
+    'radial': radial_tree,
+}
 
 class CanvasWidget(QGraphicsView):
+    # Id of a node whose item changed size, as once its label is measured
+    node_resized = Signal(str)
+    # Ids of the nodes whose items collapsing or expanding removed or rebuilt
+    visibility_changed = Signal(object)
+
     def __init__(self):
         super().__init__()
         
@@ -18,9 +61,17 @@ class CanvasWidget(QGraphicsView):
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
         self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
         self.setDragMode(QGraphicsView.RubberBandDrag)
+        # Bounding-rect tests come straight from the BSP index; shape tests
+        # would stroke every edge path under the band. An edge's bounding
+        # rect can cover far more than its curve, though, so the band only
+        # selects nodes (see _drop_band_edges)
+        self.setRubberBandSelectionMode(Qt.IntersectsItemBoundingRect)
+        self._banding = False
+        self._band_edges = set()
+        self.scene.selectionChanged.connect(self._drop_band_edges)
         
         # Set view properties
-        self.setViewportUpdateMode(QGraphicsView.FullViewportUpdate)
+        self.set_viewport_update_mode('smart')
         self.setRenderHint(QPainter.Antialiasing)
         self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
         self.setResizeAnchor(QGraphicsView.AnchorUnderMouse)
@@ -30,56 +81,117 @@ class CanvasWidget(QGraphicsView):
         self.last_pos = QPointF(0, 0)
         self.zoom_factor = 1.15
         
-        # Set scene size
-        self.scene.setSceneRect(-2000, -2000, 4000, 4000)
+        # The map itself; the canvas shows it and follows its changes
+        self.model = MindMap()
+        self.model.add_listener(self)
+        
+        # Items by node id, and each node's ConnectionItems
+        self.nodes = {}
+        self.outgoing = {}
+        self.incoming = {}
+        
+        # Collapsed subtrees: hidden node ids, which have no items and live
+        # only in the model; collapsed node ids; and, for each visible
+        # collapsed node, the nodes it hides and where it was when they
+        # were last moved along with it
+        self.hidden = set()
+        self._collapsed_ids = set()
+        self._collapsed = {}
+        self._collapse_anchors = {}
+        
+        # Text search over node titles, keywords and descriptions
+        self.search_index = SearchIndex()
+        
+        # Tree layout kept up as children are added: None, 'tidy' or 'radial'
+        self.layout_mode = None
+        
+        # Undo history for user edits, set by the window; positions of the
+        # nodes being dragged and of nodes moved by layouts while recording
+        self.undo_stack = None
+        self._drag_start = None
+        self._move_record = None
+        
+        # Change journal for crash recovery, set by the window; silent
+        # while a whole map is being loaded
+        self.autosave = None
+        self._loading = False
+        # Items built while loading, added to the scene a batch at a time
+        self._load_items = []
+        
+        # Draws the connections in batches instead of as items, when on
+        self.edge_layer = None
+        
+        # Edges whose paths need rebuilding, flushed once per event batch
+        self._dirty_edges = set()
+        self._edge_flush_pending = False
+        
+        # Item bounds waiting to be folded into the scene rect
+        self._pending_bounds = None
+        self._bounds_timer = QTimer(self)
+        self._bounds_timer.setSingleShot(True)
+        self._bounds_timer.setInterval(100)
+        self._bounds_timer.timeout.connect(self._apply_scene_bounds)
+        self._bsp_item_count = 0
+        
+        # Nodes cache their rendering as pixmaps; give them room
+        QPixmapCache.setCacheLimit(max(QPixmapCache.cacheLimit(), PIXMAP_CACHE_KB))
+        
+        # Recent frame times in seconds, and the optional on-screen readout
+        self.frame_times = deque(maxlen=120)
+        self.show_frame_time = False
+        self._overlay_rect = QRect(8, 8, 300, 22)
+        self._overlay_timer = QTimer(self)
+        self._overlay_timer.setInterval(500)
+        self._overlay_timer.timeout.connect(lambda: self.viewport().update(self._overlay_rect))
+        
+        # Set initial scene size; it grows with the items
+        self.scene.setSceneRect(MIN_SCENE_RECT)
+        self._tune_index(force=True)
         
         # Set background
         self.scene.setBackgroundBrush(QBrush(QColor("#f0f0f0")))
 
     def add_node(self, idea_data, parent_id=None):
         """Add a new node to the canvas."""
-        node = IdeaNode(
-            node_id=idea_data['id'],
-            title=idea_data['title'],
-            description=idea_data.get('description', ''),
-            color=idea_data['color'],
-            shape=idea_data['shape'],
-            keywords=idea_data.get('keywords', []),
-            image_path=idea_data.get('image')
-        )
-        
-        self.scene.addItem(node)
+        # A new child should be seen
+        if parent_id:
+            self.set_collapsed(parent_id, False)
+        if self.model.add_node(Node.from_record(idea_data)) is None:
+            raise ValueError(f"Duplicate node id {idea_data['id']!r}")
+        node = self.nodes[idea_data['id']]
         
         # Position the node
         if parent_id:
             parent = self.get_node_by_id(parent_id)
             if parent:
-                # Position relative to parent
+                # Position relative to parent, fanning out by sibling count
                 pos = parent.pos()
                 offset = 200  # Increased distance from parent
-                angle = len(self.get_all_nodes()) * math.pi / 6
+                angle = len(self.outgoing[parent.id]) * math.pi / 6
                 x = pos.x() + offset * math.cos(angle)
                 y = pos.y() + offset * math.sin(angle)
                 
                 # Adjust position based on node size
-                x -= node.boundingRect().width() / 2
-                y -= node.boundingRect().height() / 2
+                x -= node.width / 2
+                y -= node.height / 2
                 
                 node.setPos(x, y)
                 
                 # Create connection to parent
                 self.add_connection(parent.id, node.id)
+                if self.layout_mode:
+                    self.relayout_subtree(parent.id)
         else:
             # Position new root node using spiral layout
-            count = len(self.get_all_nodes())
+            count = len(self.nodes)
             angle = count * math.pi / 6
             radius = 150 + count * 30  # Increased spacing
             x = radius * math.cos(angle)
             y = radius * math.sin(angle)
             
             # Adjust position based on node size
-            x -= node.boundingRect().width() / 2
-            y -= node.boundingRect().height() / 2
+            x -= node.width / 2
+            y -= node.height / 2
             
             node.setPos(x, y)
         
@@ -87,37 +199,769 @@ class CanvasWidget(QGraphicsView):
 
     def add_connection(self, source_id, target_id):
         """Add a connection between two nodes."""
-        source = self.get_node_by_id(source_id)
-        target = self.get_node_by_id(target_id)
-        if source and target:
-            conn = ConnectionItem(source, target, self)
-            self.scene.addItem(conn)
-            return conn
+        if self.model.add_edge(source_id, target_id):
+            return self.find_connection(source_id, target_id)
         return None
 
+    def load_data(self, nodes, connections):
+        """Bulk-load a map, placing every node at its stored position.
+        
+        Args:
+            nodes (iterable): Node data dictionaries
+            connections (iterable): (source_id, target_id) tuples
+        
+        Returns:
+            dict: Seconds spent in the 'parse', 'build' and 'insert' phases
+        """
+        return self.load_chunks([('nodes', nodes), ('connections', connections)])
+
+    def load_chunks(self, chunks):
+        """Bulk-load a map from a stream of record batches.
+        
+        Each batch is built and inserted as it arrives, so only one batch
+        of plain records is alive at a time. If the stream raises, as a
+        reader does on finding a file malformed part way through, the
+        nodes loaded so far are removed again before the error propagates.
+        
+        Args:
+            chunks (iterable): ('nodes', [node dicts]) and
+                ('connections', [(source_id, target_id)]) batches
+        
+        Returns:
+            dict: Seconds spent in the 'parse', 'build' and 'insert' phases
+        """
+        chunks = iter(chunks)
+        before = set(self.model.nodes)
+        self.begin_load()
+        try:
+            while True:
+                start = time.perf_counter()
+                batch = next(chunks, None)
+                self._load_timings['parse'] += time.perf_counter() - start
+                if batch is None:
+                    break
+                self.load_batch(*batch)
+        except BaseException:
+            self.end_load()
+            if before:
+                for node_id in [node_id for node_id in self.model.nodes if node_id not in before]:
+                    self.model.remove_node(node_id)
+            else:
+                self.clear_all()
+            raise
+        return self.end_load()
+
+    def begin_load(self):
+        """Start an incremental bulk load; pair with end_load()."""
+        self._load_timings = {'parse': 0.0, 'build': 0.0, 'insert': 0.0}
+        self._load_bounds = None
+        self._load_items = []
+        self._pending_connections = []
+        self._loading = True
+        self._begin_bulk_load()
+
+    def load_batch(self, section, records):
+        """Build and insert one ('nodes' or 'connections') batch of records.
+        
+        Connections whose endpoints have not been loaded yet are held back
+        until end_load().
+        """
+        start = time.perf_counter()
+        # The model reports each new node and edge; node_added and
+        # edge_added collect their items
+        if section == 'nodes':
+            self.model.add_records(records)
+            for item in self._load_items:
+                rect = item.sceneBoundingRect()
+                self._load_bounds = rect if self._load_bounds is None else self._load_bounds.united(rect)
+        else:
+            self.model.add_edges(records, self._pending_connections)
+        built, self._load_items = self._load_items, []
+        self._load_timings['build'] += time.perf_counter() - start
+        self._insert_items(built, self._load_timings)
+
+    def end_load(self):
+        """Resolve held-back connections and resume indexing and repaints.
+        
+        Returns:
+            dict: Seconds spent in the 'parse', 'build' and 'insert' phases
+        """
+        try:
+            start = time.perf_counter()
+            self.model.add_edges(self._pending_connections)
+            built, self._load_items = self._load_items, []
+            self._load_timings['build'] += time.perf_counter() - start
+            self._insert_items(built, self._load_timings)
+            # Every node got an item; drop the ones collapsed subtrees hide,
+            # and add any that were revealed
+            self.update_collapsed()
+            built, self._load_items = self._load_items, []
+            self._insert_items(built, self._load_timings)
+            # Layered edges get their geometry in one batch
+            self._flush_edge_updates()
+        finally:
+            self._pending_connections = []
+            if self._load_bounds is not None:
+                self._include_in_scene(self._load_bounds)
+                self._apply_scene_bounds()
+            self._end_bulk_load()
+            self._tune_index(force=True)
+            self._loading = False
+            for phase, seconds in self._load_timings.items():
+                instrumentation().record(f"load.{phase}", seconds)
+            if self.autosave is not None:
+                self.autosave.loaded()
+        return self._load_timings
+
+    def _insert_items(self, items, timings):
+        """Add freshly built items to the scene."""
+        start = time.perf_counter()
+        for item in items:
+            self.scene.addItem(item)
+        timings['insert'] += time.perf_counter() - start
+
+    def _begin_bulk_load(self):
+        """Suspend scene indexing and repaints."""
+        self._saved_index_method = self.scene.itemIndexMethod()
+        self.scene.setItemIndexMethod(QGraphicsScene.NoIndex)
+        self.setUpdatesEnabled(False)
+
+    def _end_bulk_load(self):
+        """Rebuild the scene index once and resume repaints."""
+        self.scene.setItemIndexMethod(self._saved_index_method)
+        self.setUpdatesEnabled(True)
+        self.viewport().update()
+
+    def remove_connection(self, conn):
+        """Remove a connection from the map."""
+        self.model.remove_edge(conn.start_node.id, conn.end_node.id)
+
     def delete_node(self, node_id):
         """Delete a node and its connections."""
-        node = self.get_node_by_id(node_id)
-        if node:
-            # Remove connected edges first
-            for item in self.scene.items():
-                if isinstance(item, ConnectionItem):
-                    if item.start_node == node or item.end_node == node:
-                        self.scene.removeItem(item)
-            # Remove the node
-            self.scene.removeItem(node)
+        self.model.remove_node(node_id)
 
     def clear_all(self):
         """Clear all items from the scene."""
+        # History refers to the items being dropped
+        if self.undo_stack is not None:
+            self.undo_stack.clear()
+        self.model.clear()
+
+    # Model notifications
+
+    def node_added(self, node):
+        """Build the item for a node added to the model."""
+        self._add_node_item(node)
+        self.reindex_node(node)
+        if not self._loading:
+            if node.collapsed:
+                # Takes effect once connections reach it, as with an undone delete
+                self._collapsed_ids.add(node.id)
+            if self.autosave is not None:
+                self.autosave.node_added(node)
+
+    def node_removed(self, node):
+        """Drop the items of a node removed from the model, with its edges."""
+        was_hidden = node.id in self.hidden
+        self.hidden.discard(node.id)
+        self._remove_node_item(node.id)
+        self.search_index.remove(node.id)
+        if self.autosave is not None:
+            self.autosave.node_deleted(node.id)
+        self._tune_index()
+        # What the node hid, or what hung off it while hidden, may show now
+        if was_hidden or node.id in self._collapsed_ids:
+            self.update_collapsed()
+
+    def node_changed(self, node):
+        """Redraw and reindex a node whose data changed."""
+        item = self.nodes.get(node.id)
+        if item is not None:
+            item.data_changed()
+        self.reindex_node(node)
+        if self.autosave is not None:
+            self.autosave.node_changed(node)
+        if not self._loading and node.collapsed != (node.id in self._collapsed_ids):
+            self.update_collapsed()
+
+    def node_moved(self, node):
+        """Follow a model move: place the item, queue its edges, track bounds."""
+        item = self.nodes.get(node.id)
+        if item is not None:
+            pos = item.pos()
+            if pos.x() != node.x or pos.y() != node.y:
+                # Comes back through item_moved as a no-op
+                item.setPos(node.x, node.y)
+            if item.connections:
+                self.schedule_edge_update(item.connections)
+            self._include_in_scene(item.sceneBoundingRect())
+        if self.autosave is not None:
+            self.autosave.node_moved(node)
+        if node.id in self._collapsed:
+            self._move_hidden_with(node)
+
+    def edge_added(self, source_id, target_id):
+        """Build the item for a connection added to the model."""
+        if self._loading:
+            self._add_edge_item(source_id, target_id)
+            return
+        if self._collapsed_ids and (source_id in self._collapsed_ids or source_id in self.hidden
+                                    or target_id in self.hidden):
+            self.update_collapsed()
+        if (source_id in self.nodes and target_id in self.nodes
+                and self.find_connection(source_id, target_id) is None):
+            self._add_edge_item(source_id, target_id)
+        if self.autosave is not None:
+            self.autosave.connection_added(source_id, target_id)
+
+    def edge_removed(self, source_id, target_id):
+        """Drop the item of a connection removed from the model."""
+        if self.autosave is not None:
+            self.autosave.connection_removed(source_id, target_id)
+        conn = self.find_connection(source_id, target_id)
+        if conn is not None:
+            self._unregister_connection(conn)
+            if conn.scene() is self.scene:
+                self.scene.removeItem(conn)
+        # The target may now hang only off collapsed or hidden nodes
+        if self._collapsed_ids and not self._loading and (
+                target_id in self.hidden
+                or any(parent_id in self._collapsed_ids or parent_id in self.hidden
+                       for parent_id in self.model.incoming.get(target_id, ()))):
+            self.update_collapsed()
+
+    def cleared(self):
+        """Drop every item after the model was cleared."""
+        if self.autosave is not None:
+            self.autosave.cleared()
+        if self.edge_layer is not None:
+            # Kept for the next map
+            self.scene.removeItem(self.edge_layer)
+            self.edge_layer.clear()
+        # Queued nodes would outlive their C++ objects
+        label_layout().discard_scene(self.scene)
         self.scene.clear()
+        if self.edge_layer is not None:
+            self.scene.addItem(self.edge_layer)
+        self.nodes.clear()
+        self.outgoing.clear()
+        self.incoming.clear()
+        self.hidden.clear()
+        self._collapsed_ids.clear()
+        self._collapsed.clear()
+        self._collapse_anchors.clear()
+        self.search_index.clear()
+        self._dirty_edges.clear()
+        self._pending_bounds = None
+        self.scene.setSceneRect(MIN_SCENE_RECT)
+        self._tune_index(force=True)
         self.creating_connection = None
 
+    def _add_node_item(self, node):
+        """Build and place the item for a model node."""
+        item = IdeaNode(node)
+        item.setPos(node.x, node.y)
+        self._register_node(item)
+        if self._loading:
+            self._load_items.append(item)
+        else:
+            self.scene.addItem(item)
+            self._include_in_scene(item.sceneBoundingRect())
+            self._tune_index()
+        return item
+
+    def _remove_node_item(self, node_id):
+        """Take a node's item and its connection items out of the scene, if it has one."""
+        item = self.nodes.pop(node_id, None)
+        if item is None:
+            return
+        edges = self.outgoing.pop(node_id, set()) | self.incoming.pop(node_id, set())
+        for conn in edges:
+            self._unregister_connection(conn)
+            if conn.scene() is self.scene:
+                self.scene.removeItem(conn)
+        label_layout().discard(item)
+        if item.scene() is self.scene:
+            self.scene.removeItem(item)
+
+    def _add_edge_item(self, source_id, target_id):
+        """Build and place the item for a connection between two shown nodes."""
+        layer = self.edge_layer
+        conn = ConnectionItem(self.nodes[source_id], self.nodes[target_id], self, layered=layer is not None)
+        self._register_connection(conn)
+        if layer is not None:
+            layer.add(conn)
+            self.schedule_edge_update((conn,))
+        elif self._loading:
+            self._load_items.append(conn)
+        else:
+            self.scene.addItem(conn)
+
+    def _register_node(self, node):
+        """Index a node item by id."""
+        node.canvas = self
+        self.nodes[node.id] = node
+        self.outgoing.setdefault(node.id, set())
+        self.incoming.setdefault(node.id, set())
+
+    def reindex_node(self, node):
+        """Refresh a node's entry in the search index after its text changed."""
+        self.search_index.add(node.id, node.title, node.description, node.keywords)
+
+    def _register_connection(self, conn):
+        """Index a connection item under both of its endpoints."""
+        self.outgoing.setdefault(conn.start_node.id, set()).add(conn)
+        self.incoming.setdefault(conn.end_node.id, set()).add(conn)
+        conn.start_node.connections.add(conn)
+        conn.end_node.connections.add(conn)
+
+    def _unregister_connection(self, conn):
+        """Drop a connection item from the adjacency index."""
+        self.outgoing.get(conn.start_node.id, set()).discard(conn)
+        self.incoming.get(conn.end_node.id, set()).discard(conn)
+        conn.start_node.connections.discard(conn)
+        conn.end_node.connections.discard(conn)
+        self._dirty_edges.discard(conn)
+        if self.edge_layer is not None:
+            self.edge_layer.remove(conn)
+
+    # Collapsed subtrees
+
+    def set_collapsed(self, node_id, collapsed):
+        """Collapse or expand the subtree under a node."""
+        self.model.set_collapsed(node_id, collapsed)
+
+    def toggle_collapsed(self, node_id):
+        node = self.model.nodes.get(node_id)
+        if node is not None:
+            self.model.set_collapsed(node_id, not node.collapsed)
+
+    def hidden_count(self, node_id):
+        """Number of nodes a collapsed node hides."""
+        return len(self._collapsed.get(node_id, ()))
+
+    def reveal(self, node_id):
+        """Expand whichever collapsed nodes hide node_id."""
+        while node_id in self.hidden:
+            owner_id = next(owner_id for owner_id, members in self._collapsed.items()
+                            if node_id in members)
+            self.model.set_collapsed(owner_id, False)
+
+    def update_collapsed(self):
+        """Bring the items in line with the model's collapsed subtrees.
+        
+        Newly hidden nodes lose their items, and their connections' items,
+        so a collapsed subtree costs the scene nothing; newly revealed nodes
+        get items again at their model positions.
+        """
+        nodes = self.model.nodes
+        owners = self.model.hidden_nodes()
+        hidden = set()
+        for members in owners.values():
+            hidden.update(members)
+        hide = hidden - self.hidden
+        show = self.hidden - hidden
+        bulk = not self._loading and len(hide) + len(show) > BULK_COLLAPSE_NODES
+        if bulk:
+            self._begin_bulk_load()
+        try:
+            for node_id in hide:
+                self._remove_node_item(node_id)
+            self.hidden = hidden
+            self._materialize(show)
+        finally:
+            if bulk:
+                self._end_bulk_load()
+        previous, self._collapsed = self._collapsed, owners
+        self._collapsed_ids = {node_id for node_id, node in nodes.items() if node.collapsed}
+        self._collapse_anchors = {node_id: (nodes[node_id].x, nodes[node_id].y) for node_id in owners}
+        # Refresh the hidden-count badges
+        for node_id in previous.keys() | owners.keys():
+            item = self.nodes.get(node_id)
+            if item is not None:
+                item.update()
+        if (hide or show) and not self._loading:
+            self._tune_index()
+        if hide or show:
+            self.visibility_changed.emit(hide | show)
+
+    def _materialize(self, node_ids):
+        """Build the items of revealed nodes and of their connections to shown nodes."""
+        nodes = self.model.nodes
+        for node_id in node_ids:
+            self._add_node_item(nodes[node_id])
+        outgoing, incoming = self.model.outgoing, self.model.incoming
+        for node_id in node_ids:
+            for target_id in outgoing[node_id]:
+                if target_id in self.nodes:
+                    self._add_edge_item(node_id, target_id)
+            for source_id in incoming[node_id]:
+                if source_id in self.nodes and source_id not in node_ids:
+                    self._add_edge_item(source_id, node_id)
+
+    def _move_hidden_with(self, node):
+        """Move what a collapsed node hides by as much as the node itself moved."""
+        x, y = self._collapse_anchors[node.id]
+        dx, dy = node.x - x, node.y - y
+        self._collapse_anchors[node.id] = (node.x, node.y)
+        nodes = self.model.nodes
+        for node_id in self._collapsed[node.id]:
+            hidden = nodes[node_id]
+            self.model.move_node(node_id, hidden.x + dx, hidden.y + dy)
+
+    def item_resized(self, node):
+        """Pass on that a node item changed size, e.g. once its label was measured."""
+        if not self._loading:
+            self._include_in_scene(node.sceneBoundingRect())
+        self.node_resized.emit(node.id)
+
+    def item_moved(self, node):
+        """Pass a node item's new position, e.g. from a drag, on to the model."""
+        pos = node.pos()
+        self.model.move_node(node.id, pos.x(), pos.y())
+
+    def _include_in_scene(self, rect):
+        """Make sure the scene rect will cover rect, growing it in batches."""
+        if self.scene.sceneRect().contains(rect):
+            return
+        if self._pending_bounds is None:
+            self._pending_bounds = QRectF(rect)
+        else:
+            self._pending_bounds = self._pending_bounds.united(rect)
+        if not self._bounds_timer.isActive():
+            self._bounds_timer.start()
+
+    def _apply_scene_bounds(self):
+        """Grow the scene rect over the pending bounds, snapped to whole steps."""
+        self._bounds_timer.stop()
+        if self._pending_bounds is None:
+            return
+        rect = self.scene.sceneRect().united(
+            self._pending_bounds.adjusted(-SCENE_MARGIN, -SCENE_MARGIN, SCENE_MARGIN, SCENE_MARGIN)
+        )
+        self._pending_bounds = None
+        step = SCENE_GROWTH_STEP
+        left = math.floor(rect.left() / step) * step
+        top = math.floor(rect.top() / step) * step
+        right = math.ceil(rect.right() / step) * step
+        bottom = math.ceil(rect.bottom() / step) * step
+        self.scene.setSceneRect(QRectF(left, top, right - left, bottom - top))
+
+    def _tune_index(self, force=False):
+        """Match the BSP tree depth to the item count.
+        
+        The depth is only changed when the count has doubled or halved
+        since the last tuning, since every change rebuilds the index.
+        """
+        count = len(self.model.nodes) + self.model.edge_count
+        last = self._bsp_item_count
+        if not force and last // 2 < count < last * 2:
+            return
+        self._bsp_item_count = max(count, 1)
+        depth = round(math.log2(max(count, 1) / ITEMS_PER_BSP_LEAF))
+        self.scene.setBspTreeDepth(max(5, min(18, depth)))
+
+    def set_layout_mode(self, mode):
+        """Lay out the whole map as a tree and keep it that way as children are added.
+        
+        Args:
+            mode (str): 'tidy', 'radial', or None to stop managing positions
+        """
+        self.layout_mode = mode
+        if mode:
+            self.apply_tree_layout(mode)
+
+    def apply_tree_layout(self, mode):
+        """Lay out every node as a forest, keeping the first root in place."""
+        successors = self._tree_successors(mode)
+        roots, children = spanning_forest(self.nodes, successors)
+        self._place_tree(mode, roots, children)
+
+    def relayout_subtree(self, node_id):
+        """Re-lay out the tree under node_id after it changed, keeping node_id in place.
+        
+        A tidy subtree that would run into nodes outside it is handed up to
+        its parent, and so on, so only as much of the map moves as needed.
+        Radial layouts depend on the whole tree and re-lay out from its root.
+        """
+        mode = self.layout_mode or 'tidy'
+        successors = self._tree_successors(mode)
+        top = node_id
+        seen = {top}
+        while True:
+            parent_id = self._tree_parent(top, seen)
+            if mode == 'radial' and parent_id is not None:
+                seen.add(parent_id)
+                top = parent_id
+                continue
+            roots, children = spanning_forest([top], successors)
+            positions = self._place_tree(mode, roots, children, apply=False)
+            if parent_id is None or not self._collides(positions):
+                self._apply_centers(positions)
+                return
+            seen.add(parent_id)
+            top = parent_id
+
+    def _tree_successors(self, mode):
+        """Return a function listing a node's children in their current order.
+        
+        Children keep their left-to-right order in tidy layouts and their
+        order around the parent in radial ones.
+        """
+        def successors(node_id):
+            edges = self.outgoing.get(node_id)
+            if not edges:
+                return ()
+            if len(edges) == 1:
+                return [next(iter(edges)).end_node.id]
+            origin = self.nodes[node_id].center()
+            
+            def order(conn):
+                center = conn.end_node.center()
+                if mode == 'radial':
+                    return math.atan2(center.y() - origin.y(), center.x() - origin.x())
+                return (center.x(), center.y())
+            return [conn.end_node.id for conn in sorted(edges, key=order)]
+        return successors
+
+    def _tree_parent(self, node_id, seen):
+        """Return a tree parent of node_id not already in seen, or None."""
+        for conn in self.incoming.get(node_id, ()):
+            if conn.start_node.id not in seen:
+                return conn.start_node.id
+        return None
+
+    def _collides(self, positions, gap=10):
+        """Whether nodes centered at positions would overlap any other node."""
+        for node_id, (x, y) in positions.items():
+            node = self.nodes[node_id]
+            rect = QRectF(x - node.width / 2 - gap, y - node.height / 2 - gap,
+                          node.width + 2 * gap, node.height + 2 * gap)
+            for item in self.scene.items(rect, Qt.IntersectsItemBoundingRect):
+                if isinstance(item, IdeaNode) and item.id not in positions:
+                    return True
+        return False
+
+    def _place_tree(self, mode, roots, children, apply=True):
+        """Lay out a forest with its first root kept where it is now.
+        
+        Returns:
+            dict: Node id -> (x, y) center
+        """
+        if not roots:
+            return {}
+        sizes = {node_id: (self.nodes[node_id].width, self.nodes[node_id].height)
+                 for node_id in children}
+        positions = TREE_LAYOUTS[mode](roots, children, sizes)
+        anchor = self.nodes[roots[0]].center()
+        dx = anchor.x() - positions[roots[0]][0]
+        dy = anchor.y() - positions[roots[0]][1]
+        positions = {node_id: (x + dx, y + dy) for node_id, (x, y) in positions.items()}
+        if apply:
+            self._apply_centers(positions)
+        return positions
+
+    def _apply_centers(self, positions):
+        """Move nodes so they are centered on the given points."""
+        self.move_nodes({node_id: (x - self.nodes[node_id].width / 2, y - self.nodes[node_id].height / 2)
+                         for node_id, (x, y) in positions.items()})
+
+    def move_nodes(self, positions):
+        """Move nodes to new top-left positions, recording the moves if asked to.
+        
+        Args:
+            positions (dict): Node id -> (x, y); unknown ids are skipped
+        """
+        record = self._move_record
+        nodes = self.model.nodes
+        for node_id, (x, y) in positions.items():
+            node = nodes.get(node_id)
+            if node is None:
+                continue
+            if record is not None:
+                old = record[node_id][0] if node_id in record else (node.x, node.y)
+                record[node_id] = (old, (x, y))
+            self.model.move_node(node_id, x, y)
+
+    def begin_move_record(self):
+        """Start collecting the moves made through move_nodes()."""
+        self._move_record = {}
+
+    def end_move_record(self):
+        """Stop collecting moves.
+        
+        Returns:
+            dict: Node id -> ((old x, old y), (new x, new y)) for nodes that moved
+        """
+        record, self._move_record = self._move_record or {}, None
+        return {node_id: move for node_id, move in record.items() if move[0] != move[1]}
+
+    def push_command(self, command):
+        """Run an undoable command through the undo stack, or directly without one."""
+        if self.undo_stack is not None:
+            self.undo_stack.push(command)
+        else:
+            command.redo()
+
+    def restore_nodes(self, records, connections):
+        """Recreate nodes at their recorded positions, with their connections.
+        
+        Args:
+            records (list): Node dictionaries as written by node_to_record
+            connections (iterable): (source_id, target_id) tuples; pairs
+                with a missing endpoint are skipped
+        
+        Returns:
+            list: The recreated IdeaNodes
+        """
+        nodes = [self.nodes[node.id] for node in self.model.add_records(records)]
+        self.model.add_edges(connections)
+        return nodes
+
+    def find_connection(self, source_id, target_id):
+        """Return a connection from source_id to target_id, or None."""
+        for conn in self.outgoing.get(source_id, ()):
+            if conn.end_node.id == target_id:
+                return conn
+        return None
+
+    def schedule_edge_update(self, edges):
+        """Queue connection paths for a rebuild in the next flush."""
+        self._dirty_edges.update(edges)
+        if not self._edge_flush_pending:
+            self._edge_flush_pending = True
+            QTimer.singleShot(0, self._flush_edge_updates)
+
+    def _flush_edge_updates(self):
+        """Rebuild every queued connection path exactly once."""
+        self._edge_flush_pending = False
+        if not self._dirty_edges:
+            return
+        edges, self._dirty_edges = self._dirty_edges, set()
+        if self.edge_layer is not None:
+            edges = self.edge_layer.update_geometry(edges)
+        for conn in edges:
+            conn.update_position()
+
+    def set_edge_layer(self, enabled):
+        """Draw connections through one batched edge layer instead of an item each.
+        
+        Layered connections are promoted to their items while hovered or
+        selected; rubber band selection does not pick them up.
+        """
+        if enabled == (self.edge_layer is not None):
+            return
+        conns = [conn for edges in self.outgoing.values() for conn in edges]
+        bulk = len(conns) > BULK_COLLAPSE_NODES
+        if bulk:
+            self._begin_bulk_load()
+        try:
+            if enabled:
+                self.edge_layer = EdgeLayer(self)
+                self.scene.addItem(self.edge_layer)
+                for conn in conns:
+                    if conn.scene() is self.scene:
+                        self.scene.removeItem(conn)
+                    self.edge_layer.add(conn)
+                self._dirty_edges.update(conns)
+                self._flush_edge_updates()
+            else:
+                layer, self.edge_layer = self.edge_layer, None
+                layer.clear()
+                self.scene.removeItem(layer)
+                for conn in conns:
+                    conn.update_style()
+                    conn.update_position()
+                    if conn.scene() is not self.scene:
+                        self.scene.addItem(conn)
+        finally:
+            if bulk:
+                self._end_bulk_load()
+
+    def set_label_items(self, enabled):
+        """Show node labels as child text items, or paint them as part of each node (the default).
+        
+        Child items are only created for nodes whose label has been measured.
+        """
+        IdeaNode.text_items = enabled
+        for item in self.nodes.values():
+            item.set_text_item(enabled and item.label_exact)
+
+    def set_level_of_detail(self, **thresholds):
+        """Adjust the zoom thresholds at which nodes and edges drop detail.
+        
+        See ui.level_of_detail.THRESHOLDS for the available keys.
+        """
+        level_of_detail.set_thresholds(**thresholds)
+        self.viewport().update()
+
+    def set_viewport_update_mode(self, mode):
+        """Choose how much of the viewport is repainted when items change.
+        
+        Args:
+            mode (str): 'minimal', 'smart', 'bounding' or 'full'
+        """
+        self.setViewportUpdateMode(VIEWPORT_UPDATE_MODES[mode])
+        self.viewport().update()
+
+    def set_frame_time_visible(self, visible):
+        """Show or hide the frame-time readout in the corner of the view."""
+        self.show_frame_time = visible
+        if visible:
+            self._overlay_timer.start()
+        else:
+            self._overlay_timer.stop()
+        self.viewport().update(self._overlay_rect)
+
+    def frame_stats(self):
+        """Summarize recent frame times in milliseconds."""
+        if not self.frame_times:
+            return {'last': 0.0, 'mean': 0.0, 'max': 0.0}
+        return {
+            'last': self.frame_times[-1] * 1000,
+            'mean': sum(self.frame_times) / len(self.frame_times) * 1000,
+            'max': max(self.frame_times) * 1000
+        }
+
+    def paintEvent(self, event):
+        """Paint the scene and record how long it took."""
+        start = time.perf_counter()
+        super().paintEvent(event)
+        elapsed = time.perf_counter() - start
+        
+        # Overlay refreshes on their own would skew the numbers
+        if not self._overlay_rect.contains(event.rect()):
+            self.frame_times.append(elapsed)
+        
+        if self.show_frame_time:
+            stats = self.frame_stats()
+            painter = QPainter(self.viewport())
+            painter.fillRect(self._overlay_rect, QColor(0, 0, 0, 160))
+            painter.setPen(Qt.white)
+            painter.drawText(
+                self._overlay_rect.adjusted(6, 0, -6, 0), Qt.AlignVCenter | Qt.AlignLeft,
+                f"frame {stats['last']:.1f} ms  avg {stats['mean']:.1f}  max {stats['max']:.1f}"
+            )
+            painter.end()
+
+    def search(self, query, limit=50):
+        """Return up to limit model nodes matching the query, best first, hidden ones included."""
+        nodes = self.model.nodes
+        return [nodes[node_id] for node_id in self.search_index.search(query, limit)]
+
+    def focus_node(self, node_id):
+        """Select a node, expanding any collapsed subtree it is in, and center the view on it."""
+        self.reveal(node_id)
+        node = self.nodes.get(node_id)
+        if not node:
+            return
+        self.scene.clearSelection()
+        node.setSelected(True)
+        self.centerOn(node)
+
     def get_node_by_id(self, node_id):
         """Get a node by its ID."""
-        for item in self.scene.items():
-            if isinstance(item, IdeaNode) and item.id == node_id:
-                return item
-        return None
+        return self.nodes.get(node_id)
 
     def get_selected_node(self):
         """Get the currently selected node."""
@@ -128,13 +972,15 @@ class CanvasWidget(QGraphicsView):
 
     def get_all_nodes(self):
         """Get all nodes in the scene."""
-        return [item for item in self.scene.items() if isinstance(item, IdeaNode)]
+        return list(self.nodes.values())
 
     def get_all_connections(self):
         """Get all connections in the scene."""
-        return [(item.start_node.id, item.end_node.id) 
-                for item in self.scene.items()
-                if isinstance(item, ConnectionItem)]
+        return list(self.iter_connections())
+
+    def iter_connections(self):
+        """Yield (source_id, target_id) for every connection."""
+        return self.model.iter_edges()
 
     def wheelEvent(self, event):
         """Handle zoom with mouse wheel."""
@@ -144,10 +990,26 @@ class CanvasWidget(QGraphicsView):
         else:
             super().wheelEvent(event)
 
+    def _drop_band_edges(self):
+        """Deselect connections the rubber band picked up by their bounding rects."""
+        if not self._banding:
+            return
+        for item in self.scene.selectedItems():
+            if isinstance(item, ConnectionItem) and item not in self._band_edges:
+                item.setSelected(False)
+
+    def node_at(self, pos):
+        """The IdeaNode under a viewport position, including over its child items, or None."""
+        item = self.itemAt(pos)
+        if item is None:
+            return None
+        item = item.topLevelItem()
+        return item if isinstance(item, IdeaNode) else None
+
     def mousePressEvent(self, event):
         """Handle mouse press events."""
         if event.modifiers() == Qt.ShiftModifier:
-            item = self.itemAt(event.pos())
+            item = self.node_at(event.pos())
             if isinstance(item, IdeaNode):
                 # Start connection creation
                 self.creating_connection = ConnectionItem(item, None, self)
@@ -160,7 +1022,21 @@ class CanvasWidget(QGraphicsView):
             event.accept()
             return
         
+        if event.button() == Qt.LeftButton and self.itemAt(event.pos()) is None:
+            # Edges selected before a Ctrl+band stay selected
+            self._banding = True
+            self._band_edges = {item for item in self.scene.selectedItems()
+                                if isinstance(item, ConnectionItem)}
+
         super().mousePressEvent(event)
+        
+        # Remember where the selection started so a drag is one undo step
+        if event.button() == Qt.LeftButton and self.node_at(event.pos()) is not None:
+            self._drag_start = {}
+            for item in self.scene.selectedItems():
+                if isinstance(item, IdeaNode):
+                    pos = item.pos()
+                    self._drag_start[item.id] = (pos.x(), pos.y())
 
     def mouseMoveEvent(self, event):
         """Handle mouse move events."""
@@ -171,17 +1047,20 @@ class CanvasWidget(QGraphicsView):
             return
             
         super().mouseMoveEvent(event)
+        
+        # Every dragged node has moved by now; update their edges in one pass
+        self._flush_edge_updates()
 
     def mouseReleaseEvent(self, event):
         """Handle mouse release events."""
         if self.creating_connection:
-            end_item = self.itemAt(event.pos())
-            if isinstance(end_item, IdeaNode) and end_item != self.creating_connection.start_node:
-                # Complete connection
-                self.creating_connection.set_end_node(end_item)
-            else:
-                # Remove incomplete connection
-                self.scene.removeItem(self.creating_connection)
+            end_item = self.node_at(event.pos())
+            start_id = self.creating_connection.start_node.id
+            # The model builds the real connection; drop the rubber band one
+            self.scene.removeItem(self.creating_connection)
+            if (isinstance(end_item, IdeaNode) and end_item.id != start_id
+                    and not self.model.has_edge(start_id, end_item.id)):
+                self.push_command(ConnectCommand(self, start_id, end_item.id))
             
             self.creating_connection = None
             event.accept()
@@ -190,4 +1069,18 @@ class CanvasWidget(QGraphicsView):
             # Restore rubber band selection
             self.setDragMode(QGraphicsView.RubberBandDrag)
             
-        super().mouseReleaseEvent(event)
\ No newline at end of file
+        super().mouseReleaseEvent(event)
+        self._banding = False
+        self._band_edges = set()
+        
+        if self._drag_start is not None and event.button() == Qt.LeftButton:
+            moves = {}
+            for node_id, old in self._drag_start.items():
+                node = self.nodes.get(node_id)
+                if node is not None:
+                    new = (node.pos().x(), node.pos().y())
+                    if new != old:
+                        moves[node_id] = (old, new)
+            self._drag_start = None
+            if moves:
+                self.push_command(MoveNodesCommand(self, moves))
\ No newline at end of file
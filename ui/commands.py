@@ -0,0 +1,277 @@
+"""
+Undoable canvas edits for a QUndoStack.
+
+Each command records only the delta it needs: the records of the nodes
+it adds or removes and the connections touching them, the fields an edit
+changed, or the old and new positions of the nodes a move touched. The
+rest of the map is never copied, so undoing a large delete costs as much
+as the delete itself.
+
+UndoStack keeps the recorded deltas under a memory budget by expiring
+the oldest commands: they drop their state and are marked obsolete, and
+QUndoStack discards them without undoing when the history reaches them.
+"""
+from PySide6.QtGui import QUndoCommand, QUndoStack
+from controllers.json_stream import node_to_record
+
+# Default memory budget for undo history, in bytes
+HISTORY_MEMORY_LIMIT = 64 * 1024 * 1024
+
+# Rough per-object overheads used to estimate history size, in bytes
+_RECORD_OVERHEAD = 600
+_MOVE_OVERHEAD = 200
+_EDGE_OVERHEAD = 150
+
+
+def _record_size(record):
+    """Approximate memory held by a node record."""
+    size = _RECORD_OVERHEAD
+    for key in ('id', 'title', 'description', 'color', 'image'):
+        size += len(record.get(key) or '')
+    for keyword in record.get('keywords') or ():
+        size += len(keyword) + 60
+    return size
+
+
+class CanvasCommand(QUndoCommand):
+    """Base for undoable canvas edits."""
+
+    def __init__(self, canvas, text):
+        super().__init__(text)
+        self.canvas = canvas
+        # Approximate bytes of recorded state, for the history budget
+        self.size = 0
+
+    def evict(self):
+        """Drop the recorded state; the stack will discard this command."""
+        self.setObsolete(True)
+        self.size = 0
+
+
+class AddNodeCommand(CanvasCommand):
+    """Add a node, optionally as a child of another.
+
+    Nodes a tree layout moves to make room are recorded as well, so
+    undoing puts them back.
+    """
+
+    def __init__(self, canvas, data, parent_id=None):
+        super().__init__(canvas, "Add Child Node" if parent_id else "Add Node")
+        self.data = data
+        self.parent_id = parent_id
+        self.record = None
+        self.moves = {}
+
+    def redo(self):
+        if self.record is None:
+            self.canvas.begin_move_record()
+            try:
+                node = self.canvas.add_node(self.data, parent_id=self.parent_id)
+            finally:
+                self.moves = self.canvas.end_move_record()
+            self.moves.pop(node.id, None)
+            self.record = node_to_record(node)
+            self.data = None
+            self.size = _record_size(self.record) + _MOVE_OVERHEAD * len(self.moves)
+            return
+        connections = [(self.parent_id, self.record['id'])] if self.parent_id else []
+        self.canvas.restore_nodes([self.record], connections)
+        self.canvas.move_nodes({node_id: new for node_id, (old, new) in self.moves.items()})
+
+    def undo(self):
+        self.canvas.delete_node(self.record['id'])
+        self.canvas.move_nodes({node_id: old for node_id, (old, new) in self.moves.items()})
+
+    def evict(self):
+        super().evict()
+        self.record = self.moves = None
+
+
+class DeleteNodesCommand(CanvasCommand):
+    """Delete nodes along with every connection that touches them."""
+
+    def __init__(self, canvas, node_ids):
+        count = len(node_ids)
+        super().__init__(canvas, "Delete Node" if count == 1 else f"Delete {count} Nodes")
+        model = canvas.model
+        node_ids = [node_id for node_id in node_ids if node_id in model.nodes]
+        self.records = [node_to_record(model.nodes[node_id]) for node_id in node_ids]
+        edges = set()
+        for node_id in node_ids:
+            edges.update(model.edges_of(node_id))
+        self.connections = list(edges)
+        self.size = (sum(_record_size(record) for record in self.records)
+                     + _EDGE_OVERHEAD * len(self.connections))
+
+    def redo(self):
+        for record in self.records:
+            self.canvas.delete_node(record['id'])
+
+    def undo(self):
+        self.canvas.restore_nodes(self.records, self.connections)
+
+    def evict(self):
+        super().evict()
+        self.records = self.connections = None
+
+
+class EditNodeCommand(CanvasCommand):
+    """Change the text, look or image of a node; only changed fields are kept."""
+
+    FIELDS = ('title', 'description', 'keywords', 'color', 'shape', 'image')
+
+    def __init__(self, canvas, node_id, data):
+        super().__init__(canvas, "Edit Node")
+        self.node_id = node_id
+        current = node_to_record(canvas.model.nodes[node_id])
+        changed = [key for key in self.FIELDS if key in data and data[key] != current.get(key)]
+        self.old = {key: current.get(key) for key in changed}
+        self.new = {key: data[key] for key in changed}
+        self.size = _record_size(self.old) + _record_size(self.new)
+
+    def is_empty(self):
+        return not self.new
+
+    def _apply(self, delta):
+        node = self.canvas.model.nodes.get(self.node_id)
+        if node is None:
+            return
+        data = node_to_record(node)
+        data.update(delta)
+        self.canvas.model.update_node(self.node_id, data)
+
+    def redo(self):
+        self._apply(self.new)
+
+    def undo(self):
+        self._apply(self.old)
+
+    def evict(self):
+        super().evict()
+        self.old = self.new = None
+
+
+class MoveNodesCommand(CanvasCommand):
+    """Move any number of nodes at once, e.g. one drag of a whole selection."""
+
+    def __init__(self, canvas, moves, text=None):
+        """
+        Args:
+            canvas (CanvasWidget): Canvas holding the nodes
+            moves (dict): Node id -> ((old x, old y), (new x, new y)) positions
+            text (str): Label shown in the undo history
+        """
+        count = len(moves)
+        super().__init__(canvas, text or ("Move Node" if count == 1 else f"Move {count} Nodes"))
+        self.moves = moves
+        self.size = _MOVE_OVERHEAD * count
+
+    def redo(self):
+        self.canvas.move_nodes({node_id: new for node_id, (old, new) in self.moves.items()})
+
+    def undo(self):
+        self.canvas.move_nodes({node_id: old for node_id, (old, new) in self.moves.items()})
+
+    def evict(self):
+        super().evict()
+        self.moves = None
+
+
+class ConnectCommand(CanvasCommand):
+    """Connect two nodes."""
+
+    def __init__(self, canvas, source_id, target_id):
+        super().__init__(canvas, "Connect Nodes")
+        self.source_id = source_id
+        self.target_id = target_id
+        self.size = _EDGE_OVERHEAD
+
+    def redo(self):
+        self.canvas.add_connection(self.source_id, self.target_id)
+
+    def undo(self):
+        # By id: an endpoint may since have been hidden in a collapsed subtree
+        self.canvas.model.remove_edge(self.source_id, self.target_id)
+
+
+class DisconnectCommand(CanvasCommand):
+    """Remove the connection between two nodes."""
+
+    def __init__(self, canvas, source_id, target_id):
+        super().__init__(canvas, "Delete Connection")
+        self.source_id = source_id
+        self.target_id = target_id
+        self.size = _EDGE_OVERHEAD
+
+    def redo(self):
+        self.canvas.model.remove_edge(self.source_id, self.target_id)
+
+    def undo(self):
+        self.canvas.add_connection(self.source_id, self.target_id)
+
+
+def _command_size(command):
+    """Recorded bytes of a command, including the children of a macro."""
+    size = getattr(command, 'size', 0)
+    for i in range(command.childCount()):
+        size += _command_size(command.child(i))
+    return size
+
+
+def _evict(command):
+    if isinstance(command, CanvasCommand):
+        command.evict()
+    else:
+        command.setObsolete(True)
+    for i in range(command.childCount()):
+        _evict(command.child(i))
+
+
+class UndoStack(QUndoStack):
+    """QUndoStack whose history is kept under a memory budget.
+
+    Once the recorded deltas exceed memory_limit bytes, the oldest done
+    commands are expired until the history fits again. The most recent
+    command is always kept.
+    """
+
+    def __init__(self, memory_limit=HISTORY_MEMORY_LIMIT, parent=None):
+        super().__init__(parent)
+        self.memory_limit = memory_limit
+        self._macro_depth = 0
+
+    def set_memory_limit(self, memory_limit):
+        self.memory_limit = memory_limit
+        self._enforce_limit()
+
+    def memory_used(self):
+        """Approximate bytes held by the history."""
+        return sum(_command_size(self.command(i)) for i in range(self.count()))
+
+    def push(self, command):
+        super().push(command)
+        self._enforce_limit()
+
+    def beginMacro(self, text):
+        self._macro_depth += 1
+        super().beginMacro(text)
+
+    def endMacro(self):
+        super().endMacro()
+        self._macro_depth -= 1
+        self._enforce_limit()
+
+    def _enforce_limit(self):
+        if self.memory_limit is None or self._macro_depth:
+            return
+        sizes = [_command_size(self.command(i)) for i in range(self.count())]
+        total = sum(sizes)
+        # Only done commands below the newest one can expire
+        for i in range(max(self.index() - 1, 0)):
+            if total <= self.memory_limit:
+                break
+            command = self.command(i)
+            if command.isObsolete():
+                continue
+            _evict(command)
+            total -= sizes[i]
@@ -1,24 +1,33 @@
 from PySide6.QtWidgets import QGraphicsPathItem, QMenu
-from PySide6.QtGui import QPainterPath, QPen, QColor
-from PySide6.QtCore import Qt, QPointF
+from PySide6.QtGui import QPainter, QPainterPath, QPen, QColor
+from PySide6.QtCore import Qt, QPointF, QLineF
 import math
+from ui.level_of_detail import THRESHOLDS, level_of_detail
+from ui.commands import DisconnectCommand
 
 class ConnectionItem(QGraphicsPathItem):
-    def __init__(self, start_node, end_node, canvas):
+    def __init__(self, start_node, end_node, canvas, layered=False):
+        """
+        Args:
+            layered (bool): Drawn by the canvas's edge layer; the pen and
+                path are only built once the item is promoted
+        """
         super().__init__()
         
         self.start_node = start_node
         self.end_node = end_node
         self.canvas = canvas
         self.temp_end = None
+        self.line = QLineF()
         
         # Set visual properties
         self.setZValue(-1)  # Draw under nodes
         self.setFlags(QGraphicsPathItem.ItemIsSelectable)
         self.setAcceptHoverEvents(True)
         
-        self.update_style()
-        self.update_position()
+        if not layered:
+            self.update_style()
+            self.update_position()
 
     def update_style(self):
         """Update the connection's visual style."""
@@ -50,18 +59,10 @@ class ConnectionItem(QGraphicsPathItem):
         path = QPainterPath()
         
         # Get center points of nodes
-        start_pos = self.start_node.scenePos()
-        start_pos = QPointF(
-            start_pos.x() + self.start_node.boundingRect().width() / 2,
-            start_pos.y() + self.start_node.boundingRect().height() / 2
-        )
+        start_pos = self.start_node.center()
         
         if self.end_node:
-            end_pos = self.end_node.scenePos()
-            end_pos = QPointF(
-                end_pos.x() + self.end_node.boundingRect().width() / 2,
-                end_pos.y() + self.end_node.boundingRect().height() / 2
-            )
+            end_pos = self.end_node.center()
         elif self.temp_end:
             end_pos = self.temp_end
         else:
@@ -90,12 +91,26 @@ class ConnectionItem(QGraphicsPathItem):
             end_pos.y() - ctrl_dist * math.sin(angle)
         )
 
+        # Straight stand-in for low levels of detail
+        self.line = QLineF(start_pos, end_pos)
+        
         # Create curved path
         path.moveTo(start_pos)
         path.cubicTo(ctrl1, ctrl2, end_pos)
         
         self.setPath(path)
 
+    def paint(self, painter, option, widget=None):
+        """Draw the curve, or a cheaper stand-in when zoomed out."""
+        lod = level_of_detail(painter)
+        if lod < THRESHOLDS['edge_curve'] and not self.isSelected():
+            if lod >= THRESHOLDS['edge_cull']:
+                painter.setRenderHint(QPainter.Antialiasing, False)
+                painter.setPen(self.pen())
+                painter.drawLine(self.line)
+            return
+        super().paint(painter, option, widget)
+
     def update_temp_end(self, pos):
         """Update temporary end point during connection creation."""
         self.temp_end = pos
@@ -114,7 +129,8 @@ class ConnectionItem(QGraphicsPathItem):
         
         action = menu.exec_(event.screenPos())
         if action == delete_action:
-            self.scene().removeItem(self)
+            self.canvas.push_command(
+                DisconnectCommand(self.canvas, self.start_node.id, self.end_node.id))
 
     def hoverEnterEvent(self, event):
         """Handle hover enter event."""
@@ -125,6 +141,18 @@ class ConnectionItem(QGraphicsPathItem):
         """Handle hover leave event."""
         self.update_style()
         super().hoverLeaveEvent(event)
+        self._return_to_layer()
+
+    def itemChange(self, change, value):
+        if change == QGraphicsPathItem.ItemSelectedHasChanged and not value:
+            self._return_to_layer()
+        return super().itemChange(change, value)
+
+    def _return_to_layer(self):
+        """Let the edge layer draw this connection again, if it came from there."""
+        layer = self.canvas.edge_layer if self.canvas is not None else None
+        if layer is not None and self in layer:
+            layer.schedule_demote(self)
 
     def mousePressEvent(self, event):
         """Handle mouse press for connection interaction."""
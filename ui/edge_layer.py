@@ -0,0 +1,391 @@
+"""
+Batched drawing of connections.
+
+With the edge layer on, connections are not scene items of their own.
+Their curves are kept as rows of contiguous NumPy arrays (start, both
+control points and end) and drawn by a handful of tile items, one per
+grid cell of the scene, each stroking all of its edges with one cached
+path per pen. Only the edges whose endpoints moved are recomputed, and
+only the tiles they fall in rebuild their paths.
+
+A single item spanning the whole map would sit in every leaf of the
+scene's BSP index and be re-indexed on every change; tiles keep both the
+indexing and the repaint of a change local.
+
+An edge under the mouse is promoted to its ConnectionItem, which then
+handles hover, selection and the context menu as usual; it goes back to
+the layer once it is neither hovered nor selected.
+"""
+from PySide6.QtWidgets import QGraphicsItem
+from PySide6.QtGui import QPainter, QPainterPath, QPen, QColor
+from PySide6.QtCore import Qt, QLineF, QRectF, QTimer
+import math
+import numpy as np
+from ui.level_of_detail import THRESHOLDS, level_of_detail
+
+# Side of a tile's grid cell, in scene units
+CELL_SIZE = 512
+# How close, in pixels, the mouse must be to an edge to pick it up
+HOVER_TOLERANCE = 4
+# Segments a curve is split into for hit testing
+HIT_SEGMENTS = 16
+# Pen margin around the control points
+MARGIN = 2
+
+_T = np.linspace(0.0, 1.0, HIT_SEGMENTS + 1)
+# Bernstein weights of the start, control points and end at each sample
+_BEZIER = np.stack([(1 - _T) ** 3, 3 * (1 - _T) ** 2 * _T, 3 * (1 - _T) * _T ** 2, _T ** 3], axis=1)
+
+
+def edge_pen(color_name):
+    """Pen of an unselected, unhovered connection from a node of the given color."""
+    color = QColor(color_name)
+    if color.lightness() > 240:
+        color = QColor(Qt.black)
+    return QPen(color, 2, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+
+
+class EdgeTile(QGraphicsItem):
+    """The layer's edges whose midpoints fall in one grid cell."""
+
+    def __init__(self, layer, key):
+        super().__init__(layer)
+        self.layer = layer
+        self.key = key
+        self.slots = set()
+        self._rect = QRectF()
+        # Per pen index: a path of every curve, and straight stand-ins
+        self._paths = None
+        self._lines = None
+        # Clicks go through to whatever is underneath, such as the
+        # background for rubber band selection
+        self.setAcceptedMouseButtons(Qt.NoButton)
+        self.setAcceptHoverEvents(True)
+
+    def boundingRect(self):
+        return self._rect
+
+    def invalidate(self):
+        """Refit the bounds and drop the cached paths after edges changed."""
+        self._paths = None
+        self._lines = None
+        slots = np.fromiter(self.slots, dtype=np.int64, count=len(self.slots))
+        bounds = self.layer.bounds[slots]
+        rect = QRectF()
+        if len(slots):
+            left, top = bounds[:, 0].min(), bounds[:, 1].min()
+            right, bottom = bounds[:, 2].max(), bounds[:, 3].max()
+            rect = QRectF(left, top, right - left, bottom - top).adjusted(-MARGIN, -MARGIN, MARGIN, MARGIN)
+        if rect != self._rect:
+            self.prepareGeometryChange()
+            self._rect = rect
+        self.update()
+
+    def _drawn_slots(self):
+        promoted = self.layer.promoted
+        return [slot for slot in self.slots if slot not in promoted]
+
+    def _build_paths(self):
+        layer = self.layer
+        slots = self._drawn_slots()
+        paths = {}
+        for slot, (x0, y0, c1x, c1y, c2x, c2y, x1, y1) in zip(slots, layer.geometry[slots].tolist()):
+            pen = layer.pen_of[slot]
+            path = paths.get(pen)
+            if path is None:
+                path = paths[pen] = QPainterPath()
+            path.moveTo(x0, y0)
+            path.cubicTo(c1x, c1y, c2x, c2y, x1, y1)
+        self._paths = paths
+
+    def _build_lines(self):
+        layer = self.layer
+        slots = self._drawn_slots()
+        lines = {}
+        for slot, (x0, y0, x1, y1) in zip(slots, layer.geometry[slots][:, [0, 1, 6, 7]].tolist()):
+            lines.setdefault(layer.pen_of[slot], []).append(QLineF(x0, y0, x1, y1))
+        self._lines = lines
+
+    def paint(self, painter, option, widget=None):
+        """Stroke every edge of the cell, as curves or, zoomed out, straight lines."""
+        lod = level_of_detail(painter)
+        if lod < THRESHOLDS['edge_cull']:
+            return
+        pens = self.layer.pens
+        painter.setBrush(Qt.NoBrush)
+        if lod < THRESHOLDS['edge_curve']:
+            if self._lines is None:
+                self._build_lines()
+            painter.setRenderHint(QPainter.Antialiasing, False)
+            for pen, lines in self._lines.items():
+                painter.setPen(pens[pen])
+                painter.drawLines(lines)
+            return
+        if self._paths is None:
+            self._build_paths()
+        for pen, path in self._paths.items():
+            painter.setPen(pens[pen])
+            painter.drawPath(path)
+
+    def hoverMoveEvent(self, event):
+        self.layer.hover(event.scenePos())
+        super().hoverMoveEvent(event)
+
+
+class EdgeLayer(QGraphicsItem):
+    """Every connection not currently promoted to an item, drawn through EdgeTiles."""
+
+    def __init__(self, canvas):
+        super().__init__()
+        self.canvas = canvas
+        self.setFlag(QGraphicsItem.ItemHasNoContents)
+        # Under the promoted ConnectionItems, which sit under the nodes
+        self.setZValue(-2)
+
+        capacity = 64
+        # Per slot: x0, y0, control 1, control 2, x1, y1 ...
+        self.geometry = np.zeros((capacity, 8))
+        # ... and left, top, right, bottom of the control polygon
+        self.bounds = np.zeros((capacity, 4))
+        self.live = np.zeros(capacity, dtype=bool)
+        # Slot -> ConnectionItem, pen index and tile key
+        self.conns = []
+        self.pen_of = []
+        self.tile_of = []
+        self._free = []
+        self._slots = {}
+        self.pens = []
+        self._pen_index = {}
+        self.tiles = {}
+        # Slots shown by their ConnectionItem instead
+        self.promoted = set()
+        self._demote_pending = set()
+
+    def boundingRect(self):
+        return QRectF()
+
+    def paint(self, painter, option, widget=None):
+        pass
+
+    def __contains__(self, conn):
+        return conn in self._slots
+
+    def __len__(self):
+        return len(self._slots)
+
+    def add(self, conn):
+        """Take over drawing a connection; its geometry follows on the next update()."""
+        if conn in self._slots:
+            return
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = len(self.conns)
+            if slot == len(self.live):
+                self._grow()
+            self.conns.append(None)
+            self.pen_of.append(0)
+            self.tile_of.append(None)
+        self._slots[conn] = slot
+        self.conns[slot] = conn
+        self.live[slot] = True
+
+    def remove(self, conn):
+        """Stop drawing a connection, promoted or not."""
+        slot = self._slots.pop(conn, None)
+        if slot is None:
+            return
+        self.live[slot] = False
+        self.conns[slot] = None
+        self.promoted.discard(slot)
+        self._demote_pending.discard(conn)
+        key = self.tile_of[slot]
+        self.tile_of[slot] = None
+        self._free.append(slot)
+        if key is not None:
+            self._touch({key}, removed={slot: key})
+
+    def clear(self):
+        """Forget every connection and tile."""
+        for tile in self.tiles.values():
+            tile.setParentItem(None)
+            if tile.scene() is not None:
+                tile.scene().removeItem(tile)
+        self.tiles.clear()
+        self._slots.clear()
+        self.conns.clear()
+        self.pen_of.clear()
+        self.tile_of.clear()
+        self._free.clear()
+        self.promoted.clear()
+        self._demote_pending.clear()
+        self.live[:] = False
+
+    def _grow(self):
+        capacity = len(self.live) * 2
+        for name in ('geometry', 'bounds', 'live'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _pen(self, color_name):
+        index = self._pen_index.get(color_name)
+        if index is None:
+            index = self._pen_index[color_name] = len(self.pens)
+            self.pens.append(edge_pen(color_name))
+        return index
+
+    def update_geometry(self, conns):
+        """
+        Recompute the curves of connections whose endpoints moved.
+
+        Returns:
+            list: The given connections the layer does not draw itself,
+                promoted or not in the layer, which need update_position()
+        """
+        rest = []
+        slots = []
+        ends = []
+        for conn in conns:
+            slot = self._slots.get(conn)
+            if slot is None or slot in self.promoted:
+                rest.append(conn)
+                if slot is None:
+                    continue
+            start, end = conn.start_node, conn.end_node
+            slots.append(slot)
+            ends.append((start.node.x + start.width / 2, start.node.y + start.height / 2,
+                         end.node.x + end.width / 2, end.node.y + end.height / 2))
+            self.pen_of[slot] = self._pen(start.color)
+        if not slots:
+            return rest
+        slots = np.array(slots, dtype=np.int64)
+        x0, y0, x1, y1 = np.array(ends).T
+        # As in ConnectionItem.update_position: control points along the
+        # chord, half its length out but at most 200
+        dx, dy = x1 - x0, y1 - y0
+        distance = np.hypot(dx, dy)
+        reach = np.minimum(distance * 0.5, 200)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cos = np.where(distance > 0, dx / distance, 1.0)
+            sin = np.where(distance > 0, dy / distance, 0.0)
+        geometry = np.stack([x0, y0, x0 + reach * cos, y0 + reach * sin,
+                             x1 - reach * cos, y1 - reach * sin, x1, y1], axis=1)
+        xs, ys = geometry[:, 0::2], geometry[:, 1::2]
+        self.geometry[slots] = geometry
+        self.bounds[slots] = np.stack([xs.min(1), ys.min(1), xs.max(1), ys.max(1)], axis=1)
+
+        # Move edges between tiles as their midpoints cross cells
+        keys = np.floor(np.stack([(x0 + x1) / 2, (y0 + y1) / 2], axis=1) / CELL_SIZE).astype(np.int64)
+        touched = set()
+        moved = {}
+        for slot, key in zip(slots.tolist(), map(tuple, keys.tolist())):
+            old = self.tile_of[slot]
+            if old != key:
+                if old is not None:
+                    moved[slot] = old
+                    touched.add(old)
+                self.tile_of[slot] = key
+                self._tile(key).slots.add(slot)
+            touched.add(key)
+        self._touch(touched, removed=moved)
+        return rest
+
+    def _tile(self, key):
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = self.tiles[key] = EdgeTile(self, key)
+        return tile
+
+    def _touch(self, keys, removed=None):
+        """Invalidate tiles, first taking out the slots that left them."""
+        for slot, key in (removed or {}).items():
+            tile = self.tiles.get(key)
+            if tile is not None:
+                tile.slots.discard(slot)
+        for key in keys:
+            tile = self.tiles.get(key)
+            if tile is None:
+                continue
+            if tile.slots:
+                tile.invalidate()
+            else:
+                del self.tiles[key]
+                if tile.scene() is not None:
+                    tile.scene().removeItem(tile)
+
+    def edge_at(self, pos, tolerance):
+        """
+        Find the connection drawn closest to a scene point.
+
+        Returns:
+            ConnectionItem: The closest within tolerance, or None
+        """
+        count = len(self.conns)
+        if not count:
+            return None
+        x, y = pos.x(), pos.y()
+        bounds = self.bounds[:count]
+        near = (self.live[:count]
+                & (bounds[:, 0] - tolerance <= x) & (bounds[:, 2] + tolerance >= x)
+                & (bounds[:, 1] - tolerance <= y) & (bounds[:, 3] + tolerance >= y))
+        candidates = np.nonzero(near)[0]
+        if not len(candidates):
+            return None
+        geometry = self.geometry[candidates]
+        # Sample each curve and measure to the segments between samples
+        px = geometry[:, 0::2] @ _BEZIER.T
+        py = geometry[:, 1::2] @ _BEZIER.T
+        ax, ay = px[:, :-1], py[:, :-1]
+        bx, by = px[:, 1:] - ax, py[:, 1:] - ay
+        length = bx * bx + by * by
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t = np.clip(np.where(length > 0, ((x - ax) * bx + (y - ay) * by) / length, 0.0), 0.0, 1.0)
+        distance = np.hypot(ax + t * bx - x, ay + t * by - y).min(axis=1)
+        best = int(distance.argmin())
+        if distance[best] > tolerance:
+            return None
+        return self.conns[int(candidates[best])]
+
+    def hover(self, pos):
+        """Promote the edge under the mouse, if any."""
+        scale = math.hypot(self.canvas.transform().m11(), self.canvas.transform().m12())
+        conn = self.edge_at(pos, HOVER_TOLERANCE / max(scale, 1e-6))
+        if conn is not None and self._slots[conn] not in self.promoted:
+            self.promote(conn)
+
+    def promote(self, conn):
+        """Show a connection as its own interactive item."""
+        slot = self._slots.get(conn)
+        if slot is None or slot in self.promoted:
+            return
+        self.promoted.add(slot)
+        conn.update_style()
+        conn.update_position()
+        self.canvas.scene.addItem(conn)
+        self._touch({self.tile_of[slot]})
+
+    def schedule_demote(self, conn):
+        """Hand a connection back to the layer once it is neither hovered nor selected.
+
+        Deferred, since this is called from the item's own event handlers.
+        """
+        if conn not in self._slots:
+            return
+        if not self._demote_pending:
+            QTimer.singleShot(0, self._demote)
+        self._demote_pending.add(conn)
+
+    def _demote(self):
+        pending, self._demote_pending = self._demote_pending, set()
+        touched = set()
+        for conn in pending:
+            slot = self._slots.get(conn)
+            if slot is None or slot not in self.promoted or conn.isSelected() or conn.isUnderMouse():
+                continue
+            self.promoted.discard(slot)
+            if conn.scene() is not None:
+                conn.scene().removeItem(conn)
+            touched.add(self.tile_of[slot])
+        self._touch(touched)
@@ -4,7 +4,46 @@ from PySide6.QtWidgets import (
     QStyleOptionGraphicsItem, QStyle
 )
 from PySide6.QtGui import QPainter, QPen, QColor, QBrush, QPainterPath, QTextOption
-from PySide6.QtCore import Qt, QRectF
+from PySide6.QtCore import Qt, QRectF, QPointF
+from ui.level_of_detail import THRESHOLDS, level_of_detail
+from ui.thumbnails import THUMBNAIL_SIZE, thumbnail_cache
+from ui.label_layout import estimate_size, measured_size, measure, label_font, label_layout
+
+# Height of the hidden-node count badge on collapsed nodes
+BADGE_HEIGHT = 16
+
+# Outline pen per state; fill brushes and flat colors per (color, state)
+STATE_PENS = {
+    'normal': QPen(Qt.black, 1.5),
+    'hover': QPen(QColor("#4CAF50"), 2),
+    'selected': QPen(QColor("#2196F3"), 2),
+}
+SELECTED_FILL = QColor("#2196F3")
+BADGE_COLOR = QColor("#455A64")
+_paint_cache = {}
+
+
+def paint_resources(color, state):
+    """
+    Return the shared paint resources for a node color and state.
+
+    Args:
+        color (str): Node color name
+        state (str): 'normal', 'hover' or 'selected'
+
+    Returns:
+        tuple: (outline QPen, fill QBrush, flat-fill QColor)
+    """
+    key = (color, state)
+    resources = _paint_cache.get(key)
+    if resources is None:
+        fill = QColor(color)
+        resources = _paint_cache[key] = (
+            STATE_PENS[state],
+            QBrush(fill),
+            SELECTED_FILL if state == 'selected' else fill
+        )
+    return resources
 
 class DescriptionDialog(QDialog):
     """Dialog for displaying node descriptions."""
@@ -27,23 +66,41 @@ class DescriptionDialog(QDialog):
         
         self.resize(400, 300)
 
+class NodeLabel(QGraphicsTextItem):
+    """Node text that is skipped when zoomed out too far to read."""
+    def paint(self, painter, option, widget=None):
+        if level_of_detail(painter) < THRESHOLDS['node_text']:
+            return
+        super().paint(painter, option, widget)
+
 class IdeaNode(QGraphicsItem):
-    def __init__(self, node_id, title, description, color, shape, keywords, image_path=None):
+    # Room outside the shape for the widest outline pen and antialiasing
+    PEN_MARGIN = 2
+    # Show labels through a child NodeLabel instead of painting them
+    # directly; see CanvasWidget.set_label_items()
+    text_items = False
+    
+    def __init__(self, node):
+        """
+        Args:
+            node (Node): Model node this item shows; the item keeps its
+                position in step with it
+        """
         super().__init__()
         
-        # Node data
-        self.id = node_id
-        self.title = title
-        self.description = description
-        self.color = color
-        self.shape_type = shape.lower()
-        self.keywords = keywords
-        self.image_path = image_path
+        # Node data lives in the model
+        self.node = node
+        
+        # Owning canvas and incident ConnectionItems, maintained by the canvas
+        self.canvas = None
+        self.connections = set()
         
         # Visual properties
         self.width = 120
         self.height = 60
         self.padding = 10
+        # Outline of the shape, rebuilt after the size or shape changes
+        self._shape_path = None
         
         # Set flags
         self.setFlags(
@@ -53,49 +110,141 @@ class IdeaNode(QGraphicsItem):
         )
         self.setAcceptHoverEvents(True)
         
-        # Create text item
-        self.text_item = QGraphicsTextItem(self)
-        self.text_item.setDefaultTextColor(Qt.black)
+        # Repaint from a device-space pixmap; update() invalidates it
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
         
-        # Set text alignment
-        text_option = QTextOption()
-        text_option.setAlignment(Qt.AlignCenter)
-        self.text_item.document().setDefaultTextOption(text_option)
+        # Label text and where it goes; sized from an estimate until the
+        # node is first shown and label_layout() measures it
+        self.label = ''
+        self.label_exact = False
+        self._text_rect = QRectF()
+        self.text_item = None
         
         self.update_text()
 
+    @property
+    def id(self):
+        return self.node.id
+
+    @property
+    def title(self):
+        return self.node.title
+
+    @property
+    def description(self):
+        return self.node.description
+
+    @property
+    def keywords(self):
+        return self.node.keywords
+
+    @property
+    def color(self):
+        return self.node.color
+
+    @property
+    def shape_type(self):
+        return self.node.shape
+
+    @property
+    def image_path(self):
+        return self.node.image
+
+    def to_record(self):
+        return self.node.to_record()
+
     def boundingRect(self):
+        margin = self.PEN_MARGIN
+        return QRectF(-margin, -margin, self.width + 2 * margin, self.height + 2 * margin)
+
+    def shape_rect(self):
+        """Rectangle the node's shape is drawn in, without the pen margin."""
         return QRectF(0, 0, self.width, self.height)
 
+    def image_rect(self):
+        """Box the thumbnail is drawn in, at the top of the node."""
+        return QRectF((self.width - THUMBNAIL_SIZE) / 2, self.padding, THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+
+    def center(self):
+        """Center of the node in scene coordinates."""
+        pos = self.scenePos()
+        return QPointF(pos.x() + self.width / 2, pos.y() + self.height / 2)
+
     def paint(self, painter, option, widget=None):
-        # Set up painter
-        painter.setRenderHint(QPainter.Antialiasing)
+        selected = self.isSelected()
+        lod = level_of_detail(painter)
+        
+        # Far out, a flat colored rectangle is all that can be seen
+        if lod < THRESHOLDS['node_flat']:
+            flat = paint_resources(self.color, 'selected' if selected else 'normal')[2]
+            painter.fillRect(self.shape_rect(), flat)
+            return
         
-        # Set pen based on state
-        if self.isSelected():
-            pen = QPen(QColor("#2196F3"), 2)
+        if selected:
+            state = 'selected'
         elif option.state & QStyle.State_MouseOver:
-            pen = QPen(QColor("#4CAF50"), 2)
+            state = 'hover'
         else:
-            pen = QPen(Qt.black, 1.5)
-        painter.setPen(pen)
+            state = 'normal'
+        pen, brush, _ = paint_resources(self.color, state)
         
-        # Set brush
-        painter.setBrush(QBrush(QColor(self.color)))
+        # Set up painter
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(pen)
+        painter.setBrush(brush)
         
         # Draw shape
-        rect = self.boundingRect()
         if self.shape_type == 'rectangle':
-            painter.drawRect(rect)
+            painter.drawRect(self.shape_rect())
         elif self.shape_type == 'triangle':
-            path = QPainterPath()
-            path.moveTo(rect.center().x(), rect.top())
-            path.lineTo(rect.right(), rect.bottom())
-            path.lineTo(rect.left(), rect.bottom())
-            path.closeSubpath()
-            painter.drawPath(path)
+            painter.drawPath(self.shape())
         else:  # oval
-            painter.drawEllipse(rect)
+            painter.drawEllipse(self.shape_rect())
+        
+        if self.image_path:
+            self.paint_thumbnail(painter)
+        
+        # Shown now, so worth measuring exactly
+        if not self.label_exact:
+            label_layout().request(self)
+        if self.text_item is None and lod >= THRESHOLDS['node_text']:
+            painter.setFont(label_font())
+            painter.setPen(Qt.black)
+            painter.drawText(self._text_rect, Qt.AlignCenter, self.label)
+        
+        if self.node.collapsed and self.canvas is not None:
+            self.paint_badge(painter, self.canvas.hidden_count(self.id))
+
+    def paint_thumbnail(self, painter):
+        """Draw the image thumbnail, or a placeholder until it has loaded."""
+        box = self.image_rect()
+        cache = thumbnail_cache()
+        pixmap = cache.get(self.image_path, item=self)
+        if pixmap is None:
+            painter.fillRect(box, QColor(0, 0, 0, 24))
+            if cache.failed(self.image_path):
+                painter.setPen(QPen(QColor(0, 0, 0, 80), 1))
+                painter.drawLine(box.topLeft(), box.bottomRight())
+                painter.drawLine(box.topRight(), box.bottomLeft())
+            return
+        # Thumbnails fit the box already; center them in it
+        target = QRectF(0, 0, pixmap.width(), pixmap.height())
+        target.moveCenter(box.center())
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
+
+    def paint_badge(self, painter, count):
+        """Draw the number of hidden nodes in the top-right corner."""
+        if not count:
+            return
+        text = f"+{count}"
+        width = max(BADGE_HEIGHT, painter.fontMetrics().horizontalAdvance(text) + 8)
+        box = QRectF(self.width - width, 0, width, BADGE_HEIGHT)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(BADGE_COLOR)
+        painter.drawRoundedRect(box, BADGE_HEIGHT / 2, BADGE_HEIGHT / 2)
+        painter.setPen(Qt.white)
+        painter.drawText(box, Qt.AlignCenter, text)
 
     def update_text(self):
         """Update the displayed text and adjust node size."""
@@ -103,34 +252,89 @@ class IdeaNode(QGraphicsItem):
         text = self.title
         if self.keywords:
             text += f"\n[{', '.join(self.keywords)}]"
+        self.label = text
         
-        self.text_item.setPlainText(text)
+        # An exact size from another node with the same label, or an
+        # estimate until this one is shown
+        size = measured_size(text)
+        self.label_exact = size is not None
+        if size is None:
+            size = estimate_size(text)
+        if self.text_item is not None:
+            self.text_item.setPlainText(text)
+        self._fit_label(*size)
+
+    def finish_layout(self):
+        """Size the node from its measured label; run by label_layout() once the node is shown."""
+        if self.label_exact:
+            return
+        self.label_exact = True
+        if self.text_items and self.text_item is None:
+            self.set_text_item(True)
+        self._fit_label(*measure(self.label))
+
+    def set_text_item(self, enabled):
+        """Show the label through a child NodeLabel, or paint it directly."""
+        if enabled and self.text_item is None:
+            self.text_item = NodeLabel(self)
+            self.text_item.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+            self.text_item.setDefaultTextColor(Qt.black)
+            self.text_item.setFont(label_font())
+            text_option = QTextOption()
+            text_option.setAlignment(Qt.AlignCenter)
+            self.text_item.document().setDefaultTextOption(text_option)
+            self.text_item.setPlainText(self.label)
+            self.text_item.setPos(self._text_rect.topLeft())
+        elif not enabled and self.text_item is not None:
+            if self.text_item.scene() is not None:
+                self.text_item.scene().removeItem(self.text_item)
+            self.text_item.setParentItem(None)
+            self.text_item = None
+        self.update()
+
+    def _fit_label(self, text_width, text_height):
+        """Size the node around a label of the given size, plus a thumbnail on top."""
+        image_height = THUMBNAIL_SIZE + self.padding if self.image_path else 0
+        width = max(120, text_width + 2 * self.padding,
+                    THUMBNAIL_SIZE + 2 * self.padding if self.image_path else 0)
+        height = max(60, text_height + 2 * self.padding + image_height)
+        resized = width != self.width or height != self.height
+        if resized:
+            self.prepareGeometryChange()
+            self.width = width
+            self.height = height
         
-        # Calculate required size based on text
-        text_rect = self.text_item.boundingRect()
-        self.width = max(120, text_rect.width() + 2 * self.padding)
-        self.height = max(60, text_rect.height() + 2 * self.padding)
+        # Center text within the space below the thumbnail
+        self._text_rect = QRectF((self.width - text_width) / 2,
+                                 image_height + (self.height - image_height - text_height) / 2,
+                                 text_width, text_height)
+        if self.text_item is not None:
+            self.text_item.setPos(self._text_rect.topLeft())
+        self._shape_path = None
         
-        # Center text within node
-        text_x = (self.width - text_rect.width()) / 2
-        text_y = (self.height - text_rect.height()) / 2
-        self.text_item.setPos(text_x, text_y)
+        # The node center may have moved
+        if self.connections and self.canvas is not None:
+            self.canvas.schedule_edge_update(self.connections)
+        if resized and self.canvas is not None:
+            self.canvas.item_resized(self)
         
         self.update()
 
     def shape(self):
         """Define the clickable area of the node."""
-        path = QPainterPath()
+        if self._shape_path is not None:
+            return self._shape_path
+        path = self._shape_path = QPainterPath()
+        rect = self.shape_rect()
         if self.shape_type == 'rectangle':
-            path.addRect(self.boundingRect())
+            path.addRect(rect)
         elif self.shape_type == 'triangle':
-            rect = self.boundingRect()
             path.moveTo(rect.center().x(), rect.top())
             path.lineTo(rect.right(), rect.bottom())
             path.lineTo(rect.left(), rect.bottom())
             path.closeSubpath()
         else:  # oval
-            path.addEllipse(self.boundingRect())
+            path.addEllipse(rect)
         return path
 
     def contextMenuEvent(self, event):
@@ -143,6 +347,10 @@ class IdeaNode(QGraphicsItem):
             view_desc_action = menu.addAction("View Description")
         edit_action = menu.addAction("Edit")
         delete_action = menu.addAction("Delete")
+        collapse_action = None
+        if self.canvas is not None and (self.node.collapsed or self.canvas.model.outgoing.get(self.id)):
+            menu.addSeparator()
+            collapse_action = menu.addAction("Expand" if self.node.collapsed else "Collapse")
         
         # Show menu and handle selection
         action = menu.exec_(event.screenPos())
@@ -155,27 +363,32 @@ class IdeaNode(QGraphicsItem):
                 self.scene().views()[0].parent().on_edit_node()
             elif action == delete_action:
                 self.scene().views()[0].parent().on_delete_node()
+            elif collapse_action and action == collapse_action:
+                self.canvas.toggle_collapsed(self.id)
 
     def update_from_data(self, data):
         """Update node properties from data dictionary."""
-        self.title = data['title']
-        self.description = data.get('description', '')
-        self.keywords = data.get('keywords', [])
-        self.color = data['color']
-        self.shape_type = data['shape']
-        self.image_path = data.get('image')
+        if self.canvas is not None:
+            # The canvas refreshes this item once the model reports the change
+            self.canvas.model.update_node(self.id, data)
+        else:
+            self.node.update(data)
+            self.data_changed()
+
+    def data_changed(self):
+        """Redraw after the model node's data changed."""
         self.update_text()
         self.update()
 
     def itemChange(self, change, value):
         """Handle item changes."""
-        if change == QGraphicsItem.ItemPositionChange and self.scene():
-            # Update connected edges
-            for item in self.scene().items():
-                if hasattr(item, 'update_position'):
-                    if hasattr(item, 'start_node') and item.start_node == self:
-                        item.update_position()
-                    elif hasattr(item, 'end_node') and item.end_node == self:
-                        item.update_position()
-        
-        return super().itemChange(change, value)
\ No newline at end of file
+        if change == QGraphicsItem.ItemPositionHasChanged:
+            # Only the edges attached to this node need a new path
+            if self.canvas is not None:
+                self.canvas.item_moved(self)
+            else:
+                self.node.x, self.node.y = value.x(), value.y()
+                for conn in self.connections:
+                    conn.update_position()
+        
+        return super().itemChange(change, value)
@@ -0,0 +1,373 @@
+"""
+Poster-sized PNG, SVG and PDF exports of the whole scene.
+
+PNG output is rendered through QGraphicsScene.render one tile at a time
+and assembled a horizontal strip of tiles at a time, so however large
+the map, only a strip's worth of pixels exists at once. Rendering has to
+stay on the GUI thread, which owns the items; it runs in short slices
+polled by the caller, like loading. Each finished strip is filtered and
+deflated on a thread pool (zlib releases the GIL) as an independent run
+of the one zlib stream IDAT holds, and written out in order as soon as
+it and those before it are done, with at most a few strips in flight.
+SVG and PDF are vector: the scene is painted into a QSvgGenerator or
+QPdfWriter in full-width bands, each clipped to its own rows, which
+keeps the GUI responsive and gives progress.
+"""
+from PySide6.QtGui import QImage, QPainter, QPdfWriter, QPageSize
+from PySide6.QtWidgets import QGraphicsItem
+from PySide6.QtSvg import QSvgGenerator
+from PySide6.QtCore import Qt, QRect, QRectF, QSize, QSizeF, QMarginsF
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import os
+import struct
+import threading
+import time
+import zlib
+from ui.label_layout import label_layout
+
+# Scene units are pixels at this resolution
+SCREEN_DPI = 96
+DPI_CHOICES = (96, 150, 300, 600)
+# PNG output is rendered in square tiles of this side, a row of tiles
+# (a strip) at a time; antialiased strokes rasterize much faster into
+# narrow images than across a poster-wide one
+TILE_SIZE = 1024
+# Strips are made shorter for very wide outputs, to bound the memory a
+# strip takes
+STRIP_PIXELS = 8 * 1024 * 1024
+MIN_STRIP_HEIGHT = 16
+# Bytes per row filtered at once
+FILTER_CHUNK = 3 * 4096
+# Room left around the map, in scene units
+MARGIN = 20
+# Compression threads, and strips rendered ahead of the file writer
+WORKERS = max(1, min(4, os.cpu_count() or 1))
+MAX_PENDING = WORKERS + 1
+# PNG limits each dimension to 2**31 - 1
+MAX_DIMENSION = 2 ** 31 - 1
+FORMATS = ('.png', '.svg', '.pdf')
+EXPORT_FILTERS = "PNG Image (*.png);;SVG Image (*.svg);;PDF Document (*.pdf)"
+
+
+def export_size(rect, dpi):
+    """(width, height) in output pixels of a scene rectangle at a resolution."""
+    scale = dpi / SCREEN_DPI
+    return max(1, round(rect.width() * scale)), max(1, round(rect.height() * scale))
+
+
+def _chunk(kind, data):
+    return (struct.pack('>I', len(data)) + kind + data
+            + struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+
+def _deflate_strip(rows, last, level):
+    """Worker: PNG-filter a strip of rows in place and deflate it as part of a larger stream.
+
+    Args:
+        rows: uint8 array, one PNG row per row: a filter type byte, then RGB
+        last (bool): End the deflate stream after this strip
+        level (int): zlib compression level
+
+    Returns:
+        tuple: (adler32 of the filtered bytes, their length, raw deflate
+        data ending on a byte boundary, or finishing the stream if last)
+    """
+    # Sub filter: each byte minus the one a pixel to its left, worked
+    # right to left so every chunk still reads unfiltered bytes and the
+    # temporary copy numpy makes for the overlap stays a chunk wide
+    rows[:, 0] = 1
+    end = rows.shape[1]
+    while end > 4:
+        start = max(4, end - FILTER_CHUNK)
+        rows[:, start:end] -= rows[:, start - 3:end - 3]
+        end = start
+    data = memoryview(rows).cast('B')
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    deflated = compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+    return zlib.adler32(data), data.nbytes, deflated
+
+
+def _adler32_combine(first, second, second_length):
+    """Checksum of two byte runs from the checksums of each, as zlib's adler32_combine."""
+    base = 65521
+    remainder = second_length % base
+    sum1 = first & 0xFFFF
+    sum2 = (remainder * sum1) % base
+    sum1 += (second & 0xFFFF) + base - 1
+    sum2 += (first >> 16) + (second >> 16) + base - remainder
+    sum1 %= base
+    sum2 %= base
+    return (sum2 << 16) | sum1
+
+
+class _PngStream:
+    """PNG file written strip by strip, with strips deflated on a thread pool."""
+
+    def __init__(self, file_path, width, height, dpi, level=6):
+        self.file = open(file_path, 'wb')
+        self.level = level
+        self._pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='png-export')
+        self._pending = deque()
+        self._adler = 1
+        pixels_per_metre = round(dpi / 0.0254)
+        self.file.write(b'\x89PNG\r\n\x1a\n')
+        # 8-bit RGB, no interlacing
+        self.file.write(_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        self.file.write(_chunk(b'pHYs', struct.pack('>IIB', pixels_per_metre, pixels_per_metre, 1)))
+        # zlib header: deflate, 32K window, default compression
+        self._write_idat(b'\x78\x9c')
+
+    def _write_idat(self, data):
+        if data:
+            self.file.write(_chunk(b'IDAT', data))
+
+    def _write_oldest(self):
+        adler, length, deflated = self._pending.popleft().result()
+        self._adler = _adler32_combine(self._adler, adler, length)
+        self._write_idat(deflated)
+
+    def add(self, rows, last):
+        """Queue a strip; blocks while MAX_PENDING strips are still being compressed."""
+        while len(self._pending) >= MAX_PENDING or (self._pending and self._pending[0].done()):
+            self._write_oldest()
+        self._pending.append(self._pool.submit(_deflate_strip, rows, last, self.level))
+
+    def finish(self):
+        while self._pending:
+            self._write_oldest()
+        self._write_idat(struct.pack('>I', self._adler))
+        self.file.write(_chunk(b'IEND', b''))
+        self.close()
+
+    def close(self):
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._pool.shutdown(wait=True)
+        self.file.close()
+
+
+class ImageExport:
+    """
+    Export a scene to a PNG, SVG or PDF file, a strip at a time.
+
+    The format is taken from the file extension. Call run_slice() from
+    the GUI thread until it returns True; progress, error and cancelled
+    report on the job as for the background file jobs. The scene must not
+    change in the meantime; labels waiting for their exact layout are
+    measured when the export starts and none are resized until it ends.
+    """
+
+    def __init__(self, scene, file_path, dpi=SCREEN_DPI, rect=None):
+        self.scene = scene
+        self.file_path = file_path
+        self.dpi = dpi
+        self.format = os.path.splitext(file_path)[1].lower()
+        if self.format not in FORMATS:
+            raise ValueError(f"Unsupported export format: {self.format or file_path}")
+        if rect is None:
+            rect = scene.itemsBoundingRect().adjusted(-MARGIN, -MARGIN, MARGIN, MARGIN)
+        self.rect = QRectF(rect)
+        self.width, self.height = export_size(self.rect, dpi)
+        if max(self.width, self.height) > MAX_DIMENSION:
+            raise ValueError(f"{self.width} x {self.height} pixels is too large; choose a lower DPI")
+        self.progress = 0.0
+        self.error = None
+        self._cancelled = threading.Event()
+        self.strip_height = min(self.height, TILE_SIZE, max(MIN_STRIP_HEIGHT, STRIP_PIXELS // self.width))
+        # Next output row and, within a PNG strip, column to render
+        self._row = 0
+        self._column = 0
+        self._pixels = None
+        self._tile = None
+        self._png = None
+        self._device = None
+        self._painter = None
+        self._cached = []
+        self._holding_labels = False
+        self._done = False
+
+    def start(self):
+        """Open the output file."""
+        # A node resized between two strips would be drawn at two sizes
+        label_layout().flush()
+        label_layout().hold()
+        self._holding_labels = True
+        self._suspend_caches()
+        try:
+            if self.format == '.png':
+                self._png = _PngStream(self.file_path, self.width, self.height, self.dpi)
+                # Painted as 32-bit pixels, which the raster engine draws fastest
+                self._tile = QImage(min(TILE_SIZE, self.width), self.strip_height, QImage.Format_RGB32)
+            else:
+                self._device = self._vector_device()
+                self._painter = QPainter(self._device)
+                if not self._painter.isActive():
+                    raise OSError(f"Cannot write {self.file_path}")
+                self._painter.setRenderHints(QPainter.Antialiasing | QPainter.TextAntialiasing)
+        except Exception as e:
+            self.error = e
+            self._close(remove=True)
+
+    def _suspend_caches(self):
+        # Item caches only help when the same view is repainted; every item
+        # is painted once here, and the pixmaps each would keep for this
+        # device add up to more than the whole export otherwise holds
+        self._cached = [(item, item.cacheMode()) for item in self.scene.items()
+                        if item.cacheMode() != QGraphicsItem.NoCache]
+        for item, _ in self._cached:
+            item.setCacheMode(QGraphicsItem.NoCache)
+
+    def _restore_caches(self):
+        for item, mode in self._cached:
+            item.setCacheMode(mode)
+        self._cached = []
+
+    def _vector_device(self):
+        if self.format == '.svg':
+            device = QSvgGenerator()
+            device.setFileName(self.file_path)
+            device.setSize(QSize(self.width, self.height))
+            device.setViewBox(QRect(0, 0, self.width, self.height))
+            device.setResolution(self.dpi)
+            device.setTitle(os.path.basename(self.file_path))
+            return device
+        device = QPdfWriter(self.file_path)
+        device.setResolution(self.dpi)
+        # One page the size of the map
+        points = 72 / self.dpi
+        device.setPageSize(QPageSize(QSizeF(self.width * points, self.height * points),
+                                     QPageSize.Point, "", QPageSize.ExactMatch))
+        device.setPageMargins(QMarginsF(0, 0, 0, 0))
+        return device
+
+    def cancel(self):
+        """Stop at the next strip and remove the partial file."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def is_running(self):
+        return not self._done
+
+    def _render(self, painter, target, left, top, width, height):
+        """Render the output pixel rectangle (left, top, width, height) into target."""
+        scale = self.dpi / SCREEN_DPI
+        source = QRectF(self.rect.left() + left / scale, self.rect.top() + top / scale,
+                        width / scale, height / scale)
+        self.scene.render(painter, target, source, Qt.IgnoreAspectRatio)
+
+    def _render_step(self):
+        """Render the next PNG tile, or the next vector band."""
+        rows = min(self.strip_height, self.height - self._row)
+        if self._png is None:
+            self._render(self._painter, QRectF(0, self._row, self.width, rows),
+                         0, self._row, self.width, rows)
+            self._row += rows
+            return
+        if self._pixels is None:
+            # Each row starts with its PNG filter type byte; the strip is
+            # filtered and compressed without another copy
+            self._pixels = np.empty((rows, 1 + self.width * 3), dtype=np.uint8)
+        columns = min(TILE_SIZE, self.width - self._column)
+        self._tile.fill(Qt.white)
+        painter = QPainter(self._tile)
+        painter.setRenderHints(QPainter.Antialiasing | QPainter.TextAntialiasing)
+        self._render(painter, QRectF(0, 0, columns, rows), self._column, self._row, columns, rows)
+        painter.end()
+        # 0xffRRGGBB words to RGB bytes
+        words = np.frombuffer(self._tile.constBits(), dtype=np.uint32,
+                              count=self._tile.width() * self._tile.height()).reshape(-1, self._tile.width())
+        pixels = self._pixels[:, 1:].reshape(rows, self.width, 3)[:, self._column:self._column + columns]
+        words = words[:rows, :columns]
+        pixels[..., 0] = words >> 16
+        pixels[..., 1] = words >> 8
+        pixels[..., 2] = words
+        self._column += columns
+        if self._column >= self.width:
+            self._row += rows
+            self._png.add(self._pixels, self._row >= self.height)
+            self._pixels = None
+            self._column = 0
+
+    def run_slice(self, seconds):
+        """Render strips for up to seconds (at least one); return True once the export has ended."""
+        if self._done:
+            return True
+        if self.error is None and not self.cancelled:
+            deadline = time.perf_counter() + seconds
+            try:
+                while self._row < self.height:
+                    self._render_step()
+                    self.progress = (self._row + self._column / self.width * self.strip_height) / self.height
+                    if self.cancelled or time.perf_counter() >= deadline:
+                        break
+                if self._row < self.height and not self.cancelled:
+                    return False
+                if not self.cancelled:
+                    self._finish()
+            except Exception as e:
+                self.error = e
+        if self.error is not None or self.cancelled:
+            self._close(remove=True)
+        self._restore_caches()
+        if self._holding_labels:
+            label_layout().release()
+            self._holding_labels = False
+        self._done = True
+        return True
+
+    def _finish(self):
+        if self._png is not None:
+            self._png.finish()
+            self._png = None
+        else:
+            self._painter.end()
+            self._painter = None
+            self._device = None
+        self._tile = None
+        self._pixels = None
+        self.progress = 1.0
+
+    def _close(self, remove):
+        if self._png is not None:
+            self._png.close()
+            self._png = None
+        if self._painter is not None:
+            self._painter.end()
+            self._painter = None
+        self._device = None
+        self._tile = None
+        self._pixels = None
+        if remove and os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+
+def export_scene(scene, file_path, dpi=SCREEN_DPI, rect=None, progress=None):
+    """
+    Export a scene in one call, as from a script or a headless session.
+
+    Args:
+        scene: QGraphicsScene to render
+        file_path: Output file; .png, .svg or .pdf
+        dpi: Output resolution; the scene is drawn at dpi / 96 pixels per unit
+        rect: Scene rectangle to export, by default every item plus a margin
+        progress: Optional callable taking a fraction from 0 to 1
+
+    Returns:
+        tuple: (width, height) of the output in pixels
+    """
+    job = ImageExport(scene, file_path, dpi, rect)
+    job.start()
+    while not job.run_slice(0.1):
+        if progress:
+            progress(job.progress)
+    if job.error is not None:
+        raise job.error
+    if progress:
+        progress(1.0)
+    return job.width, job.height
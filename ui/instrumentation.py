@@ -0,0 +1,243 @@
+"""
+Opt-in timing of the hot paths.
+
+When enabled, timing wrappers are installed over the methods listed in
+PROBES and every call is recorded in a log2-bucketed histogram; a timer
+measures how late the event loop runs it. Disabling puts the original
+methods back, so an idle instrumentation layer costs nothing on those
+paths. Rare events, such as the phases of a load, are recorded
+explicitly through record(), which returns at once when disabled.
+
+A rolling cProfile recorder can run alongside, keeping short profile
+segments so that the last N seconds can be dumped for pstats or
+snakeviz.
+
+Set HEPHAESTUS_INSTRUMENT=1 to enable instrumentation at startup.
+"""
+from PySide6.QtCore import Qt, QObject, QTimer, Signal, Slot
+from collections import deque
+import cProfile
+import functools
+import importlib
+import os
+import pstats
+import time
+
+ENV_VAR = 'HEPHAESTUS_INSTRUMENT'
+
+# (module, class, method, histogram) timed while enabled
+PROBES = (
+    ('ui.canvas', 'CanvasWidget', 'paintEvent', 'paint.frame'),
+    ('ui.idea_node', 'IdeaNode', 'paint', 'paint.IdeaNode'),
+    ('ui.idea_node', 'NodeLabel', 'paint', 'paint.NodeLabel'),
+    ('ui.label_layout', 'LabelLayoutQueue', 'run_batch', 'labels.layout'),
+    ('ui.connection_item', 'ConnectionItem', 'paint', 'paint.ConnectionItem'),
+    ('ui.idea_node', 'IdeaNode', 'itemChange', 'edges.itemChange'),
+    ('ui.canvas', 'CanvasWidget', '_flush_edge_updates', 'edges.flush'),
+    ('ui.connection_item', 'ConnectionItem', 'update_position', 'edges.update_position'),
+    ('controllers.background_io', 'BackgroundWriter', '_run', 'io.save'),
+)
+
+# Event loop latency probe interval, in milliseconds
+LATENCY_INTERVAL_MS = 50
+# Length of one profile segment, and how much history is kept
+PROFILE_SEGMENT_SECONDS = 5
+PROFILE_HISTORY_SECONDS = 600
+
+
+class Histogram:
+    """Counts of durations in power-of-two microsecond buckets."""
+
+    BUCKETS = 32
+
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * self.BUCKETS
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[min(int(seconds * 1e6).bit_length(), self.BUCKETS - 1)] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction):
+        """Upper bound, in seconds, of the bucket holding the given fraction of samples."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return min((1 << i) / 1e6, self.max)
+        return self.max
+
+
+def _timed(function, histogram):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            histogram.record(time.perf_counter() - start)
+    return wrapper
+
+
+class RollingProfiler:
+    """cProfile in fixed-length segments, keeping recent ones for dumping."""
+
+    def __init__(self, segment_seconds=PROFILE_SEGMENT_SECONDS, history_seconds=PROFILE_HISTORY_SECONDS):
+        self.segment_seconds = segment_seconds
+        self.segments = deque(maxlen=max(1, history_seconds // segment_seconds))
+        self._profile = None
+        self._started_at = 0.0
+
+    @property
+    def running(self):
+        return self._profile is not None
+
+    def start(self):
+        if self._profile is None:
+            self._begin_segment()
+
+    def stop(self):
+        if self._profile is not None:
+            self._end_segment()
+            self._profile = None
+
+    def rotate(self):
+        """Close the current segment if it is due and start the next."""
+        if self._profile is not None and time.monotonic() - self._started_at >= self.segment_seconds:
+            self._end_segment()
+            self._begin_segment()
+
+    def _begin_segment(self):
+        self._profile = cProfile.Profile()
+        self._started_at = time.monotonic()
+        self._profile.enable()
+
+    def _end_segment(self):
+        self._profile.disable()
+        self.segments.append((time.monotonic(), self._profile))
+
+    def dump(self, file_path, seconds):
+        """
+        Write the profile of about the last seconds to file_path.
+
+        Returns:
+            bool: False if nothing was recorded in that window
+        """
+        running = self.running
+        if running:
+            self._end_segment()
+        cutoff = time.monotonic() - seconds
+        profiles = [profile for ended, profile in self.segments if ended >= cutoff]
+        if running:
+            self._begin_segment()
+        if not profiles:
+            return False
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(file_path)
+        return True
+
+
+class Instrumentation(QObject):
+    """Histograms of hot-path timings, filled only while enabled."""
+
+    toggled = Signal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.enabled = False
+        self.histograms = {}
+        self.profiler = RollingProfiler()
+        self._originals = []
+
+        self._latency_timer = QTimer(self)
+        self._latency_timer.setTimerType(Qt.PreciseTimer)
+        self._latency_timer.setInterval(LATENCY_INTERVAL_MS)
+        self._latency_timer.timeout.connect(self._probe_latency)
+        self._last_tick = 0.0
+
+        self._profile_timer = QTimer(self)
+        self._profile_timer.setInterval(500)
+        self._profile_timer.timeout.connect(self.profiler.rotate)
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def record(self, name, seconds):
+        """Record one duration, if enabled."""
+        if self.enabled:
+            self.histogram(name).record(seconds)
+
+    def set_enabled(self, enabled):
+        """Install or remove the timing probes."""
+        if enabled == self.enabled:
+            return
+        if enabled:
+            for module_name, class_name, method, name in PROBES:
+                cls = getattr(importlib.import_module(module_name), class_name)
+                original = cls.__dict__[method]
+                self._originals.append((cls, method, original))
+                setattr(cls, method, _timed(original, self.histogram(name)))
+            self._last_tick = time.perf_counter()
+            self._latency_timer.start()
+        else:
+            for cls, method, original in reversed(self._originals):
+                setattr(cls, method, original)
+            self._originals = []
+            self._latency_timer.stop()
+        self.enabled = enabled
+        self.toggled.emit(enabled)
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def set_profiling(self, profiling):
+        """Start or stop the rolling cProfile recorder."""
+        if profiling:
+            self.profiler.start()
+            self._profile_timer.start()
+        else:
+            self._profile_timer.stop()
+            self.profiler.stop()
+
+    @Slot()
+    def _probe_latency(self):
+        now = time.perf_counter()
+        late = now - self._last_tick - LATENCY_INTERVAL_MS / 1000
+        self._last_tick = now
+        self.histogram('event_loop.latency').record(max(late, 0.0))
+
+
+_instrumentation = None
+
+
+def instrumentation():
+    """Return the process-wide Instrumentation, creating it on first use."""
+    global _instrumentation
+    if _instrumentation is None:
+        _instrumentation = Instrumentation()
+        if os.environ.get(ENV_VAR, '') not in ('', '0'):
+            _instrumentation.set_enabled(True)
+    return _instrumentation
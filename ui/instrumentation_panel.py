@@ -0,0 +1,119 @@
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QCheckBox, QPushButton, QTableWidget,
+    QTableWidgetItem, QHeaderView, QSpinBox, QLabel, QFileDialog
+)
+from PySide6.QtCore import Qt, QTimer, Slot
+from ui.instrumentation import instrumentation, PROFILE_HISTORY_SECONDS
+
+COLUMNS = ("Probe", "Calls", "Mean ms", "p50 ms", "p95 ms", "Max ms", "Total s")
+# Milliseconds between table refreshes while visible
+REFRESH_INTERVAL_MS = 500
+
+
+class InstrumentationPanel(QWidget):
+    """Live hot-path timings, with controls for instrumentation and profiling."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.instruments = instrumentation()
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+
+        controls = QHBoxLayout()
+        self.enabled_check = QCheckBox("Enabled")
+        self.enabled_check.setChecked(self.instruments.enabled)
+        self.enabled_check.toggled.connect(self.instruments.set_enabled)
+        self.instruments.toggled.connect(self._on_toggled)
+        controls.addWidget(self.enabled_check)
+        reset_button = QPushButton("Reset")
+        reset_button.clicked.connect(self._reset)
+        controls.addWidget(reset_button)
+        controls.addStretch()
+        layout.addLayout(controls)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        profile_row = QHBoxLayout()
+        self.profile_check = QCheckBox("Record profile")
+        self.profile_check.toggled.connect(self.instruments.set_profiling)
+        profile_row.addWidget(self.profile_check)
+        profile_row.addStretch()
+        profile_row.addWidget(QLabel("Last"))
+        self.window_spin = QSpinBox()
+        self.window_spin.setRange(self.instruments.profiler.segment_seconds, PROFILE_HISTORY_SECONDS)
+        self.window_spin.setValue(30)
+        self.window_spin.setSuffix(" s")
+        profile_row.addWidget(self.window_spin)
+        dump_button = QPushButton("Dump...")
+        dump_button.clicked.connect(self._dump_profile)
+        profile_row.addWidget(dump_button)
+        layout.addLayout(profile_row)
+
+        self.status = QLabel()
+        layout.addWidget(self.status)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(REFRESH_INTERVAL_MS)
+        self._timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self._timer.start()
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
+
+    @Slot(bool)
+    def _on_toggled(self, enabled):
+        self.enabled_check.setChecked(enabled)
+        self.refresh()
+
+    @Slot()
+    def _reset(self):
+        self.instruments.reset()
+        self.refresh()
+
+    @Slot()
+    def refresh(self):
+        """Show the current histograms."""
+        rows = sorted(self.instruments.histograms.items())
+        self.table.setRowCount(len(rows))
+        for row, (name, histogram) in enumerate(rows):
+            values = (
+                name,
+                str(histogram.count),
+                f"{histogram.mean * 1000:.3f}",
+                f"{histogram.percentile(0.5) * 1000:.3f}",
+                f"{histogram.percentile(0.95) * 1000:.3f}",
+                f"{histogram.max * 1000:.3f}",
+                f"{histogram.total:.3f}",
+            )
+            for column, value in enumerate(values):
+                item = self.table.item(row, column)
+                if item is None:
+                    item = QTableWidgetItem()
+                    if column:
+                        item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                    self.table.setItem(row, column, item)
+                item.setText(value)
+
+    @Slot()
+    def _dump_profile(self):
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Save Profile", "hephaestus.prof", "Profile Files (*.prof);;All Files (*)"
+        )
+        if not file_path:
+            return
+        seconds = self.window_spin.value()
+        if self.instruments.profiler.dump(file_path, seconds):
+            self.status.setText(f"Saved the last {seconds} s of profile to {file_path}")
+        else:
+            self.status.setText("Nothing recorded yet; turn on Record profile first")
@@ -0,0 +1,134 @@
+"""
+Deferred measuring of node labels.
+
+A node starts out sized from a cheap estimate: the longest line's
+character count times the font's average character width. The exact
+size is measured only once the node is first painted, that is, once it
+is visible, by a queue that works through such nodes in short idle-time
+batches. Exact sizes are shared by every label with the same text.
+"""
+from PySide6.QtCore import QObject, QTimer, Slot
+from PySide6.QtGui import QFontMetricsF, QGuiApplication
+import time
+
+# Room around the text, as QTextDocument's default document margin
+TEXT_MARGIN = 4
+# Time budget per batch of exact layouts, in seconds
+BATCH_SECONDS = 0.008
+# Distinct label texts whose exact sizes are kept
+MAX_MEASURED = 50000
+
+_metrics = None
+_measured = {}
+
+
+def label_font():
+    """Font node labels are drawn and measured in."""
+    return QGuiApplication.font()
+
+
+def _font_metrics():
+    global _metrics
+    if _metrics is None:
+        _metrics = QFontMetricsF(label_font())
+    return _metrics
+
+
+def estimate_size(text):
+    """Approximate (width, height) of a label from character counts."""
+    metrics = _font_metrics()
+    lines = text.split('\n')
+    width = max(len(line) for line in lines) * metrics.averageCharWidth()
+    return width + 2 * TEXT_MARGIN, len(lines) * metrics.lineSpacing() + 2 * TEXT_MARGIN
+
+
+def measured_size(text):
+    """Exact (width, height) of a label if some node has been measured with this text, else None."""
+    return _measured.get(text)
+
+
+def measure(text):
+    """Exact (width, height) of a label, as drawn centered line by line."""
+    size = _measured.get(text)
+    if size is None:
+        if len(_measured) >= MAX_MEASURED:
+            _measured.clear()
+        bounds = _font_metrics().size(0, text)
+        size = _measured[text] = (bounds.width() + 2 * TEXT_MARGIN, bounds.height() + 2 * TEXT_MARGIN)
+    return size
+
+
+class LabelLayoutQueue(QObject):
+    """Nodes waiting for an exact label layout, processed while the event loop is idle."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # Ordered set of IdeaNodes
+        self._pending = {}
+        # While held, nodes are queued but not resized
+        self._holds = 0
+        self._timer = QTimer(self)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self._on_timer)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def request(self, node):
+        """Queue a node; safe to call from paint()."""
+        if node not in self._pending:
+            self._pending[node] = None
+            if not self._holds and not self._timer.isActive():
+                self._timer.start()
+
+    def hold(self):
+        """Stop resizing nodes until release(), as while something renders the scene piecewise."""
+        self._holds += 1
+        self._timer.stop()
+
+    def release(self):
+        self._holds -= 1
+        if not self._holds and self._pending:
+            self._timer.start()
+
+    def discard(self, node):
+        """Unqueue a node that is leaving the scene."""
+        self._pending.pop(node, None)
+
+    def discard_scene(self, scene):
+        """Unqueue every node in scene; call before the scene deletes its items."""
+        for node in [node for node in self._pending if node.scene() is scene]:
+            del self._pending[node]
+
+    @Slot()
+    def _on_timer(self):
+        self.run_batch()
+
+    def run_batch(self):
+        """Lay out queued nodes for up to BATCH_SECONDS."""
+        deadline = time.perf_counter() + BATCH_SECONDS
+        pending = self._pending
+        while pending and time.perf_counter() < deadline:
+            node = next(iter(pending))
+            del pending[node]
+            # Nodes removed in the meantime are dropped
+            if node.scene() is not None:
+                node.finish_layout()
+        if not pending:
+            self._timer.stop()
+
+    def flush(self):
+        """Lay out every queued node now."""
+        while self._pending:
+            self.run_batch()
+
+
+_queue = None
+
+
+def label_layout():
+    """Return the process-wide LabelLayoutQueue, creating it on first use."""
+    global _queue
+    if _queue is None:
+        _queue = LabelLayoutQueue()
+    return _queue
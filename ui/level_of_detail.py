@@ -0,0 +1,23 @@
+from PySide6.QtWidgets import QStyleOptionGraphicsItem
+
+# Zoom levels, as returned by QStyleOptionGraphicsItem.levelOfDetailFromTransform,
+# below which items drop detail. 1.0 is 100% zoom.
+THRESHOLDS = {
+    'node_text': 0.45,   # node labels are not drawn
+    'node_flat': 0.3,    # nodes become flat rectangles without outline
+    'edge_curve': 0.35,  # edges become straight lines
+    'edge_cull': 0.1,    # unselected edges are not drawn
+}
+
+
+def set_thresholds(**thresholds):
+    """Override one or more level-of-detail thresholds."""
+    unknown = set(thresholds) - set(THRESHOLDS)
+    if unknown:
+        raise ValueError(f"Unknown level-of-detail thresholds: {', '.join(sorted(unknown))}")
+    THRESHOLDS.update(thresholds)
+
+
+def level_of_detail(painter):
+    """Return the level of detail for the painter's current transform."""
+    return QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
@@ -1,11 +1,38 @@
 from PySide6.QtWidgets import (
-    QMainWindow, QMessageBox, QToolBar, QFileDialog
+    QMainWindow, QMessageBox, QToolBar, QFileDialog,
+    QProgressBar, QPushButton, QDockWidget, QInputDialog
 )
-from PySide6.QtGui import QAction, QKeySequence
-from PySide6.QtCore import Qt, Slot
+from PySide6.QtGui import QAction, QActionGroup, QKeySequence
+from PySide6.QtCore import Qt, Slot, QTimer
+import time
 from ui.canvas import CanvasWidget
 from ui.add_idea_dialog import AddIdeaDialog
-from controllers.import_export import import_data, export_data
+from ui.search_panel import SearchPanel
+from ui.minimap import Minimap
+from ui.instrumentation import instrumentation
+from ui.instrumentation_panel import InstrumentationPanel
+from ui.commands import (
+    UndoStack, AddNodeCommand, DeleteNodesCommand, EditNodeCommand,
+    MoveNodesCommand, DisconnectCommand
+)
+from ui.connection_item import ConnectionItem
+from ui.idea_node import IdeaNode
+from ui.autosave import Autosave
+from ui.thumbnails import thumbnail_cache
+from ui.image_export import ImageExport, EXPORT_FILTERS, DPI_CHOICES, SCREEN_DPI, FORMATS
+from controllers.import_export import HMAP_EXTENSION
+from controllers.background_io import BackgroundReader, BackgroundWriter, END
+
+OPEN_FILTERS = (
+    "Mind Map Files (*.json *.hmap);;JSON Mind Map Files (*.json);;"
+    "Binary Mind Map Files (*.hmap);;All Files (*)"
+)
+JSON_FILTER = "Mind Map Files (*.json)"
+COMPACT_FILTER = "Compact Mind Map Files (*.json)"
+BINARY_FILTER = "Binary Mind Map Files (*.hmap)"
+
+# GUI-thread time budget per timer tick while building items from a load
+LOAD_SLICE_SECONDS = 0.012
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -17,11 +44,24 @@ class MainWindow(QMainWindow):
         self.canvas = CanvasWidget()
         self.setCentralWidget(self.canvas)
 
+        # Undo history shared by every canvas edit
+        self.undo_stack = UndoStack(parent=self)
+        self.canvas.undo_stack = self.undo_stack
+
+        self._create_search_dock()
+        self._create_minimap_dock()
+        self._create_instrumentation_dock()
         self._create_actions()
         self._create_menus()
         self._create_toolbar()
+        self._create_progress_widgets()
+        self._layout_runner = None
         self.statusBar().showMessage("Ready")
 
+        # Journal edits for crash recovery once the window is up
+        self.autosave = Autosave(self.canvas, parent=self)
+        QTimer.singleShot(0, self._start_autosave)
+
     def _create_actions(self):
         # File actions
         self.new_map_action = QAction("&New", self)
@@ -36,6 +76,16 @@ class MainWindow(QMainWindow):
         self.save_action.setShortcut(QKeySequence.Save)
         self.save_action.triggered.connect(self.on_save)
 
+        self.export_image_action = QAction("&Export Image...", self)
+        self.export_image_action.setShortcut("Ctrl+Shift+E")
+        self.export_image_action.triggered.connect(self.on_export_image)
+
+        # Edit actions
+        self.undo_action = self.undo_stack.createUndoAction(self, "&Undo")
+        self.undo_action.setShortcut(QKeySequence.Undo)
+        self.redo_action = self.undo_stack.createRedoAction(self, "&Redo")
+        self.redo_action.setShortcut(QKeySequence.Redo)
+
         # Node actions
         self.create_root_action = QAction("Create &Root Node", self)
         self.create_root_action.setShortcut("Ctrl+R")
@@ -53,6 +103,64 @@ class MainWindow(QMainWindow):
         self.delete_node_action.setShortcut(QKeySequence.Delete)
         self.delete_node_action.triggered.connect(self.on_delete_node)
 
+        self.collapse_action = QAction("C&ollapse/Expand Subtree", self)
+        self.collapse_action.setShortcut("Space")
+        self.collapse_action.triggered.connect(self.on_toggle_collapse)
+
+        self.find_action = QAction("&Find...", self)
+        self.find_action.setShortcut(QKeySequence.Find)
+        self.find_action.triggered.connect(self.on_find)
+
+        # View actions
+        self.frame_time_action = QAction("Show &Frame Time", self)
+        self.frame_time_action.setCheckable(True)
+        self.frame_time_action.toggled.connect(self.canvas.set_frame_time_visible)
+
+        self.edge_layer_action = QAction("&Batch Edge Rendering", self)
+        self.edge_layer_action.setCheckable(True)
+        self.edge_layer_action.toggled.connect(self.canvas.set_edge_layer)
+
+        self.label_items_action = QAction("&Labels as Text Items", self)
+        self.label_items_action.setCheckable(True)
+        self.label_items_action.toggled.connect(self.canvas.set_label_items)
+
+        self.instrumentation_action = QAction("Enable &Instrumentation", self)
+        self.instrumentation_action.setCheckable(True)
+        self.instrumentation_action.setChecked(instrumentation().enabled)
+        self.instrumentation_action.toggled.connect(instrumentation().set_enabled)
+        instrumentation().toggled.connect(self.instrumentation_action.setChecked)
+        
+        self.update_mode_group = QActionGroup(self)
+        for label, mode in (("&Minimal", 'minimal'), ("&Smart", 'smart'),
+                            ("&Bounding Rect", 'bounding'), ("&Full Viewport", 'full')):
+            action = QAction(label, self)
+            action.setCheckable(True)
+            action.setChecked(mode == 'smart')
+            action.setData(mode)
+            self.update_mode_group.addAction(action)
+        self.update_mode_group.triggered.connect(
+            lambda action: self.canvas.set_viewport_update_mode(action.data())
+        )
+
+        # Layout actions
+        self.auto_layout_action = QAction("&Auto Layout", self)
+        self.auto_layout_action.setShortcut("Ctrl+L")
+        self.auto_layout_action.triggered.connect(self.on_auto_layout)
+
+        self.stop_layout_action = QAction("&Stop Layout", self)
+        self.stop_layout_action.setEnabled(False)
+        self.stop_layout_action.triggered.connect(self.on_stop_layout)
+
+        self.tree_layout_group = QActionGroup(self)
+        for label, mode in (("&Free Placement", None), ("&Tidy Tree", 'tidy'),
+                            ("&Radial Tree", 'radial')):
+            action = QAction(label, self)
+            action.setCheckable(True)
+            action.setChecked(mode is None)
+            action.setData(mode)
+            self.tree_layout_group.addAction(action)
+        self.tree_layout_group.triggered.connect(self.on_tree_layout)
+
     def _create_menus(self):
         menu_bar = self.menuBar()
 
@@ -61,16 +169,42 @@ class MainWindow(QMainWindow):
         file_menu.addAction(self.new_map_action)
         file_menu.addAction(self.open_action)
         file_menu.addAction(self.save_action)
+        file_menu.addAction(self.export_image_action)
         file_menu.addSeparator()
         file_menu.addAction("E&xit", self.close, "Ctrl+Q")
 
         # Edit menu
         edit_menu = menu_bar.addMenu("&Edit")
+        edit_menu.addAction(self.undo_action)
+        edit_menu.addAction(self.redo_action)
+        edit_menu.addSeparator()
         edit_menu.addAction(self.create_root_action)
         edit_menu.addAction(self.add_child_action)
         edit_menu.addSeparator()
         edit_menu.addAction(self.edit_node_action)
         edit_menu.addAction(self.delete_node_action)
+        edit_menu.addAction(self.collapse_action)
+        edit_menu.addSeparator()
+        edit_menu.addAction(self.find_action)
+
+        # View menu
+        view_menu = menu_bar.addMenu("&View")
+        view_menu.addAction(self.search_dock.toggleViewAction())
+        view_menu.addAction(self.minimap_dock.toggleViewAction())
+        view_menu.addAction(self.instrumentation_dock.toggleViewAction())
+        view_menu.addAction(self.instrumentation_action)
+        view_menu.addAction(self.frame_time_action)
+        view_menu.addAction(self.edge_layer_action)
+        view_menu.addAction(self.label_items_action)
+        update_menu = view_menu.addMenu("Viewport &Updates")
+        update_menu.addActions(self.update_mode_group.actions())
+
+        # Layout menu
+        layout_menu = menu_bar.addMenu("&Layout")
+        layout_menu.addAction(self.auto_layout_action)
+        layout_menu.addAction(self.stop_layout_action)
+        layout_menu.addSeparator()
+        layout_menu.addActions(self.tree_layout_group.actions())
 
     def _create_toolbar(self):
         toolbar = QToolBar()
@@ -79,11 +213,300 @@ class MainWindow(QMainWindow):
         toolbar.addAction(self.open_action)
         toolbar.addAction(self.save_action)
         toolbar.addSeparator()
+        toolbar.addAction(self.undo_action)
+        toolbar.addAction(self.redo_action)
+        toolbar.addSeparator()
         toolbar.addAction(self.create_root_action)
         toolbar.addAction(self.add_child_action)
         toolbar.addAction(self.edit_node_action)
         toolbar.addAction(self.delete_node_action)
 
+    def _create_search_dock(self):
+        self.search_panel = SearchPanel(self.canvas)
+        self.search_panel.node_chosen.connect(self.canvas.focus_node)
+        self.search_dock = QDockWidget("Search", self)
+        self.search_dock.setObjectName("search_dock")
+        self.search_dock.setWidget(self.search_panel)
+        self.addDockWidget(Qt.LeftDockWidgetArea, self.search_dock)
+        self.search_dock.hide()
+
+    def _create_minimap_dock(self):
+        self.minimap = Minimap(self.canvas)
+        self.minimap_dock = QDockWidget("Overview", self)
+        self.minimap_dock.setObjectName("minimap_dock")
+        self.minimap_dock.setWidget(self.minimap)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.minimap_dock)
+        self.minimap_dock.hide()
+
+    def _create_instrumentation_dock(self):
+        self.instrumentation_dock = QDockWidget("Instrumentation", self)
+        self.instrumentation_dock.setObjectName("instrumentation_dock")
+        self.instrumentation_dock.setWidget(InstrumentationPanel())
+        self.addDockWidget(Qt.RightDockWidgetArea, self.instrumentation_dock)
+        self.instrumentation_dock.hide()
+
+    def _create_progress_widgets(self):
+        # Background open/save progress, shown only while a job runs
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setMaximumWidth(200)
+        self.progress_bar.hide()
+        self.statusBar().addPermanentWidget(self.progress_bar)
+
+        self.cancel_io_button = QPushButton("Cancel")
+        self.cancel_io_button.clicked.connect(self.on_cancel_io)
+        self.cancel_io_button.hide()
+        self.statusBar().addPermanentWidget(self.cancel_io_button)
+
+        self._io_job = None
+        self._io_started = 0.0
+        self._io_timer = QTimer(self)
+        self._io_timer.setInterval(4)
+        self._io_timer.timeout.connect(self._pump_io)
+
+    def _start_io(self, job, message, lock_editing=False):
+        """Run a background file job and lock out conflicting actions.
+
+        Args:
+            job: The job to start and poll
+            message (str): Status bar message while it runs
+            lock_editing (bool): Also lock out edits, for jobs that build or
+                read the items while the event loop keeps running
+        """
+        self._io_job = job
+        self._io_started = time.perf_counter()
+        for action in (self.new_map_action, self.open_action, self.save_action,
+                       self.export_image_action, self.auto_layout_action):
+            action.setEnabled(False)
+        if lock_editing:
+            self.canvas.setEnabled(False)
+            self._set_editing_enabled(False)
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.cancel_io_button.show()
+        self.statusBar().showMessage(message)
+        job.start()
+        self._io_timer.start()
+
+    def _end_io(self):
+        self._io_timer.stop()
+        self._io_job = None
+        self.progress_bar.hide()
+        self.cancel_io_button.hide()
+        self.canvas.setEnabled(True)
+        self._set_editing_enabled(True)
+        self.save_action.setEnabled(True)
+        self.export_image_action.setEnabled(True)
+        # A running layout keeps the map from being replaced
+        for action in (self.new_map_action, self.open_action):
+            action.setEnabled(self._layout_runner is None)
+
+    def _set_editing_enabled(self, enabled):
+        """Enable or disable every action that changes the map."""
+        for action in (self.create_root_action, self.add_child_action, self.edit_node_action,
+                       self.delete_node_action, self.collapse_action):
+            action.setEnabled(enabled)
+        self.tree_layout_group.setEnabled(enabled)
+        self.auto_layout_action.setEnabled(enabled and self._layout_runner is None)
+        self.undo_action.setEnabled(enabled and self.undo_stack.canUndo())
+        self.redo_action.setEnabled(enabled and self.undo_stack.canRedo())
+
+    @Slot()
+    def _pump_io(self):
+        """Poll the running job; for loads, build items within a time slice."""
+        job = self._io_job
+        self.progress_bar.setValue(int(job.progress * 100))
+        if isinstance(job, BackgroundReader):
+            deadline = time.perf_counter() + LOAD_SLICE_SECONDS
+            while time.perf_counter() < deadline:
+                batch = job.take()
+                if batch is None:
+                    return
+                if batch is END:
+                    self._finish_open()
+                    return
+                try:
+                    self.canvas.load_batch(*batch)
+                except Exception as e:
+                    job.cancel()
+                    job.error = e
+                    self._finish_open()
+                    return
+        elif isinstance(job, ImageExport):
+            if job.run_slice(LOAD_SLICE_SECONDS):
+                self._finish_export()
+        elif not job.is_running():
+            self._finish_save()
+
+    def _finish_open(self):
+        job = self._io_job
+        timings = self.canvas.end_load()
+        timings['total'] = time.perf_counter() - self._io_started
+        self._end_io()
+        if job.error:
+            self.canvas.clear_all()
+            self.statusBar().showMessage("Open failed")
+            QMessageBox.critical(self, "Import Error", str(job.error))
+            return
+        phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items() if seconds)
+        self.statusBar().showMessage(f"Opened: {job.file_path} ({phases})")
+
+    def _finish_save(self):
+        job = self._io_job
+        elapsed = time.perf_counter() - self._io_started
+        self._end_io()
+        if job.error:
+            self.statusBar().showMessage("Save failed")
+            QMessageBox.critical(self, "Export Error", str(job.error))
+        elif job.cancelled:
+            self.statusBar().showMessage("Save cancelled")
+        else:
+            self.statusBar().showMessage(f"Saved to: {job.file_path} ({elapsed:.2f}s)")
+
+    def _finish_export(self):
+        job = self._io_job
+        elapsed = time.perf_counter() - self._io_started
+        self._end_io()
+        if job.error:
+            self.statusBar().showMessage("Image export failed")
+            QMessageBox.critical(self, "Export Error", str(job.error))
+        elif job.cancelled:
+            self.statusBar().showMessage("Image export cancelled")
+        else:
+            self.statusBar().showMessage(
+                f"Exported {job.width} x {job.height} image to: {job.file_path} ({elapsed:.2f}s)")
+
+    @Slot()
+    def on_cancel_io(self):
+        job = self._io_job
+        if not job:
+            return
+        job.cancel()
+        if isinstance(job, BackgroundReader):
+            # Drop the partially built map
+            self.canvas.end_load()
+            self.canvas.clear_all()
+            self._end_io()
+            self.statusBar().showMessage("Open cancelled")
+        # A cancelled save or image export finishes in _pump_io once it has cleaned up
+
+    @Slot()
+    def on_auto_layout(self):
+        if self._layout_runner or self._io_job:
+            return
+        try:
+            from ui.auto_layout import AutoLayoutRunner
+        except ImportError as e:
+            QMessageBox.warning(self, "Auto Layout",
+                                f"Auto layout needs NumPy installed ({e}).")
+            return
+        if len(self.canvas.nodes) < 2:
+            return
+        # Force-directed positions replace any managed tree layout
+        self.tree_layout_group.actions()[0].setChecked(True)
+        self.canvas.layout_mode = None
+        self._layout_runner = AutoLayoutRunner(self.canvas, parent=self)
+        self._layout_runner.finished.connect(self._finish_layout)
+        self.auto_layout_action.setEnabled(False)
+        self.stop_layout_action.setEnabled(True)
+        self.open_action.setEnabled(False)
+        self.new_map_action.setEnabled(False)
+        self.statusBar().showMessage(f"Laying out {len(self.canvas.nodes)} nodes...")
+        self._layout_runner.start()
+
+    @Slot(QAction)
+    def on_tree_layout(self, action):
+        mode = action.data()
+        start = time.perf_counter()
+        self.canvas.begin_move_record()
+        try:
+            self.canvas.set_layout_mode(mode)
+        finally:
+            moves = self.canvas.end_move_record()
+        if moves:
+            self.undo_stack.push(MoveNodesCommand(self.canvas, moves, action.text().replace('&', '')))
+        if mode:
+            elapsed = time.perf_counter() - start
+            self.statusBar().showMessage(f"{action.text().replace('&', '')} layout ({elapsed:.2f}s)")
+        else:
+            self.statusBar().showMessage("Free placement")
+
+    @Slot()
+    def on_stop_layout(self):
+        if self._layout_runner:
+            self._layout_runner.stop()
+
+    @Slot(bool)
+    def _finish_layout(self, completed):
+        runner = self._layout_runner
+        self._layout_runner = None
+        runner.deleteLater()
+        self.auto_layout_action.setEnabled(self._io_job is None)
+        self.stop_layout_action.setEnabled(False)
+        # A running file job keeps the map from being replaced
+        for action in (self.new_map_action, self.open_action):
+            action.setEnabled(self._io_job is None)
+        moves = runner.moves()
+        if moves:
+            self.undo_stack.push(MoveNodesCommand(self.canvas, moves, "Auto Layout"))
+        if runner.error:
+            self.statusBar().showMessage("Layout failed")
+            QMessageBox.critical(self, "Layout Error", str(runner.error))
+        else:
+            self.statusBar().showMessage("Layout finished" if completed else "Layout stopped")
+
+    @Slot()
+    def _start_autosave(self):
+        restored = False
+        if self.autosave.has_session():
+            if QMessageBox.question(self, "Recover Session",
+                                    "Restore the mind map from your last session?",
+                                    QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
+                start = time.perf_counter()
+                try:
+                    count = self.autosave.restore()
+                    restored = True
+                    self.statusBar().showMessage(
+                        f"Restored last session ({count} changes replayed, "
+                        f"{time.perf_counter() - start:.2f}s)")
+                except Exception as e:
+                    # Leave the session files alone so nothing more is lost
+                    self.canvas.clear_all()
+                    QMessageBox.critical(
+                        self, "Recovery Error",
+                        f"{e}\n\nAutosave is off for this session; the previous "
+                        f"session is kept in {self.autosave.journal.directory}")
+                    return
+            else:
+                self.autosave.discard()
+        self.autosave.start()
+        if restored:
+            # Fold the replayed journal into a fresh snapshot
+            self.autosave.compact()
+
+    def closeEvent(self, event):
+        if self._layout_runner:
+            self._layout_runner.stop()
+        if self.autosave.running:
+            # A clean exit leaves nothing to recover
+            self.autosave.finish()
+        else:
+            # Not journaling, as after a failed recovery; keep any session files
+            self.autosave.stop()
+        job = self._io_job
+        if isinstance(job, BackgroundWriter):
+            # Let an in-flight save complete rather than leave a stale file
+            job.wait()
+        elif isinstance(job, ImageExport):
+            # Close the file and remove it
+            job.cancel()
+            job.run_slice(0)
+        elif job:
+            job.cancel()
+        thumbnail_cache().shutdown()
+        instrumentation().set_profiling(False)
+        super().closeEvent(event)
+
     @Slot()
     def on_new_map(self):
         if QMessageBox.question(self, "New Mind Map", 
@@ -95,31 +518,73 @@ class MainWindow(QMainWindow):
     @Slot()
     def on_open(self):
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "Open Mind Map", "", "Mind Map Files (*.json);;All Files (*)"
+            self, "Open Mind Map", "", OPEN_FILTERS
         )
         if file_path:
             self.canvas.clear_all()
-            import_data(file_path, self.canvas.add_node, self.canvas.add_connection)
-            self.statusBar().showMessage(f"Opened: {file_path}")
+            self.canvas.begin_load()
+            self._start_io(BackgroundReader(file_path), f"Opening {file_path}...", lock_editing=True)
 
     @Slot()
     def on_save(self):
-        file_path, _ = QFileDialog.getSaveFileName(
-            self, "Save Mind Map", "", "Mind Map Files (*.json);;All Files (*)"
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, "Save Mind Map", "",
+            ";;".join((JSON_FILTER, COMPACT_FILTER, BINARY_FILTER, "All Files (*)"))
         )
         if file_path:
-            export_data(
-                self.canvas.get_all_nodes(),
-                self.canvas.get_all_connections(),
-                file_path
+            if selected_filter == BINARY_FILTER and not file_path.lower().endswith(HMAP_EXTENSION):
+                file_path += HMAP_EXTENSION
+            # Snapshot plain records here; the worker never touches Qt items
+            nodes = list(self.canvas.model.records())
+            connections = list(self.canvas.model.iter_edges())
+            self._start_io(
+                BackgroundWriter(file_path, nodes, connections,
+                                 compact=selected_filter == COMPACT_FILTER),
+                f"Saving {file_path}..."
             )
-            self.statusBar().showMessage(f"Saved to: {file_path}")
+
+    @Slot()
+    def on_export_image(self):
+        if not self.canvas.nodes or self._io_job:
+            return
+        if self._layout_runner:
+            QMessageBox.information(self, "Export Image",
+                                    "Stop or wait for the running layout before exporting.")
+            return
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, "Export Image", "", EXPORT_FILTERS
+        )
+        if not file_path:
+            return
+        if not file_path.lower().endswith(FORMATS):
+            # The filter names the format, as "PNG Image (*.png)"
+            file_path += selected_filter[selected_filter.rindex('*') + 1:-1]
+        dpi, ok = QInputDialog.getItem(
+            self, "Export Image", "Resolution (DPI):",
+            [str(dpi) for dpi in DPI_CHOICES], DPI_CHOICES.index(SCREEN_DPI), False
+        )
+        if not ok:
+            return
+        try:
+            job = ImageExport(self.canvas.scene, file_path, int(dpi))
+        except ValueError as e:
+            QMessageBox.warning(self, "Export Image", str(e))
+            return
+        # Rendering reads the items between slices, so hold edits until it is done
+        self._start_io(job, f"Exporting {job.width} x {job.height} image to {file_path}...",
+                       lock_editing=True)
+
+    @Slot()
+    def on_find(self):
+        self.search_dock.show()
+        self.search_dock.raise_()
+        self.search_panel.focus_query()
 
     @Slot()
     def on_create_root(self):
         dialog = AddIdeaDialog(self)
         if dialog.exec():
-            self.canvas.add_node(dialog.get_data())
+            self.undo_stack.push(AddNodeCommand(self.canvas, dialog.get_data()))
             self.statusBar().showMessage("Created root node")
 
     @Slot()
@@ -132,7 +597,7 @@ class MainWindow(QMainWindow):
 
         dialog = AddIdeaDialog(self)
         if dialog.exec():
-            self.canvas.add_node(dialog.get_data(), parent_id=selected.id)
+            self.undo_stack.push(AddNodeCommand(self.canvas, dialog.get_data(), parent_id=selected.id))
             self.statusBar().showMessage("Added child node")
 
     @Slot()
@@ -154,21 +619,46 @@ class MainWindow(QMainWindow):
         })
         
         if dialog.exec():
-            data = dialog.get_data()
-            node.update_from_data(data)
-            self.canvas.scene.update()
+            command = EditNodeCommand(self.canvas, node.id, dialog.get_data())
+            if not command.is_empty():
+                self.undo_stack.push(command)
             self.statusBar().showMessage("Updated node")
 
     @Slot()
-    def on_delete_node(self):
+    def on_toggle_collapse(self):
         node = self.canvas.get_selected_node()
         if not node:
+            QMessageBox.warning(self, "No Selection",
+                              "Please select a node to collapse or expand.")
+            return
+        if not node.node.collapsed and not self.canvas.model.outgoing.get(node.id):
+            self.statusBar().showMessage("The node has no children to collapse")
+            return
+        self.canvas.toggle_collapsed(node.id)
+        count = self.canvas.hidden_count(node.id)
+        self.statusBar().showMessage(f"Collapsed {count} nodes" if node.node.collapsed else "Expanded subtree")
+
+    @Slot()
+    def on_delete_node(self):
+        selected = self.canvas.scene.selectedItems()
+        nodes = [item.id for item in selected if isinstance(item, IdeaNode)]
+        edges = [item for item in selected
+                 if isinstance(item, ConnectionItem) and item.end_node is not None
+                 and item.start_node.id not in nodes and item.end_node.id not in nodes]
+        if not nodes and not edges:
             QMessageBox.warning(self, "No Selection", 
                               "Please select a node to delete.")
             return
 
-        if QMessageBox.question(self, "Delete Node", 
-                              "Delete the selected node?",
+        count = len(nodes) + len(edges)
+        question = "Delete the selected node?" if count == 1 else f"Delete the {count} selected items?"
+        if QMessageBox.question(self, "Delete Node", question,
                               QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
-            self.canvas.delete_node(node.id)
-            self.statusBar().showMessage("Deleted node")
+            # Nodes and loose connections go as one undo step
+            self.undo_stack.beginMacro("Delete Selection")
+            if nodes:
+                self.undo_stack.push(DeleteNodesCommand(self.canvas, nodes))
+            for conn in edges:
+                self.undo_stack.push(DisconnectCommand(self.canvas, conn.start_node.id, conn.end_node.id))
+            self.undo_stack.endMacro()
+            self.statusBar().showMessage("Deleted node" if count == 1 else f"Deleted {count} items")
@@ -0,0 +1,272 @@
+"""
+Overview of the whole map.
+
+The minimap shows every node of the canvas as a dot of its color, plus
+the rectangle the canvas is looking at; clicking or dragging moves the
+canvas there. Rather than rendering the scene, it keeps a grid of small
+cached images and redraws only the tiles whose nodes the model reports
+as added, moved, changed or removed, or the canvas reports as resized,
+hidden or shown, a few at a time while the event loop is idle. Painting
+the widget itself only blits the tiles, so it costs the same for 100
+nodes as for 100k.
+"""
+from PySide6.QtWidgets import QWidget
+from PySide6.QtGui import QPainter, QImage, QColor, QPen
+from PySide6.QtCore import Qt, QTimer, QRectF, QPointF, Slot
+import math
+import time
+from ui.idea_node import paint_resources
+
+# Side of a cached tile, in minimap pixels
+TILE_SIZE = 32
+# Time budget per batch of tile redraws, in seconds
+BATCH_SECONDS = 0.008
+# Milliseconds between redraw batches, so a drag is not redrawn on every move
+REDRAW_INTERVAL_MS = 50
+# Milliseconds to wait after a resize or scene growth before refitting
+REFIT_DELAY_MS = 100
+# More dirty tiles than this are redrawn without waiting between batches
+BURST_TILES = 16
+# Node size assumed before it has an item
+DEFAULT_NODE_SIZE = (120, 60)
+
+BACKGROUND = QColor("#e4e4e4")
+SCENE_BACKGROUND = QColor("#f0f0f0")
+VIEW_PEN = QPen(QColor("#2196F3"), 1.5)
+VIEW_FILL = QColor(33, 150, 243, 40)
+
+
+class Minimap(QWidget):
+    """The whole map with the visible area marked; click or drag to move there."""
+
+    def __init__(self, canvas, parent=None):
+        super().__init__(parent)
+        self.canvas = canvas
+        self.setMinimumSize(160, 120)
+        self.setCursor(Qt.PointingHandCursor)
+
+        # Scene rect shown, scale from scene units to pixels, and where
+        # the scene rect's top-left corner is drawn
+        self._world = QRectF()
+        self._scale = 1.0
+        self._origin = QPointF()
+        # Tile (column, row) -> QImage, and tiles waiting to be redrawn
+        self._tiles = {}
+        self._dirty = set()
+        # Node id -> ((x, y, width, height), tiles) it was last filed
+        # under, and tile -> ids of the nodes overlapping it
+        self._drawn = {}
+        self._buckets = {}
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._redraw_batch)
+        # Refitting refiles every node, so resizes and scene growth are coalesced
+        self._refit_timer = QTimer(self)
+        self._refit_timer.setSingleShot(True)
+        self._refit_timer.setInterval(REFIT_DELAY_MS)
+        self._refit_timer.timeout.connect(self.invalidate)
+
+        canvas.model.add_listener(self)
+        canvas.node_resized.connect(self._refile)
+        canvas.visibility_changed.connect(self._refile_all)
+        canvas.scene.sceneRectChanged.connect(self._refit_timer.start)
+        for bar in (canvas.horizontalScrollBar(), canvas.verticalScrollBar()):
+            bar.valueChanged.connect(self.update)
+            bar.rangeChanged.connect(self.update)
+        self._fit()
+        for node in canvas.model.nodes.values():
+            self.node_added(node)
+
+    # Geometry
+
+    def _fit(self):
+        """Fit the scene rect into the widget."""
+        self._world = QRectF(self.canvas.scene.sceneRect())
+        width, height = max(self.width(), 1), max(self.height(), 1)
+        if self._world.isEmpty():
+            self._scale = 1.0
+        else:
+            self._scale = min(width / self._world.width(), height / self._world.height())
+        self._origin = QPointF((width - self._world.width() * self._scale) / 2,
+                               (height - self._world.height() * self._scale) / 2)
+
+    def map_from_scene(self, rect):
+        """Widget rectangle showing a scene rectangle."""
+        return QRectF(self._origin.x() + (rect.left() - self._world.left()) * self._scale,
+                      self._origin.y() + (rect.top() - self._world.top()) * self._scale,
+                      rect.width() * self._scale, rect.height() * self._scale)
+
+    def map_to_scene(self, pos):
+        """Scene point shown at a widget position."""
+        return QPointF(self._world.left() + (pos.x() - self._origin.x()) / self._scale,
+                       self._world.top() + (pos.y() - self._origin.y()) / self._scale)
+
+    def _tile_rect(self, key):
+        """Scene rectangle a tile covers."""
+        size = TILE_SIZE / self._scale
+        return QRectF(self._world.left() + key[0] * size, self._world.top() + key[1] * size, size, size)
+
+    def _keys_under(self, x, y, width, height):
+        """Tiles a scene rectangle overlaps."""
+        size = TILE_SIZE / self._scale
+        left = math.floor((x - self._world.left()) / size)
+        top = math.floor((y - self._world.top()) / size)
+        right = math.floor((x + width - self._world.left()) / size)
+        bottom = math.floor((y + height - self._world.top()) / size)
+        return [(column, row) for column in range(left, right + 1) for row in range(top, bottom + 1)]
+
+    def _place(self, node_id, footprint):
+        """File a node under the tiles it overlaps and queue those tiles."""
+        keys = self._keys_under(*footprint)
+        self._drawn[node_id] = (footprint, keys)
+        for key in keys:
+            self._buckets.setdefault(key, set()).add(node_id)
+        self._dirty.update(keys)
+        self._schedule()
+
+    def _unplace(self, node_id):
+        drawn = self._drawn.pop(node_id, None)
+        if drawn is None:
+            return
+        for key in drawn[1]:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(node_id)
+                if not bucket:
+                    del self._buckets[key]
+        self._dirty.update(drawn[1])
+        self._schedule()
+
+    def _schedule(self):
+        if self._dirty and self.isVisible() and not self._timer.isActive():
+            # A few tiles, as from a drag, wait for the next interval; a
+            # whole redraw runs back to back
+            self._timer.start(0 if len(self._dirty) > BURST_TILES else REDRAW_INTERVAL_MS)
+
+    # Model notifications
+
+    def _footprint(self, node):
+        item = self.canvas.nodes.get(node.id)
+        width, height = (item.width, item.height) if item is not None else DEFAULT_NODE_SIZE
+        return node.x, node.y, width, height
+
+    def node_added(self, node):
+        self._place(node.id, self._footprint(node))
+
+    def node_removed(self, node):
+        self._unplace(node.id)
+
+    def node_moved(self, node):
+        self._unplace(node.id)
+        self._place(node.id, self._footprint(node))
+
+    def node_changed(self, node):
+        self.node_moved(node)
+
+    def cleared(self):
+        self._drawn.clear()
+        self.invalidate()
+
+    # Canvas notifications
+
+    @Slot(str)
+    def _refile(self, node_id):
+        """Refile a node whose item changed size, if it was filed at another size."""
+        drawn = self._drawn.get(node_id)
+        node = self.canvas.model.nodes.get(node_id)
+        if drawn is not None and node is not None and drawn[0] != self._footprint(node):
+            self.node_moved(node)
+
+    @Slot(object)
+    def _refile_all(self, node_ids):
+        """Redraw where collapsing or expanding hid or showed nodes."""
+        nodes = self.canvas.model.nodes
+        for node_id in node_ids:
+            if node_id in nodes:
+                self.node_moved(nodes[node_id])
+
+    # Drawing
+
+    @Slot()
+    def invalidate(self):
+        """Refit to the scene, refile every node and redraw every tile."""
+        self._fit()
+        self._tiles.clear()
+        self._buckets.clear()
+        for node_id, (footprint, _) in list(self._drawn.items()):
+            self._place(node_id, footprint)
+        self._dirty = set(self._buckets)
+        self._schedule()
+        self.update()
+
+    @Slot()
+    def _redraw_batch(self):
+        deadline = time.perf_counter() + BATCH_SECONDS
+        while self._dirty and time.perf_counter() < deadline:
+            key = self._dirty.pop()
+            rect = self._tile_rect(key)
+            image = self._render_tile(key, rect)
+            if image is None:
+                self._tiles.pop(key, None)
+            else:
+                self._tiles[key] = image
+            self.update(self.map_from_scene(rect).toAlignedRect())
+        if not self._dirty:
+            self._timer.stop()
+
+    def _render_tile(self, key, rect):
+        """Draw the nodes filed under a tile into an image, or return None if there are none."""
+        # Nodes hidden in a collapsed subtree have no item
+        items = self.canvas.nodes
+        nodes = [items[node_id] for node_id in self._buckets.get(key, ()) if node_id in items]
+        if not nodes:
+            return None
+        image = QImage(TILE_SIZE, TILE_SIZE, QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        scale = self._scale
+        left, top = rect.left(), rect.top()
+        for item in nodes:
+            pos = item.pos()
+            # At least a pixel, however far out
+            painter.fillRect(QRectF((pos.x() - left) * scale, (pos.y() - top) * scale,
+                                    max(item.width * scale, 1.0), max(item.height * scale, 1.0)),
+                             paint_resources(item.color, 'normal')[2])
+        painter.end()
+        return image
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), BACKGROUND)
+        painter.fillRect(self.map_from_scene(self._world), SCENE_BACKGROUND)
+        for key, image in self._tiles.items():
+            painter.drawImage(self.map_from_scene(self._tile_rect(key)).topLeft(), image)
+        visible = self.canvas.mapToScene(self.canvas.viewport().rect()).boundingRect()
+        painter.setPen(VIEW_PEN)
+        painter.setBrush(VIEW_FILL)
+        painter.drawRect(self.map_from_scene(visible))
+        painter.end()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._refit_timer.start()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._schedule()
+
+    # Navigation
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.canvas.centerOn(self.map_to_scene(event.position()))
+            event.accept()
+            return
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() & Qt.LeftButton:
+            self.canvas.centerOn(self.map_to_scene(event.position()))
+            event.accept()
+            return
+        super().mouseMoveEvent(event)
@@ -0,0 +1,68 @@
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QLineEdit, QListWidget, QListWidgetItem, QLabel
+from PySide6.QtCore import Qt, Signal, Slot
+
+# Results listed per query
+RESULT_LIMIT = 50
+
+
+class SearchPanel(QWidget):
+    """Search box with live results; choosing a result emits its node id."""
+
+    node_chosen = Signal(str)
+
+    def __init__(self, canvas, parent=None):
+        super().__init__(parent)
+        self.canvas = canvas
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Search titles, keywords, descriptions")
+        self.query_edit.setClearButtonEnabled(True)
+        self.query_edit.textChanged.connect(self.refresh)
+        self.query_edit.returnPressed.connect(self._choose_first)
+        layout.addWidget(self.query_edit)
+
+        self.results = QListWidget()
+        self.results.itemActivated.connect(self._choose)
+        self.results.itemClicked.connect(self._choose)
+        layout.addWidget(self.results)
+
+        self.summary = QLabel()
+        layout.addWidget(self.summary)
+
+    def focus_query(self):
+        self.query_edit.setFocus()
+        self.query_edit.selectAll()
+
+    @Slot()
+    def refresh(self):
+        """Re-run the current query against the canvas index."""
+        query = self.query_edit.text()
+        self.results.clear()
+        if not query.strip():
+            self.summary.clear()
+            return
+        nodes = self.canvas.search(query, RESULT_LIMIT + 1)
+        for node in nodes[:RESULT_LIMIT]:
+            item = QListWidgetItem(node.title)
+            item.setData(Qt.UserRole, node.id)
+            if node.keywords:
+                item.setToolTip(", ".join(node.keywords))
+            self.results.addItem(item)
+        if not nodes:
+            self.summary.setText("No matches")
+        elif len(nodes) > RESULT_LIMIT:
+            self.summary.setText(f"First {RESULT_LIMIT} matches")
+        else:
+            self.summary.setText(f"{len(nodes)} matches")
+
+    @Slot()
+    def _choose_first(self):
+        if self.results.count():
+            self._choose(self.results.item(0))
+
+    @Slot(QListWidgetItem)
+    def _choose(self, item):
+        self.node_chosen.emit(item.data(Qt.UserRole))
@@ -0,0 +1,199 @@
+"""
+Asynchronous, cached image thumbnails.
+
+Images are stat'ed, decoded and scaled on a thread pool with
+QImageReader, which can decode straight to the target size, and turned
+into QPixmaps on the GUI thread as a polling timer picks the results up.
+Decoded thumbnails live in one process-wide LRU cache keyed by
+(path, mtime, size) and bounded by a memory budget; every node showing
+the same image at the same size draws the same pixmap. Until a thumbnail
+is ready, callers get None and are repainted once it arrives.
+"""
+from PySide6.QtGui import QImageReader, QPixmap
+from PySide6.QtCore import Qt, QObject, QSize, QTimer, Slot
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import os
+import queue
+import time
+import weakref
+
+# Edge of the square box thumbnails are scaled to fit, in pixels
+THUMBNAIL_SIZE = 96
+# Default memory budget for decoded thumbnails, in bytes
+CACHE_BUDGET = 64 * 1024 * 1024
+# Decoder threads
+WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+# A path's mtime is checked again at most this often
+REVALIDATE_SECONDS = 5.0
+
+
+def _decode(path, size, known_mtime):
+    """Worker: stat and decode one image.
+
+    Returns:
+        tuple: (mtime or None, QImage or None); no image when the file is
+        missing, unreadable, or unchanged since known_mtime
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None, None
+    if mtime == known_mtime:
+        return mtime, None
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    source = reader.size()
+    if source.isValid() and (source.width() > size or source.height() > size):
+        reader.setScaledSize(source.scaled(QSize(size, size), Qt.KeepAspectRatio))
+    image = reader.read()
+    return mtime, (None if image.isNull() else image)
+
+
+class ThumbnailCache(QObject):
+    """Process-wide LRU of decoded thumbnails with asynchronous loading."""
+
+    def __init__(self, budget=CACHE_BUDGET, workers=WORKERS, parent=None):
+        super().__init__(parent)
+        self.budget = budget
+        self.used = 0
+        # (path, mtime, size) -> QPixmap, least recently used first
+        self._pixmaps = OrderedDict()
+        # (path, size) -> mtime of the newest decoded version
+        self._current = {}
+        self._checked_at = {}
+        self._queued = set()
+        self._failed = set()
+        # (path, size) -> nodes waiting for a repaint
+        self._waiting = {}
+        self._done = queue.SimpleQueue()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnail')
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(15)
+        self._timer.timeout.connect(self._collect)
+
+    def set_budget(self, budget):
+        """Change the memory budget, evicting right away if needed."""
+        self.budget = budget
+        self._evict()
+
+    def get(self, path, size=THUMBNAIL_SIZE, item=None):
+        """
+        Return the thumbnail for path, or None while it is being loaded.
+
+        Args:
+            path (str): Image file path
+            size (int): Edge of the box the thumbnail fits in
+            item (QGraphicsItem): Optional; updated once the thumbnail is ready
+
+        Returns:
+            QPixmap: The shared thumbnail, or None if not (yet) available
+        """
+        request = (path, size)
+        mtime = self._current.get(request)
+        pixmap = None
+        if mtime is not None:
+            pixmap = self._pixmaps.get((path, mtime, size))
+            if pixmap is not None:
+                self._pixmaps.move_to_end((path, mtime, size))
+        if request in self._queued:
+            stale = False
+        else:
+            stale = time.monotonic() - self._checked_at.get(request, float('-inf')) > REVALIDATE_SECONDS
+        if pixmap is None and request in self._failed and not stale:
+            return None
+        # A queued request still registers item, so every node sharing the
+        # image is repainted; _load submits the decode only once
+        if pixmap is None or stale:
+            self._load(request, None if pixmap is None else mtime, item)
+        return pixmap
+
+    def failed(self, path, size=THUMBNAIL_SIZE):
+        """Whether the last attempt to load path failed."""
+        return (path, size) in self._failed
+
+    def _load(self, request, known_mtime, item):
+        if item is not None:
+            self._waiting.setdefault(request, weakref.WeakSet()).add(item)
+        if request in self._queued:
+            return
+        self._queued.add(request)
+        future = self._pool.submit(_decode, request[0], request[1], known_mtime)
+        future.add_done_callback(lambda f: self._done.put((request, f)))
+        if not self._timer.isActive():
+            self._timer.start()
+
+    @Slot()
+    def _collect(self):
+        """Take finished decodes, cache them and repaint their nodes."""
+        while True:
+            try:
+                request, future = self._done.get_nowait()
+            except queue.Empty:
+                break
+            self._queued.discard(request)
+            self._checked_at[request] = time.monotonic()
+            try:
+                mtime, image = future.result()
+            except Exception:
+                mtime, image = None, None
+            path, size = request
+            if mtime is None:
+                self._failed.add(request)
+                self._current.pop(request, None)
+            elif image is not None:
+                self._failed.discard(request)
+                old = self._current.get(request)
+                if old is not None and old != mtime:
+                    self._drop((path, old, size))
+                self._current[request] = mtime
+                pixmap = QPixmap.fromImage(image)
+                self._pixmaps[(path, mtime, size)] = pixmap
+                self.used += self._cost(pixmap)
+                self._evict()
+            else:
+                # Unchanged on disk; the cached pixmap stands
+                self._waiting.pop(request, None)
+                continue
+            for item in self._waiting.pop(request, ()):
+                try:
+                    item.update()
+                except RuntimeError:
+                    pass  # item already deleted
+        if not self._queued:
+            self._timer.stop()
+
+    @staticmethod
+    def _cost(pixmap):
+        return pixmap.width() * pixmap.height() * max(pixmap.depth() // 8, 1)
+
+    def _drop(self, key):
+        pixmap = self._pixmaps.pop(key, None)
+        if pixmap is not None:
+            self.used -= self._cost(pixmap)
+
+    def _evict(self):
+        """Drop least recently used thumbnails until within budget."""
+        while self.used > self.budget and self._pixmaps:
+            key, pixmap = self._pixmaps.popitem(last=False)
+            self.used -= self._cost(pixmap)
+            if self._current.get((key[0], key[2])) == key[1]:
+                del self._current[(key[0], key[2])]
+                self._checked_at.pop((key[0], key[2]), None)
+
+    def shutdown(self):
+        """Stop loading; pending decodes are dropped."""
+        self._timer.stop()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_cache = None
+
+
+def thumbnail_cache():
+    """Return the process-wide ThumbnailCache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        _cache = ThumbnailCache()
+    return _cache